@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+"""Benchmark build_press_pdf over fit modes, bleed generators and crop marks.
+
+Synthetic inputs are generated locally (nothing is downloaded):
+  vector      vector-heavy pages (dense line art + text)
+  cad         very dense line art (CAD/map-like, tens of thousands of paths per page)
+  images      image-heavy PDF (one large photo per page)
+  many        many small vector pages
+  catalog     pages that each carry their own copy of the same background photo
+  odd_boxes   offset MediaBox, inset CropBox/TrimBox, /Rotate 90, landscape
+  photo_jpg   raster JPEG input
+  photo_png   raster PNG input
+  scan_tiff   multi-page TIFF, photo and 1-bit line-art frames (one Deflate strip each)
+
+Every case runs in a fresh process so peak RSS is per case. Wall time is the best of
+--repeat runs. --profiles runs each case once per output profile ("fast" cases keep
+their plain names, others get a "/<profile>" suffix) to show the size/time trade-off.
+--read-modes does the same for how PDF inputs are read ("buffered" or "mmap", suffix
+"/mmap"); --chunk/--workers apply to every case, so chunked reads can be compared.
+--placements compares how PDF pages are placed ("wrap" passes content through, "merge"
+re-parses it with pypdf; suffix "/merge"). Results (wall_s, peak_rss, bytes, pages) go to
+--out as JSON; pass --baseline to compare and exit 1 when a case regresses past the thresholds.
+
+Examples:
+  python bench.py --out bench.json                       # record a baseline
+  python bench.py --out new.json --baseline bench.json   # compare against it
+  python bench.py --quick --filter odd_boxes             # small subset while iterating
+  python bench.py --quick --profiles fast,compact        # output size vs write time
+  python bench.py --filter images --read-modes buffered,mmap --chunk 2 --workers 2
+  python bench.py --quick --filter cad --placements wrap,merge
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+FIT_MODES = (
+    "fit_trim_proportional",
+    "fit_bleed_proportional",
+    "fill_trim_proportional",
+    "fill_bleed_proportional",
+    "stretch_trim",
+    "stretch_bleed",
+)
+BLEED_GENERATORS = ("none", "mirror", "smear")
+QUICK_FIT_MODES = ("fit_trim_proportional", "fill_bleed_proportional")
+
+TRIM = "4x6in"
+BLEED = "0.125"
+
+# Changes smaller than this are treated as noise whatever the relative threshold says.
+MIN_WALL_DELTA_S = 0.02
+MIN_RSS_DELTA_BYTES = 8 * 1024 * 1024
+
+BENCH_VERSION = 1
+
+
+def _vector_page(writer, index: int, w: float, h: float, strokes: int):
+    from pypdf import PageObject
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    from core import _PypdfPrivate
+
+    page = PageObject.create_blank_page(width=w, height=h)
+    parts = [f"q 0.2 0.4 0.8 rg 0 0 {w:g} {h:g} re f Q\n"]
+    for k in range(strokes):
+        parts.append(
+            f"q {(k % 7) / 7:.3f} {(k % 5) / 5:.3f} {(index % 3) / 3:.3f} RG 0.5 w "
+            f"{(k * 13) % w:.1f} {(k * 7) % h:.1f} m {(k * 29) % w:.1f} {(k * 31) % h:.1f} l S Q\n"
+        )
+    parts.append(f"BT /F1 24 Tf 36 36 Td (Page {index + 1}) Tj ET\n")
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): _PypdfPrivate.add_object(writer, font)}),
+    })
+    content = DecodedStreamObject()
+    content.set_data("".join(parts).encode("ascii"))
+    page[NameObject("/Contents")] = _PypdfPrivate.add_object(writer, content)
+    return page
+
+
+def _write_vector_pdf(path: str, pages: int, strokes: int, odd_boxes: bool = False) -> None:
+    from pypdf import PdfWriter
+    from pypdf.generic import NameObject, NumberObject, RectangleObject
+
+    writer = PdfWriter()
+    for i in range(pages):
+        w, h = (792.0, 612.0) if odd_boxes and i % 2 else (612.0, 792.0)
+        page = _vector_page(writer, i, w, h, strokes)
+        if odd_boxes:
+            page.mediabox = RectangleObject((-50, -30, w - 50, h - 30))
+            page.cropbox = RectangleObject((-40, -20, w - 60, h - 40))
+            page.trimbox = RectangleObject((-20, 0, w - 80, h - 60))
+            page.bleedbox = RectangleObject((-29, -9, w - 71, h - 51))
+            if i % 3 == 1:
+                page[NameObject("/Rotate")] = NumberObject(90)
+        writer.add_page(page)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def _photo(width: int, height: int, seed: int = 0):
+    """Deterministic noisy gradient so JPEG/Flate sizes are realistic, not trivially small."""
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 48 + seed)
+    mandel = Image.effect_mandelbrot((width, height), (-2.0, -1.2, 0.8, 1.2), 64)
+    return Image.merge("RGB", (gradient, noise, mandel))
+
+
+def make_fixtures(root: str, quick: bool = False) -> Dict[str, str]:
+    """Write the synthetic inputs under root and return {name: path}."""
+    os.makedirs(root, exist_ok=True)
+    scale = 4 if quick else 1
+    paths = {
+        "vector": os.path.join(root, "vector.pdf"),
+        "cad": os.path.join(root, "cad.pdf"),
+        "images": os.path.join(root, "images.pdf"),
+        "many": os.path.join(root, "many.pdf"),
+        "catalog": os.path.join(root, "catalog.pdf"),
+        "odd_boxes": os.path.join(root, "odd_boxes.pdf"),
+        "photo_jpg": os.path.join(root, "photo.jpg"),
+        "photo_png": os.path.join(root, "photo.png"),
+        "scan_tiff": os.path.join(root, "scan.tif"),
+    }
+    _write_vector_pdf(paths["vector"], pages=max(1, 8 // scale), strokes=2000)
+    _write_vector_pdf(paths["cad"], pages=max(1, 4 // scale), strokes=60000)
+    _write_vector_pdf(paths["many"], pages=max(4, 200 // scale), strokes=40)
+    _write_vector_pdf(paths["odd_boxes"], pages=6, strokes=200, odd_boxes=True)
+
+    photos = [_photo(1800, 1200, seed=i) for i in range(max(1, 6 // scale))]
+    photos[0].save(paths["images"], "PDF", resolution=300.0, save_all=True, append_images=photos[1:])
+    # Pillow writes one image object per page, so every page gets an identical copy
+    photos[0].save(paths["catalog"], "PDF", resolution=300.0, save_all=True,
+                   append_images=[photos[0]] * (max(4, 40 // scale) - 1))
+    raster = _photo(1200, 1800)
+    raster.save(paths["photo_jpg"], quality=90, dpi=(300, 300))
+    raster.save(paths["photo_png"], dpi=(300, 300))
+    # one strip per frame, so frames pass through unless a pixel bleed needs them decoded
+    line_art = raster.convert("L").point(lambda v: 255 if v > 128 else 0).convert("1")
+    frames = [raster if i % 2 == 0 else line_art for i in range(max(2, 12 // scale))]
+    frames[0].save(paths["scan_tiff"], save_all=True, append_images=frames[1:], dpi=(300, 300),
+                   compression="tiff_deflate", strip_size=1 << 30)
+    return paths
+
+
+def bench_cases(
+    fixtures: Dict[str, str],
+    quick: bool = False,
+    name_filter: str = "",
+    profiles: Tuple[str, ...] = ("fast",),
+    read_modes: Tuple[str, ...] = ("buffered",),
+    placements: Tuple[str, ...] = ("wrap",),
+) -> List[Dict]:
+    """Full matrix: fixture x fit_mode x bleed_generator x crop marks x profile x read mode x placement."""
+    cases = []
+    for fixture, path in fixtures.items():
+        for fit_mode in QUICK_FIT_MODES if quick else FIT_MODES:
+            for generator in BLEED_GENERATORS:
+                for marks in (False, True):
+                    for profile in profiles:
+                        for read_mode in read_modes:
+                            for placement in placements:
+                                name = f"{fixture}/{fit_mode}/{generator}/{'marks' if marks else 'nomarks'}"
+                                if profile != "fast":
+                                    name += f"/{profile}"
+                                if read_mode != "buffered":
+                                    name += f"/{read_mode}"
+                                if placement != "wrap":
+                                    name += f"/{placement}"
+                                if name_filter and name_filter not in name:
+                                    continue
+                                cases.append({
+                                    "name": name,
+                                    "input": path,
+                                    "fit_mode": fit_mode,
+                                    "bleed_generator": generator,
+                                    "crop_marks": marks,
+                                    "profile": profile,
+                                    "mmap": read_mode == "mmap",
+                                    "placement": placement,
+                                })
+    return cases
+
+
+def _run_case(case: Dict, out_dir: str, repeat: int, workers: int = 1, page_chunk: int = 0) -> Dict:
+    """Worker: build one case repeat times in this (fresh) process."""
+    from core import build_press_pdf, make_job
+
+    job = make_job(
+        input_path=case["input"],
+        pages_spec="all",
+        pdf_box="auto",
+        trim_size_spec=TRIM,
+        bleed_spec=BLEED,
+        fit_mode=case["fit_mode"],
+        anchor="center",
+        bleed_generator=case["bleed_generator"],
+        placement=case.get("placement", "wrap"),
+        crop_marks=case["crop_marks"],
+        out_dir=out_dir,
+        basename="case",
+        output_profile=case.get("profile"),
+        workers=workers,
+        page_chunk=page_chunk,
+        mmap_inputs=case.get("mmap", False),
+    )
+    best = None
+    report: Dict = {}
+    for _ in range(max(1, repeat)):
+        report = {}
+        t0 = time.perf_counter()
+        build_press_pdf(job, report=report)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    record = report["inputs"][0]
+    return {
+        "wall_s": round(best, 4),
+        "peak_rss": report.get("peak_rss"),
+        "bytes": record["bytes"],
+        "pages": record["pages"],
+    }
+
+
+def run_benchmarks(
+    cases: List[Dict],
+    work_dir: str,
+    repeat: int = 3,
+    verbose: bool = True,
+    workers: int = 1,
+    page_chunk: int = 0,
+) -> Dict[str, Dict]:
+    ctx = multiprocessing.get_context("spawn")
+    results: Dict[str, Dict] = {}
+    out_dir = os.path.join(work_dir, "out")
+    for n, case in enumerate(cases, 1):
+        # one process per case so peak RSS is not inherited from earlier, larger cases
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            result = pool.submit(_run_case, case, out_dir, repeat, workers, page_chunk).result()
+        results[case["name"]] = result
+        if verbose:
+            rss = result["peak_rss"]
+            rss_text = f"{rss / 1024 ** 2:7.1f} MiB" if rss else "      n/a"
+            print(f"[{n:3d}/{len(cases)}] {case['name']:<60} {result['wall_s']:8.3f} s {rss_text} "
+                  f"{result['bytes'] / 1024:9.1f} KiB")
+    return results
+
+
+def compare(
+    results: Dict[str, Dict],
+    baseline: Dict[str, Dict],
+    threshold: float,
+    size_threshold: float,
+) -> List[str]:
+    """Return one message per metric that regressed past its threshold."""
+    problems = []
+    limits = (
+        ("wall_s", threshold, MIN_WALL_DELTA_S),
+        ("peak_rss", threshold, MIN_RSS_DELTA_BYTES),
+        ("bytes", size_threshold, 0),
+    )
+    for name, new in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric, limit, min_delta in limits:
+            a, b = old.get(metric), new.get(metric)
+            if not a or b is None:
+                continue
+            if b > a * (1.0 + limit) and b - a > min_delta:
+                problems.append(f"{name}: {metric} {a} -> {b} (+{(b / a - 1.0) * 100:.1f}%, limit {limit * 100:.0f}%)")
+    return problems
+
+
+def _load_baseline(path: str) -> Tuple[Dict[str, Dict], Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("cases", {}), data.get("meta", {})
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="PressDrop Bleed Fixer benchmarks")
+    p.add_argument("--out", default="bench_results.json", help="Where to write this run's results")
+    p.add_argument("--baseline", help="Earlier results JSON to compare against")
+    p.add_argument("--threshold", type=float, default=0.25, help="Allowed wall time / peak RSS growth (0.25 = 25%%)")
+    p.add_argument("--size-threshold", type=float, default=0.02, help="Allowed output size growth")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is kept")
+    p.add_argument("--quick", action="store_true", help="Smaller inputs and two fit modes")
+    p.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    p.add_argument("--work", help="Keep fixtures and outputs here instead of a temp folder")
+    p.add_argument("--profiles", default="fast", help="Comma-separated output profiles, e.g. fast,compact")
+    p.add_argument("--read-modes", default="buffered", help="Comma-separated input read modes: buffered,mmap")
+    p.add_argument("--placements", default="wrap", help="Comma-separated PDF placement modes: wrap,merge")
+    p.add_argument("--workers", type=int, default=1, help="Engine workers for every case")
+    p.add_argument("--chunk", type=int, default=0, help="Engine page_chunk for every case (0 = off)")
+    args = p.parse_args()
+    profiles = tuple(name.strip() for name in args.profiles.split(",") if name.strip())
+    read_modes = tuple(name.strip() for name in args.read_modes.split(",") if name.strip())
+    if any(mode not in ("buffered", "mmap") for mode in read_modes):
+        p.error("--read-modes takes buffered and/or mmap")
+    placements = tuple(name.strip() for name in args.placements.split(",") if name.strip())
+    if any(mode not in ("wrap", "merge") for mode in placements):
+        p.error("--placements takes wrap and/or merge")
+
+    work_dir = args.work or tempfile.mkdtemp(prefix="pressdrop_bench_")
+    try:
+        fixtures = make_fixtures(os.path.join(work_dir, "fixtures"), quick=args.quick)
+        cases = bench_cases(fixtures, quick=args.quick, name_filter=args.filter, profiles=profiles,
+                            read_modes=read_modes, placements=placements)
+        if not cases:
+            print("No cases match --filter")
+            return 2
+        results = run_benchmarks(cases, work_dir, repeat=args.repeat, workers=args.workers, page_chunk=args.chunk)
+    finally:
+        if not args.work:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    meta = {
+        "bench_version": BENCH_VERSION,
+        "quick": args.quick,
+        "repeat": args.repeat,
+        "workers": args.workers,
+        "page_chunk": args.chunk,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "cases": results}, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(results)} results to {args.out}")
+
+    if not args.baseline:
+        return 0
+    baseline, base_meta = _load_baseline(args.baseline)
+    if base_meta.get("quick") != args.quick or base_meta.get("bench_version") != BENCH_VERSION:
+        print("Warning: baseline was recorded with different --quick/bench version; sizes are not comparable")
+    problems = compare(results, baseline, args.threshold, args.size_threshold)
+    for line in problems:
+        print("REGRESSION " + line)
+    print(f"{len(problems)} regression(s) against {args.baseline}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,25 +1,177 @@
 from __future__ import annotations
 
 import io
+import contextlib
 import copy
+import hashlib
 import json
+import math
+import mmap
 import os
 import re
+import shutil
+import string
+import struct
+import sys
+import threading
+import time
+import traceback
+import zlib
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
 
-from PIL import Image
-from pypdf import PdfReader, PdfWriter
-from pypdf._page import PageObject
-from pypdf.generic import RectangleObject
-from pypdf import Transformation
+if TYPE_CHECKING:
+    from PIL import Image
+    from pypdf import PdfReader, PdfWriter
+    from pypdf import PageObject
+    from pypdf.generic import (
+        ArrayObject,
+        BooleanObject,
+        DecodedStreamObject,
+        DictionaryObject,
+        EncodedStreamObject,
+        FloatObject,
+        IndirectObject,
+        NameObject,
+        NumberObject,
+        RectangleObject,
+        StreamObject,
+    )
+    from pypdf import Transformation
 
 
 POINTS_PER_INCH = 72.0
 MM_PER_INCH = 25.4
 
+# Page chunk size used with job["engine"]["streaming"] when job["engine"]["page_chunk"] is not set.
+STREAM_CHUNK_PAGES = 16
+
+# Bump when a change to the build pipeline alters output, so cached results are not reused.
+CACHE_VERSION = 6
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+# ResultCache's stats.json is shared by every process using the cache; updates hold a lock file,
+# waiting up to CACHE_STATS_LOCK_WAIT seconds and breaking locks older than CACHE_STATS_LOCK_STALE.
+CACHE_STATS_LOCK_WAIT = 2.0
+CACHE_STATS_LOCK_STALE = 30.0
+
+# Per-folder sidecar index of probe_pdf results; bump PROBE_VERSION when the record format changes.
+PROBE_INDEX_NAME = ".pressdrop_probe.json"
+PROBE_VERSION = 1
+
+# job["output"]["profile"]: "fast" writes pypdf's objects as they are; "compact" spends write time on
+# Flate for unfiltered streams and object streams plus an xref stream. Duplicate objects are
+# dropped either way (see _PdfStreamWriter). Any of the keys below set directly in
+# job["output"] override the profile.
+OUTPUT_PROFILES = {
+    "fast": {"compress_streams": False, "object_streams": False},
+    "compact": {"compress_streams": True, "object_streams": True},
+}
+COMPACT_FLATE_LEVEL = 9
+
+
+# pypdf major versions [from, to) whose private members _PypdfPrivate was checked against.
+PYPDF_PRIVATE_API = (6, 7)
+
+_PDF_LIBS_LOADED = False
+
+
+def _load_pdf_libs() -> None:
+    """Import Pillow and pypdf into this module on first use.
+
+    Both are slow to import, and make_job for image inputs, job JSON emission and the
+    job-server client never need them. Entry points that render call this first.
+    """
+    global _PDF_LIBS_LOADED
+    if _PDF_LIBS_LOADED:
+        return
+    import pypdf
+
+    major = int(pypdf.__version__.split(".")[0])
+    if not PYPDF_PRIVATE_API[0] <= major < PYPDF_PRIVATE_API[1]:
+        raise ImportError(
+            f"pypdf {pypdf.__version__} is not supported (expected >={PYPDF_PRIVATE_API[0]},<{PYPDF_PRIVATE_API[1]})"
+        )
+    from PIL import Image
+    from pypdf import PdfReader, PdfWriter, Transformation
+    from pypdf import PageObject
+    from pypdf.generic import (
+        ArrayObject,
+        BooleanObject,
+        DecodedStreamObject,
+        DictionaryObject,
+        EncodedStreamObject,
+        FloatObject,
+        IndirectObject,
+        NameObject,
+        NumberObject,
+        RectangleObject,
+        StreamObject,
+    )
+
+    globals().update(
+        Image=Image,
+        PdfReader=PdfReader,
+        PdfWriter=PdfWriter,
+        Transformation=Transformation,
+        PageObject=PageObject,
+        ArrayObject=ArrayObject,
+        BooleanObject=BooleanObject,
+        DecodedStreamObject=DecodedStreamObject,
+        DictionaryObject=DictionaryObject,
+        EncodedStreamObject=EncodedStreamObject,
+        FloatObject=FloatObject,
+        IndirectObject=IndirectObject,
+        NameObject=NameObject,
+        NumberObject=NumberObject,
+        RectangleObject=RectangleObject,
+        StreamObject=StreamObject,
+    )
+    _PDF_LIBS_LOADED = True
+
+
+def warm_up() -> None:
+    """Import the PDF and imaging libraries now rather than on the first build."""
+    _load_pdf_libs()
+
+
+def _warm_worker() -> None:
+    """Pool initializer: pay the heavy imports once per worker, not once per job."""
+    warm_up()
+
+
+class _PypdfPrivate:
+    """The only code that touches pypdf internals, for what its public API cannot do.
+
+    PdfWriter has no public way to add a free-standing object, list its objects or replace
+    one, and a stream only hands out its decoded data. _load_pdf_libs refuses pypdf
+    versions outside PYPDF_PRIVATE_API, the range these were checked against.
+    """
+
+    @staticmethod
+    def add_object(writer: PdfWriter, obj) -> IndirectObject:
+        return writer._add_object(obj)
+
+    @staticmethod
+    def objects(writer: PdfWriter) -> Iterator[Tuple[int, object]]:
+        """(object number, object) for every object of writer."""
+        return enumerate(list(writer._objects), 1)
+
+    @staticmethod
+    def replace_object(writer: PdfWriter, num: int, obj) -> None:
+        writer._replace_object(num, obj)
+
+    @staticmethod
+    def encoded_data(stream: StreamObject) -> bytes:
+        """The stream's bytes as stored, still under its /Filter."""
+        return stream._data
 
-@dataclass(frozen=True)
+    @staticmethod
+    def set_encoded_data(stream: StreamObject, data: bytes) -> None:
+        """Store already-encoded bytes (EncodedStreamObject.set_data would re-encode them)."""
+        stream._data = data
+
+
+@dataclass(frozen=True, slots=True)
 class Rect:
     """PDF coordinate rectangle (origin bottom-left)."""
 
@@ -126,6 +278,7 @@ def _rect_from_pypdf_box(box: RectangleObject) -> Rect:
 
 def pick_pdf_box(page: PageObject, box: str = "auto") -> Rect:
     """Choose which PDF box to treat as the page content bounds."""
+    _load_pdf_libs()
     b = (box or "auto").lower().strip()
 
     def safe_get(attr: str) -> Optional[Rect]:
@@ -166,21 +319,26 @@ def pick_pdf_box(page: PageObject, box: str = "auto") -> Rect:
     return _rect_from_pypdf_box(page.mediabox)
 
 
-def compute_boxes(trim_w_pt: float, trim_h_pt: float, bleed: Dict[str, float]) -> Tuple[Rect, Rect, Rect]:
-    """Return (MediaBox, BleedBox, TrimBox) rects in output page coordinates (PDF coords)."""
+def compute_boxes(
+    trim_w_pt: float, trim_h_pt: float, bleed: Dict[str, float], slug_pt: float = 0.0
+) -> Tuple[Rect, Rect, Rect]:
+    """Return (MediaBox, BleedBox, TrimBox) rects in output page coordinates (PDF coords).
+
+    slug_pt adds a margin for printer's marks around the bleed box on every side.
+    """
     bu = bleed.get("unit", "in")
     bt = to_points(float(bleed["top"]), bu)
     br = to_points(float(bleed["right"]), bu)
     bb = to_points(float(bleed["bottom"]), bu)
     bl = to_points(float(bleed["left"]), bu)
 
-    media_w = trim_w_pt + bl + br
-    media_h = trim_h_pt + bt + bb
+    media_w = trim_w_pt + bl + br + 2 * slug_pt
+    media_h = trim_h_pt + bt + bb + 2 * slug_pt
 
     media = Rect(0, 0, media_w, media_h)
-    bleed_box = media
+    bleed_box = Rect(slug_pt, slug_pt, media_w - slug_pt, media_h - slug_pt)
     # In PDF coords, bottom bleed is bb, left bleed is bl.
-    trim_box = Rect(bl, bb, bl + trim_w_pt, bb + trim_h_pt)
+    trim_box = Rect(slug_pt + bl, slug_pt + bb, slug_pt + bl + trim_w_pt, slug_pt + bb + trim_h_pt)
     return media, bleed_box, trim_box
 
 
@@ -211,6 +369,246 @@ def crop_rect_for_cover(src_rect: Rect, dest_rect: Rect, anchor: str) -> Rect:
         return Rect(src_rect.x0, y0, src_rect.x1, y0 + new_h)
 
 
+_PROBE_BOXES = (("media", "/MediaBox"), ("crop", "/CropBox"), ("bleed", "/BleedBox"), ("trim", "/TrimBox"))
+
+
+def _box_list(value) -> Optional[List[float]]:
+    try:
+        box = [float(v) for v in value.get_object()]
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return box if len(box) == 4 else None
+
+
+def _probe_page_tree(reader: PdfReader) -> List[Dict]:
+    """Walk /Root/Pages and read each page's boxes and /Rotate without loading content.
+
+    MediaBox, CropBox and Rotate are inherited from parent /Pages nodes. Missing boxes
+    default the same way pypdf does: CropBox to MediaBox, Bleed/TrimBox to CropBox.
+    """
+    root = reader.trailer["/Root"].get_object()
+    pages: List[Dict] = []
+    stack = [(root["/Pages"], {})]
+    seen = set()
+    while stack:
+        ref, inherited = stack.pop()
+        key = (ref.idnum, ref.generation) if isinstance(ref, IndirectObject) else id(ref)
+        if key in seen:
+            continue  # malformed tree with a cycle
+        seen.add(key)
+        node = ref.get_object()
+        attrs = dict(inherited)
+        for name in ("/MediaBox", "/CropBox", "/Rotate"):
+            if name in node:
+                attrs[name] = node[name]
+        kids = node.get("/Kids")
+        if kids is not None and node.get("/Type") != "/Page":
+            for kid in reversed(kids.get_object()):
+                stack.append((kid, attrs))
+            continue
+        info: Dict = {}
+        for short, name in _PROBE_BOXES:
+            info[short] = _box_list(node[name]) if name in node else _box_list(attrs[name]) if name in attrs else None
+        info["media"] = info["media"] or [0.0, 0.0, 612.0, 792.0]
+        info["crop"] = info["crop"] or info["media"]
+        info["bleed"] = info["bleed"] or info["crop"]
+        info["trim"] = info["trim"] or info["crop"]
+        info["rotate"] = int(attrs.get("/Rotate", 0) or 0) % 360
+        pages.append(info)
+    return pages
+
+
+@contextlib.contextmanager
+def _open_pdf_reader(path: str, use_mmap: bool = False):
+    """PdfReader for path, optionally backed by a read-only memory map of the file.
+
+    A mapped file is read straight from the OS page cache, so workers reading the same
+    source share one copy of its pages instead of each filling their own buffers. The
+    map is closed on exit; pages already added to a PdfWriter are copies and stay valid.
+    Empty or unmappable files fall back to normal file reads.
+    """
+    mapped = None
+    if use_mmap:
+        with open(path, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                mapped = None
+    try:
+        yield PdfReader(mapped if mapped is not None else path, strict=False)
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+# Header line, any comment lines (the binary marker), then "<n> <g> obj << /Linearized ...>>".
+_LINEARIZATION_DICT = re.compile(
+    rb"%PDF-[^\r\n]*[\r\n]+(?:%[^\r\n]*[\r\n]+)*\s*\d+\s+\d+\s+obj\s*<<\s*/Linearized\s[^>]*>>"
+)
+
+
+def _linearized_page_count(path: str) -> Optional[int]:
+    """Page count from the linearization dictionary at the start of the file, if valid.
+
+    The dictionary must be the file's first object, and the hint is only trusted when
+    its /L length matches the file size: an incremental update appended after
+    linearizing (which may add or remove pages) leaves /L and /N stale.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(1024)
+            size = os.fstat(f.fileno()).st_size
+    except OSError:
+        return None
+    m = _LINEARIZATION_DICT.match(head)
+    if not m:
+        return None
+    n = re.search(rb"/N\s+(\d+)", m.group(0))
+    length = re.search(rb"/L\s+(\d+)", m.group(0))
+    if not n or not length or int(length.group(1)) != size:
+        return None
+    return int(n.group(1))
+
+
+def _probe_index_path(path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(path)), PROBE_INDEX_NAME)
+
+
+def _probe_signature(path: str) -> Dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "version": PROBE_VERSION}
+
+
+def _read_probe_index(index_path: str) -> Dict:
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _store_probe(path: str, signature: Dict, probe: Dict) -> None:
+    """Merge one probe into the folder's sidecar index. Best effort: read-only folders are skipped."""
+    index_path = _probe_index_path(path)
+    data = _read_probe_index(index_path)
+    data[os.path.basename(path)] = dict(signature, probe=probe)
+    tmp = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, index_path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _cached_probe(path: str, signature: Dict) -> Optional[Dict]:
+    entry = _read_probe_index(_probe_index_path(path)).get(os.path.basename(path))
+    if not isinstance(entry, dict) or any(entry.get(k) != v for k, v in signature.items()):
+        return None
+    return entry.get("probe")
+
+
+def probe_pdf(path: str, use_index: bool = True, use_mmap: bool = False) -> Dict:
+    """Page count and per-page geometry of a PDF without parsing page content.
+
+    Returns {"page_count": n, "pages": [{"media", "crop", "bleed", "trim": [x0, y0, x1, y1],
+    "rotate": deg}, ...]}. Only the trailer, xref and page tree are read. With use_index the
+    result is looked up in / saved to a sidecar index (PROBE_INDEX_NAME) in the file's folder,
+    keyed by file name, size and mtime, so unchanged files are never opened twice.
+    use_mmap reads the file through a memory map (see _open_pdf_reader).
+    """
+    signature = _probe_signature(path)
+    if use_index:
+        cached = _cached_probe(path, signature)
+        if cached is not None:
+            return cached
+    _load_pdf_libs()
+    with _open_pdf_reader(path, use_mmap) as reader:
+        pages = _probe_page_tree(reader)
+    probe = {"page_count": len(pages), "pages": pages}
+    if use_index:
+        _store_probe(path, signature, probe)
+    return probe
+
+
+def pdf_page_count(path: str, use_index: bool = True) -> int:
+    """Page count of a PDF, from the cheapest source that is trustworthy.
+
+    Tries the sidecar index, then the linearization hint, then the page tree root's /Count.
+    The file is read through a memory map: counting touches only the trailer and page
+    tree, where a plain PdfReader would first copy the whole file into memory.
+    """
+    if use_index:
+        try:
+            cached = _cached_probe(path, _probe_signature(path))
+        except OSError:
+            cached = None
+        if cached is not None:
+            return int(cached["page_count"])
+    count = _linearized_page_count(path)
+    if count is not None:
+        return count
+    _load_pdf_libs()
+    with _open_pdf_reader(path, use_mmap=True) as reader:
+        try:
+            return int(reader.trailer["/Root"].get_object()["/Pages"].get_object()["/Count"])
+        except (KeyError, TypeError, ValueError):
+            return len(reader.pages)
+
+
+_TIFF_EXTS = (".tif", ".tiff")
+_RASTER_EXTS = (".png", ".jpg", ".jpeg") + _TIFF_EXTS
+
+
+def tiff_frame_count(path: str) -> int:
+    """Number of frames (pages) in a TIFF, from its IFD chain alone. Handles BigTIFF."""
+    with open(path, "rb") as f:
+        head = f.read(16)
+        order = {b"II": "<", b"MM": ">"}.get(head[:2])
+        magic = struct.unpack(order + "H", head[2:4])[0] if order and len(head) >= 8 else None
+        if magic == 42:
+            count_fmt, entry_size, offset_fmt = "H", 12, "I"
+            offset = struct.unpack(order + "I", head[4:8])[0]
+        elif magic == 43 and len(head) == 16:
+            count_fmt, entry_size, offset_fmt = "Q", 20, "Q"
+            offset = struct.unpack(order + "Q", head[8:16])[0]
+        else:
+            raise ValueError(f"Not a TIFF file: {path}")
+        count_size, offset_size = struct.calcsize(count_fmt), struct.calcsize(offset_fmt)
+        frames = 0
+        seen = set()
+        while offset and offset not in seen:
+            seen.add(offset)
+            f.seek(offset)
+            raw = f.read(count_size)
+            if len(raw) < count_size:
+                break
+            f.seek(offset + count_size + struct.unpack(order + count_fmt, raw)[0] * entry_size)
+            raw = f.read(offset_size)
+            frames += 1
+            if len(raw) < offset_size:
+                break
+            offset = struct.unpack(order + offset_fmt, raw)[0]
+        return frames
+
+
+def probe_box(page_info: Dict, box: str = "auto") -> Rect:
+    """pick_pdf_box for one probe_pdf page record."""
+    b = (box or "auto").lower().strip()
+    order = [b] if b in ("trim", "bleed", "crop", "media") else []
+    for name in order + ["trim", "crop", "media"]:
+        x0, y0, x1, y1 = page_info[name]
+        r = Rect(x0, y0, x1, y1)
+        if r.width > 0 and r.height > 0:
+            return r
+    x0, y0, x1, y1 = page_info["media"]
+    return Rect(x0, y0, x1, y1)
+
+
 def _rect_to_box(r: Rect) -> RectangleObject:
     return RectangleObject((r.x0, r.y0, r.x1, r.y1))
 
@@ -278,52 +676,33 @@ def _compute_transform_stretch(src: Rect, dest: Rect, mirror_x: bool = False, mi
     return Transformation().scale(sx=sx, sy=sy).translate(tx=tx, ty=ty)
 
 
-def _place_pdf_page_return_clip(
-    out_page: PageObject,
-    src_page: PageObject,
-    dest_rect: Rect,
-    fit_mode: str,
-    anchor: str,
-    pdf_box: str,
-) -> Rect:
-    """Place a PDF page and return the clip rect used in source coordinates."""
-    src_rect = pick_pdf_box(src_page, pdf_box)
+def _placement(src_rect: Rect, dest_rect: Rect, fit_mode: str, anchor: str) -> Tuple[Rect, Transformation]:
+    """Return (clip rect in source coordinates, clip->dest transform) for placing a source box."""
     mode = (fit_mode or "fit_trim_proportional").lower().strip()
 
+    # For "fill" (cover), crop source to matching aspect to avoid overflow.
     clip = src_rect
     if mode in ("fill_bleed_proportional", "fill_trim_proportional"):
         clip = crop_rect_for_cover(src_rect, dest_rect, anchor)
 
-    page_copy = copy.copy(src_page)
-    page_copy.mediabox = _rect_to_box(clip)
-    page_copy.cropbox = _rect_to_box(clip)
-
     transform = _compute_transform(
         clip,
         dest_rect,
         "stretch_bleed" if mode in ("stretch_trim", "stretch_bleed") else mode,
         anchor,
     )
-    out_page.merge_transformed_page(page_copy, transform)
-    return clip
+    return clip, transform
 
 
-def _edge_extend_bleed(
-    out_page: PageObject,
-    src_page: PageObject,
-    clip: Rect,
-    trim_box: Rect,
-    bleed_box: Rect,
-    mode: str,
-) -> None:
-    """Fill bleed area by extending edges from the placed clip.
+def _edge_extend_slices(clip: Rect, trim_box: Rect, bleed_box: Rect, mode: str) -> List[Tuple[Rect, Transformation]]:
+    """Source slices and transforms that fill the bleed margins by extending edges of clip.
 
     mode: 'mirror' or 'smear'
     Note: This keeps the trim area untouched; only the bleed margins are filled.
     """
     mode = (mode or "").lower().strip()
     if mode not in ("mirror", "smear"):
-        return
+        return []
 
     # bleed widths (points)
     l_w = max(trim_box.x0 - bleed_box.x0, 0.0)
@@ -331,21 +710,20 @@ def _edge_extend_bleed(
     b_h = max(trim_box.y0 - bleed_box.y0, 0.0)
     t_h = max(bleed_box.y1 - trim_box.y1, 0.0)
     if l_w == r_w == b_h == t_h == 0.0:
-        return
+        return []
 
     # choose a thin slice from the source clip to stretch/mirror into bleed
     slice_w = max(min(clip.width * 0.02, 18.0), 3.0)
     slice_h = max(min(clip.height * 0.02, 18.0), 3.0)
 
+    slices: List[Tuple[Rect, Transformation]] = []
+
     def place_slice(src_slice: Rect, dest_slice: Rect, mx: bool, my: bool):
-        page_copy = copy.copy(src_page)
-        page_copy.mediabox = _rect_to_box(src_slice)
-        page_copy.cropbox = _rect_to_box(src_slice)
         if mode == "mirror":
             transform = _compute_transform_stretch(src_slice, dest_slice, mirror_x=mx, mirror_y=my)
         else:
             transform = _compute_transform_stretch(src_slice, dest_slice, mirror_x=False, mirror_y=False)
-        out_page.merge_transformed_page(page_copy, transform)
+        slices.append((src_slice, transform))
 
     # Left / Right strips
     if l_w > 0:
@@ -390,280 +768,3468 @@ def _edge_extend_bleed(
         dest_slice = Rect(trim_box.x1, trim_box.y1, bleed_box.x1, bleed_box.y1)
         place_slice(src_slice, dest_slice, mx=True, my=True)
 
+    return slices
 
 
-def _draw_crop_marks_on_page(page: PageObject, trim_box: Rect, bleed_box: Rect) -> None:
-    """Draw simple crop marks as PDF vector commands."""
-    left_bleed = trim_box.x0 - bleed_box.x0
-    right_bleed = bleed_box.x1 - trim_box.x1
-    bottom_bleed = trim_box.y0 - bleed_box.y0
-    top_bleed = bleed_box.y1 - trim_box.y1
+def _pdf_num(v: float) -> str:
+    """Compact PDF number (no exponent, trailing zeros trimmed)."""
+    out = f"{float(v):.6f}".rstrip("0").rstrip(".")
+    return "0" if out in ("", "-0") else out
 
-    tick = min(max(min(left_bleed, right_bleed, bottom_bleed, top_bleed) * 0.66, 6), 18)
-    lw = 0.25
 
-    x0, y0, x1, y1 = trim_box.x0, trim_box.y0, trim_box.x1, trim_box.y1
+def _page_form_xobject(src_page: PageObject, bbox: Rect) -> Optional[StreamObject]:
+    """Wrap a source page's content stream and resources as a Form XObject.
 
-    lines = [
-        # horizontal
-        (x0 - tick, y0, x0, y0),
-        (x1, y0, x1 + tick, y0),
-        (x0 - tick, y1, x0, y1),
-        (x1, y1, x1 + tick, y1),
-        # vertical
-        (x0, y0 - tick, x0, y0),
-        (x1, y0 - tick, x1, y0),
-        (x0, y1, x0, y1 + tick),
-        (x1, y1, x1, y1 + tick),
-    ]
+    A single filtered content stream is reused as-is; multiple or unfiltered streams
+    are joined and Flate-compressed. The content is never parsed. A page /Group (its
+    transparency group, e.g. a CMYK blending space) becomes the form's /Group so the
+    artwork still blends the way it was authored.
+    """
+    contents = src_page.get("/Contents")
+    if contents is None:
+        return None
+    contents = contents.get_object()
+    if isinstance(contents, ArrayObject):
+        joined = src_page.get_contents()
+        if joined is None:
+            return None
+        form = DecodedStreamObject()
+        form.set_data(joined.get_data())
+        form = form.flate_encode()
+    elif isinstance(contents, EncodedStreamObject):
+        form = copy.copy(contents)
+        form.pop("/Length", None)
+    elif isinstance(contents, StreamObject):
+        # unfiltered or freshly generated (e.g. merged) content
+        form = DecodedStreamObject()
+        form.set_data(contents.get_data())
+        form = form.flate_encode()
+    else:
+        return None
 
-    # PDF content stream
-    parts = [
-        "q\n",
-        "0 0 0 RG\n",  # stroke color
-        f"{lw} w\n",
-    ]
-    for xA, yA, xB, yB in lines:
-        parts.append(f"{xA:.4f} {yA:.4f} m {xB:.4f} {yB:.4f} l S\n")
-    parts.append("Q\n")
-    content = "".join(parts).encode("ascii")
-    page.add_content(content)
+    form[NameObject("/Type")] = NameObject("/XObject")
+    form[NameObject("/Subtype")] = NameObject("/Form")
+    form[NameObject("/BBox")] = _rect_to_box(bbox)
+    resources = src_page.get("/Resources")
+    form[NameObject("/Resources")] = resources if resources is not None else DictionaryObject()
+    group = src_page.get("/Group")
+    if group is not None:
+        form[NameObject("/Group")] = group
+    return form
 
 
-def _image_to_single_page_pdf_bytes(img_path: str) -> bytes:
-    """Convert a raster image to a 1-page PDF (in memory) using Pillow."""
-    img = Image.open(img_path)
-    if img.mode not in ("RGB", "L"):
-        img = img.convert("RGB")
-    bio = io.BytesIO()
-    img.save(bio, format="PDF")
-    return bio.getvalue()
+def _form_draw_ops(name: str, placements: Iterable[Tuple[Rect, Tuple[float, ...]]]) -> bytes:
+    """Content-stream ops drawing XObject `name` once per (clip, ctm) placement."""
+    parts = []
+    for clip, ctm in placements:
+        cm = " ".join(_pdf_num(v) for v in ctm)
+        re_ = " ".join(_pdf_num(v) for v in (clip.x0, clip.y0, clip.width, clip.height))
+        parts.append(f"q {cm} cm {re_} re W n {name} Do Q\n")
+    return "".join(parts).encode("ascii")
 
 
-def _place_pdf_page(
-    out_page: PageObject,
-    src_page: PageObject,
-    dest_rect: Rect,
-    fit_mode: str,
-    anchor: str,
-    pdf_box: str,
+def _draw_form_ops(out_page: PageObject, name: str, form: StreamObject, ops: bytes) -> None:
+    """Register form as XObject `name` on out_page and append precomputed draw ops."""
+    resources = out_page.get("/Resources")
+    resources = resources.get_object() if resources is not None else DictionaryObject()
+    xobjects = resources.get("/XObject")
+    xobjects = xobjects.get_object() if xobjects is not None else DictionaryObject()
+    xobjects[NameObject(name)] = form
+    resources[NameObject("/XObject")] = xobjects
+    out_page[NameObject("/Resources")] = resources
+    _append_content(out_page, ops)
+
+
+# Annotation keys that point back into the source document (its page, popups, replies,
+# structure tree, in-document destinations); a carried copy drops them.
+_ANNOT_SOURCE_KEYS = ("/P", "/Parent", "/Popup", "/IRT", "/StructParent", "/Dest")
+
+
+# Annotation keys holding flat x y x y ... lists in page space (/InkList is a list of them).
+_ANNOT_POINT_KEYS = ("/QuadPoints", "/L", "/Vertices", "/CL")
+
+
+def _map_points(values, point) -> ArrayObject:
+    coords = [float(v) for v in values.get_object()]
+    return ArrayObject(FloatObject(v) for i in range(0, len(coords) - 1, 2) for v in point(coords[i], coords[i + 1]))
+
+
+def _carry_annotations(
+    out_page: PageObject, src_page: PageObject, placements: Iterable[Tuple[Rect, Tuple[float, ...]]]
 ) -> None:
-    """Place a PDF page onto out_page using pypdf."""
-    src_rect = pick_pdf_box(src_page, pdf_box)
-    mode = (fit_mode or "fit_trim_proportional").lower().strip()
+    """Copy src_page's annotations onto out_page once per (clip, ctm) placement.
 
-    # For "fill" (cover), crop source to matching aspect to avoid overflow.
-    clip = src_rect
-    if mode in ("fill_bleed_proportional", "fill_trim_proportional"):
-        clip = crop_rect_for_cover(src_rect, dest_rect, anchor)
+    A page drawn as a Form XObject loses its /Annots, which belong to the page rather
+    than its content. Each copy gets its /Rect and point lists (/QuadPoints, /L, ...)
+    mapped through ctm; annotations outside clip, popups and in-document links are not
+    carried. The copies are direct objects; _add_output_page makes them indirect.
+    """
+    annots = src_page.get("/Annots")
+    annots = annots.get_object() if annots is not None else None
+    if not annots:
+        return
+    carried = []
+    for clip, ctm in placements:
+        a, b, c, d, e, f = ctm
 
-    # Create a shallow copy of page with adjusted boxes so pypdf turns it into a form with BBox
-    # matching our clip (acts as a clip boundary when merged).
-    # pypdf PageObject isn't guaranteed to have a .copy() across versions
-    page_copy = copy.copy(src_page)
-    page_copy.mediabox = _rect_to_box(clip)
-    page_copy.cropbox = _rect_to_box(clip)
+        def point(x, y):
+            return a * x + c * y + e, b * x + d * y + f
 
-    # compute transform from clip->dest
-    transform = _compute_transform(clip, dest_rect, "stretch_bleed" if mode in ("stretch_trim", "stretch_bleed") else mode, anchor)
-    out_page.merge_transformed_page(page_copy, transform)
+        for ref in annots:
+            annot = ref.get_object()
+            if not isinstance(annot, DictionaryObject) or annot.get("/Subtype") == "/Popup":
+                continue
+            action = annot.get("/A")
+            if action is not None and action.get_object().get("/S") == "/GoTo":
+                continue
+            try:
+                x0, y0, x1, y1 = (float(v) for v in annot["/Rect"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            x0, x1, y0, y1 = min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)
+            if min(x1, clip.x1) <= max(x0, clip.x0) or min(y1, clip.y1) <= max(y0, clip.y0):
+                continue
+            copy_ = DictionaryObject({k: v for k, v in annot.items() if k not in _ANNOT_SOURCE_KEYS})
+            (px0, py0), (px1, py1) = point(x0, y0), point(x1, y1)
+            copy_[NameObject("/Rect")] = _rect_to_box(Rect(min(px0, px1), min(py0, py1), max(px0, px1), max(py0, py1)))
+            for key in _ANNOT_POINT_KEYS:
+                if key in annot:
+                    copy_[NameObject(key)] = _map_points(annot[key], point)
+            if "/InkList" in annot:
+                copy_[NameObject("/InkList")] = ArrayObject(_map_points(path, point) for path in annot["/InkList"])
+            carried.append(copy_)
+    if carried:
+        existing = out_page.get("/Annots")
+        existing = list(existing.get_object()) if existing is not None else []
+        out_page[NameObject("/Annots")] = ArrayObject(existing + carried)
 
 
-def build_press_pdf(job: Dict) -> List[str]:
-    """Build press PDFs from the job spec. Returns created PDF paths."""
-    layout = job.get("layout", {})
-    output = job.get("output", {})
-    inputs = job.get("inputs", [])
+def _add_output_page(writer: PdfWriter, page: PageObject) -> PageObject:
+    """writer.add_page, then give carried annotations their own objects pointing at the page."""
+    added = writer.add_page(page)
+    annots = added.get("/Annots")
+    if annots is not None:
+        annots = annots.get_object()
+        for i, annot in enumerate(annots):
+            if isinstance(annot, DictionaryObject):
+                annot[NameObject("/P")] = added.indirect_reference
+                annots[i] = _PypdfPrivate.add_object(writer, annot)
+    return added
 
-    if not inputs:
-        raise ValueError("No inputs provided")
 
-    trim = layout.get("trim", {})
-    unit = trim.get("unit", "in")
-    trim_w_pt = to_points(float(trim["w"]), unit)
-    trim_h_pt = to_points(float(trim["h"]), unit)
+def _place_pdf_page_with_bleed(out_page: PageObject, src_page: PageObject, placed: "PagePlacement") -> None:
+    """Place a PDF page into trim and fill the bleed by edge extension (mirror/smear).
 
-    bleed = layout.get("bleed", {"top": 0, "right": 0, "bottom": 0, "left": 0, "unit": unit})
-    if "unit" not in bleed:
-        bleed["unit"] = unit
+    The source page becomes one Form XObject drawn once for the trim area and once
+    per bleed slice, instead of merging (re-parsing and re-writing) the page nine times.
+    Annotations are carried over once, for the trim placement.
+    """
+    form = _page_form_xobject(src_page, placed.clip)
+    if form is None:
+        return
+    _draw_form_ops(out_page, "/PDSrc", form, placed.draw_ops)
+    _carry_annotations(out_page, src_page, ((placed.clip, placed.ctm),))
 
-    media_box, bleed_box, trim_box = compute_boxes(trim_w_pt, trim_h_pt, bleed)
 
-    fit_mode = layout.get("fit_mode", "fit_trim_proportional")
-    anchor = layout.get("anchor", "center")
+# layout["bleed_preflight"] for mirror/smear: "boxes" uses a source page's own bleed when its
+# BleedBox (or MediaBox) covers the output bleed; "content" additionally requires the painted
+# content to reach that far; "off" always generates bleed.
+BLEED_PREFLIGHT_MODES = ("boxes", "content", "off")
 
-    bleed_generator = (layout.get("bleed_generator", "none") or "none").lower().strip()
+# Coverage slack in source points, so boxes rounded to a few decimals still qualify.
+_PREFLIGHT_TOLERANCE = 0.01
 
-    # When using edge-extend bleed, we place the main content into trim, then fill bleed margins.
-    fit_mode_for_trim = (fit_mode or "fit_trim_proportional").lower().strip()
-    if bleed_generator in ("mirror", "smear"):
-        if fit_mode_for_trim == "fit_bleed_proportional":
-            fit_mode_for_trim = "fit_trim_proportional"
-        elif fit_mode_for_trim == "fill_bleed_proportional":
-            fit_mode_for_trim = "fill_trim_proportional"
-        elif fit_mode_for_trim == "stretch_bleed":
-            fit_mode_for_trim = "stretch_trim"
-    marks = layout.get("marks", {})
-    add_crop_marks = bool(marks.get("crop_marks", False))
 
-    out_dir = output.get("dir", os.getcwd())
-    os.makedirs(out_dir, exist_ok=True)
-    base = output.get("basename", "output")
+def _intersect(a: Optional[Rect], b: Optional[Rect]) -> Optional[Rect]:
+    if a is None or b is None:
+        return a if b is None else b
+    r = Rect(max(a.x0, b.x0), max(a.y0, b.y0), min(a.x1, b.x1), min(a.y1, b.y1))
+    return r if r.width > 0 and r.height > 0 else Rect(r.x0, r.y0, r.x0, r.y0)
 
-    created: List[str] = []
 
-    def dest_for_mode(mode: str) -> Rect:
-        m = (mode or "").lower().strip()
-        if m.endswith("_bleed") or "bleed" in m:
-            return bleed_box
-        return trim_box
+def _covers(outer: Rect, inner: Rect, tol: float = _PREFLIGHT_TOLERANCE) -> bool:
+    return (
+        outer.x0 <= inner.x0 + tol and outer.y0 <= inner.y0 + tol
+        and outer.x1 >= inner.x1 - tol and outer.y1 >= inner.y1 - tol
+    )
 
-    # Build one output PDF per input file (simple + matches v0.1 behavior)
-    for item in inputs:
-        in_path = item["path"]
-        in_name = os.path.splitext(os.path.basename(in_path))[0]
-        # If the UI already set basename to include the input name, avoid duplicating it.
-        if len(inputs) == 1:
-            out_path = os.path.join(out_dir, f"{base}.pdf")
-        else:
-            out_path = os.path.join(out_dir, f"{base}__{in_name}.pdf")
 
-        ext = os.path.splitext(in_path)[1].lower()
-        writer = PdfWriter()
-        dest_rect = dest_for_mode(fit_mode)
+def _source_bleed_rect(page: PageObject) -> Rect:
+    """Area of a source page that may be used as bleed: its BleedBox if set, else its MediaBox."""
+    media = _rect_from_pypdf_box(page.mediabox)
+    if "/BleedBox" not in page:
+        return media
+    try:
+        return _intersect(media, _rect_from_pypdf_box(page.bleedbox))
+    except Exception:
+        return media
 
-        if ext == ".pdf":
-            reader = PdfReader(in_path)
-            pages = parse_page_range(item.get("pages", "all"), len(reader.pages))
-            pdf_box = item.get("pdf_box", "auto")
 
-            for pno in pages:
-                src_page = reader.pages[pno]
-                out_page = PageObject.create_blank_page(width=media_box.width, height=media_box.height)
-                out_page.mediabox = _rect_to_box(media_box)
-                out_page.bleedbox = _rect_to_box(bleed_box)
-                out_page.trimbox = _rect_to_box(trim_box)
-                out_page.cropbox = _rect_to_box(bleed_box)
-
-                if bleed_generator in ("mirror", "smear"):
-                    clip = _place_pdf_page_return_clip(out_page, src_page, trim_box, fit_mode_for_trim, anchor, pdf_box)
-                    _edge_extend_bleed(out_page, src_page, clip, trim_box, bleed_box, mode=bleed_generator)
-                else:
-                    _place_pdf_page(out_page, src_page, dest_rect, fit_mode, anchor, pdf_box)
-                if add_crop_marks:
-                    _draw_crop_marks_on_page(out_page, trim_box, bleed_box)
-                writer.add_page(out_page)
-
-        elif ext in (".png", ".jpg", ".jpeg"):
-            # convert raster to single-page PDF then treat as PDF
-            pdf_bytes = _image_to_single_page_pdf_bytes(in_path)
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            src_page = reader.pages[0]
-            out_page = PageObject.create_blank_page(width=media_box.width, height=media_box.height)
-            out_page.mediabox = _rect_to_box(media_box)
-            out_page.bleedbox = _rect_to_box(bleed_box)
-            out_page.trimbox = _rect_to_box(trim_box)
-            out_page.cropbox = _rect_to_box(bleed_box)
-
-            if bleed_generator in ("mirror", "smear"):
-                clip = _place_pdf_page_return_clip(out_page, src_page, trim_box, fit_mode_for_trim, anchor, pdf_box="media")
-                _edge_extend_bleed(out_page, src_page, clip, trim_box, bleed_box, mode=bleed_generator)
-            else:
-                _place_pdf_page(out_page, src_page, dest_rect, fit_mode, anchor, pdf_box="media")
-            if add_crop_marks:
-                _draw_crop_marks_on_page(out_page, trim_box, bleed_box)
-            writer.add_page(out_page)
+def _mat_mul(m: Tuple[float, ...], n: Tuple[float, ...]) -> Tuple[float, ...]:
+    """m x n for PDF matrices [a b c d e f] (m applied first)."""
+    return (
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    )
 
-        else:
-            raise ValueError(f"Unsupported input type: {ext} (supported: pdf, png, jpg, jpeg)")
 
-        with open(out_path, "wb") as f:
-            writer.write(f)
+def _transform_rect(m: Tuple[float, ...], x0: float, y0: float, x1: float, y1: float) -> Rect:
+    xs, ys = [], []
+    for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1)):
+        xs.append(m[0] * x + m[2] * y + m[4])
+        ys.append(m[1] * x + m[3] * y + m[5])
+    return Rect(min(xs), min(ys), max(xs), max(ys))
 
-        created.append(out_path)
 
-    return created
+_PAINT_OPS = frozenset((b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*", b"n"))
 
 
-def write_job_json(job: Dict, path: str) -> None:
-    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(job, f, indent=2)
+def _content_bbox(page: PageObject) -> Optional[Rect]:
+    """Bounding box of what a page's content stream paints, in page space, without rasterizing.
 
+    Follows q/Q/cm and W clipping, and counts path painting (by control points), images,
+    inline images, shadings (the clip) and form XObjects (their /BBox). Text is ignored,
+    so the result never overstates how far full-bleed artwork reaches. None when nothing
+    is painted or the content cannot be parsed.
+    """
+    try:
+        contents = page.get_contents()
+        operations = contents.operations if contents is not None else []
+    except Exception:
+        return None
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else {}
+    xobjects = resources.get("/XObject")
+    xobjects = xobjects.get_object() if xobjects is not None else {}
 
-def load_presets(preset_path: str) -> Dict[str, Dict]:
-    """Load presets.json from the presets folder."""
-    with open(preset_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, dict):
-        raise ValueError("Presets file must be a JSON object")
-    return data
+    ctm: Tuple[float, ...] = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    clip: Optional[Rect] = None
+    stack: List[Tuple[Tuple[float, ...], Optional[Rect]]] = []
+    path: Optional[Rect] = None
+    pending_clip = False
+    painted: Optional[Rect] = None
 
+    def add_path(x0: float, y0: float, x1: float, y1: float) -> None:
+        nonlocal path
+        r = _transform_rect(ctm, x0, y0, x1, y1)
+        path = r if path is None else Rect(min(path.x0, r.x0), min(path.y0, r.y0), max(path.x1, r.x1), max(path.y1, r.y1))
 
-def make_job(
-    *,
-    input_path: str,
-    pages_spec: str,
-    pdf_box: str,
-    trim_size_spec: str,
-    bleed_spec: str,
-    fit_mode: str,
-    anchor: str,
-    bleed_generator: str = "none",
-    crop_marks: bool,
-    out_dir: str,
-    basename: Optional[str] = None,
-    emit_job: bool = False,
-) -> Dict:
-    """Create a job dict compatible with both Python output and InDesign JSX."""
-    w, h, unit = parse_size(trim_size_spec)
-    bleed_vals = parse_bleed(bleed_spec, unit)
+    def paint(r: Optional[Rect]) -> None:
+        nonlocal painted
+        r = _intersect(r, clip) if clip is not None else r
+        if r is None or r.width <= 0 or r.height <= 0:
+            return
+        painted = r if painted is None else Rect(
+            min(painted.x0, r.x0), min(painted.y0, r.y0), max(painted.x1, r.x1), max(painted.y1, r.y1)
+        )
 
-    if basename is None or basename.strip() == "":
-        basename = os.path.splitext(os.path.basename(input_path))[0]
+    try:
+        for operands, op in operations:
+            if op == b"q":
+                stack.append((ctm, clip))
+            elif op == b"Q":
+                if stack:
+                    ctm, clip = stack.pop()
+            elif op == b"cm":
+                ctm = _mat_mul(tuple(float(v) for v in operands), ctm)
+            elif op == b"re":
+                x, y, w, h = (float(v) for v in operands)
+                add_path(min(x, x + w), min(y, y + h), max(x, x + w), max(y, y + h))
+            elif op in (b"m", b"l", b"c", b"v", b"y"):
+                coords = [float(v) for v in operands]
+                for i in range(0, len(coords) - 1, 2):
+                    add_path(coords[i], coords[i + 1], coords[i], coords[i + 1])
+            elif op in (b"W", b"W*"):
+                pending_clip = True
+            elif op in _PAINT_OPS:
+                if op != b"n":
+                    paint(path)
+                if pending_clip and path is not None:
+                    clip = _intersect(clip, path)
+                path, pending_clip = None, False
+            elif op == b"sh":
+                paint(clip if clip is not None else _rect_from_pypdf_box(page.mediabox))
+            elif op == b"INLINE IMAGE":
+                paint(_transform_rect(ctm, 0, 0, 1, 1))
+            elif op == b"Do" and operands:
+                xobj = xobjects.get(operands[0])
+                xobj = xobj.get_object() if xobj is not None else None
+                if xobj is None:
+                    continue
+                if xobj.get("/Subtype") == "/Image":
+                    paint(_transform_rect(ctm, 0, 0, 1, 1))
+                elif xobj.get("/Subtype") == "/Form" and xobj.get("/BBox") is not None:
+                    matrix = tuple(float(v) for v in xobj.get("/Matrix", (1, 0, 0, 1, 0, 0)))
+                    x0, y0, x1, y1 = (float(v) for v in xobj["/BBox"])
+                    paint(_transform_rect(_mat_mul(matrix, ctm), min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)))
+    except (TypeError, ValueError):
+        return None
+    return painted
 
-    # If input is a PDF, compute page_count so the InDesign JSX can safely handle pages='all'
-    input_abs = os.path.abspath(input_path)
-    ext = os.path.splitext(input_abs)[1].lower()
-    page_count = None
-    if ext == ".pdf":
-        try:
-            reader = PdfReader(input_abs)
-            page_count = len(reader.pages)
-        except Exception:
-            page_count = None
-        if page_count and (pages_spec or "").strip().lower() == "all":
-            pages_spec = f"1-{page_count}"
 
-    job: Dict = {
-        "inputs": [
-            {
-                "path": input_abs,
-                "pages": pages_spec,
-                "pdf_box": pdf_box,
-                "page_count": page_count,
-            }
-        ],
-        "layout": {
-            "trim": {"w": w, "h": h, "unit": unit},
-            "bleed": {
-                "top": bleed_vals["top"],
-                "right": bleed_vals["right"],
-                "bottom": bleed_vals["bottom"],
-                "left": bleed_vals["left"],
-                "unit": unit,
-            },
-            "fit_mode": fit_mode,
-            "anchor": anchor,
-            "bleed_generator": (bleed_generator or "none").lower().strip(),
-            "auto_rotate": False,
-            "marks": {"crop_marks": bool(crop_marks)},
-        },
+def _preflight_bleed(src_page: PageObject, plan: "LayoutPlan", src_rect: Rect) -> Optional["PagePlacement"]:
+    """Placement that uses the source page's own bleed, or None to generate it.
+
+    Built on the compiled trim placement (pick_pdf_box + compute_boxes): the output bleed
+    box is mapped back into source space and must lie inside the source's bleed area,
+    and, in "content" mode, inside the content bbox as well.
+    """
+    mode = plan.settings["bleed_preflight"]
+    if mode == "off":
+        return None
+    available = _source_bleed_rect(src_page)
+    placed = plan.source_bleed_placement(src_rect, available)
+    if placed is None or mode != "content":
+        return placed
+    content = _content_bbox(src_page)
+    return placed if content is not None and _covers(content, placed.clip) else None
+
+
+# Default margin around the bleed for registration targets, color bars and the slug line.
+MARKS_SLUG_AREA_PT = 36.0
+
+# CMYK patches for the color bar: solids, overprints, then a black tint ramp.
+_COLOR_BAR = (
+    (1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1),
+    (1, 1, 0, 0), (0, 1, 1, 0), (1, 0, 1, 0),
+    (0, 0, 0, 0.75), (0, 0, 0, 0.5), (0, 0, 0, 0.25),
+)
+
+
+def _slug_text(job: Dict, template: str) -> str:
+    """Fill {basename}, {trim}, {date} and any job["info"] key (e.g. {job}, {ticket}) in a slug line.
+
+    Only plain {name} fields are filled; unknown names are left as written. Attribute, index,
+    conversion and format-spec fields ({x.y}, {x[0]}, {x!r}, {x:>9}) raise ValueError, as the
+    template and job["info"] may come from a job file.
+    """
+    if not template:
+        return ""
+    trim = job.get("layout", {}).get("trim", {})
+    fields = {
+        "basename": job.get("output", {}).get("basename", ""),
+        "trim": f"{float(trim.get('w', 0)):g}x{float(trim.get('h', 0)):g}{trim.get('unit', '')}",
+        "date": time.strftime("%Y-%m-%d"),
+    }
+    fields.update({str(k): v for k, v in (job.get("info") or {}).items()})
+    parts = []
+    for literal, name, spec, conversion in string.Formatter().parse(str(template)):
+        parts.append(literal)
+        if name is None:
+            continue
+        if not name.isidentifier() or spec or conversion:
+            field = name + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "")
+            raise ValueError(f"Slug fields must be plain names like {{basename}}, got {{{field}}}")
+        parts.append(str(fields[name]) if name in fields else "{" + name + "}")
+    return "".join(parts)
+
+
+def _resolve_marks(job: Dict, unit: str) -> Tuple[Optional[Dict], float]:
+    """Normalized job["layout"]["marks"] (or None when no marks are drawn) and the slug area in points.
+
+      crop_marks    trim marks at the corners
+      registration  registration targets centered on each side, outside the bleed
+      color_bars    CMYK solid / overprint / tint patches along the top
+      slug          one line of text below the bleed; {basename}, {trim}, {date} and job["info"]
+                    keys are filled in
+      slug_area     margin outside the bleed for the above, in the layout unit
+                    (default MARKS_SLUG_AREA_PT when any of them is on, else 0)
+    """
+    marks = job.get("layout", {}).get("marks", {}) or {}
+    spec = {
+        "crop_marks": bool(marks.get("crop_marks", False)),
+        "registration": bool(marks.get("registration", False)),
+        "color_bars": bool(marks.get("color_bars", False)),
+        "slug": _slug_text(job, marks.get("slug") or ""),
+    }
+    extras = spec["registration"] or spec["color_bars"] or bool(spec["slug"])
+    area = marks.get("slug_area")
+    slug_pt = to_points(float(area), unit) if area is not None else (MARKS_SLUG_AREA_PT if extras else 0.0)
+    if not (spec["crop_marks"] or extras):
+        return None, slug_pt
+    return spec, max(slug_pt, 0.0)
+
+
+def _crop_mark_ops(trim_box: Rect, bleed_box: Rect, slug_pt: float) -> List[str]:
+    left_bleed = trim_box.x0 - bleed_box.x0
+    right_bleed = bleed_box.x1 - trim_box.x1
+    bottom_bleed = trim_box.y0 - bleed_box.y0
+    top_bleed = bleed_box.y1 - trim_box.y1
+    x0, y0, x1, y1 = trim_box.x0, trim_box.y0, trim_box.x1, trim_box.y1
+
+    if slug_pt > 0:
+        # marks sit in the slug area, starting at the bleed edge
+        tick = min(18.0, slug_pt * 0.5)
+        lines = [
+            (bleed_box.x0 - tick, y0, bleed_box.x0, y0),
+            (bleed_box.x1, y0, bleed_box.x1 + tick, y0),
+            (bleed_box.x0 - tick, y1, bleed_box.x0, y1),
+            (bleed_box.x1, y1, bleed_box.x1 + tick, y1),
+            (x0, bleed_box.y0 - tick, x0, bleed_box.y0),
+            (x1, bleed_box.y0 - tick, x1, bleed_box.y0),
+            (x0, bleed_box.y1, x0, bleed_box.y1 + tick),
+            (x1, bleed_box.y1, x1, bleed_box.y1 + tick),
+        ]
+    else:
+        tick = min(max(min(left_bleed, right_bleed, bottom_bleed, top_bleed) * 0.66, 6), 18)
+        lines = [
+            # horizontal
+            (x0 - tick, y0, x0, y0),
+            (x1, y0, x1 + tick, y0),
+            (x0 - tick, y1, x0, y1),
+            (x1, y1, x1 + tick, y1),
+            # vertical
+            (x0, y0 - tick, x0, y0),
+            (x1, y0 - tick, x1, y0),
+            (x0, y1, x0, y1 + tick),
+            (x1, y1, x1, y1 + tick),
+        ]
+
+    parts = ["q\n", "0 0 0 RG\n", "0.25 w\n"]
+    for xA, yA, xB, yB in lines:
+        parts.append(f"{xA:.4f} {yA:.4f} m {xB:.4f} {yB:.4f} l S\n")
+    parts.append("Q\n")
+    return parts
+
+
+def _registration_target_ops(cx: float, cy: float, r: float) -> str:
+    """Circle plus crosshair, stroked in the registration (/All) color."""
+    k = 0.5523 * r
+    n = _pdf_num
+    return (
+        f"{n(cx + r)} {n(cy)} m "
+        f"{n(cx + r)} {n(cy + k)} {n(cx + k)} {n(cy + r)} {n(cx)} {n(cy + r)} c "
+        f"{n(cx - k)} {n(cy + r)} {n(cx - r)} {n(cy + k)} {n(cx - r)} {n(cy)} c "
+        f"{n(cx - r)} {n(cy - k)} {n(cx - k)} {n(cy - r)} {n(cx)} {n(cy - r)} c "
+        f"{n(cx + k)} {n(cy - r)} {n(cx + r)} {n(cy - k)} {n(cx + r)} {n(cy)} c S\n"
+        f"{n(cx - 1.5 * r)} {n(cy)} m {n(cx + 1.5 * r)} {n(cy)} l S\n"
+        f"{n(cx)} {n(cy - 1.5 * r)} m {n(cx)} {n(cy + 1.5 * r)} l S\n"
+    )
+
+
+def _pdf_text(text: str) -> str:
+    raw = text.encode("latin-1", "replace").decode("latin-1")
+    return raw.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _marks_ops(spec: Dict, trim_box: Rect, bleed_box: Rect, slug_pt: float) -> bytes:
+    """Content stream for all printer's marks of a layout, in output page coordinates."""
+    parts: List[str] = []
+    if spec["crop_marks"]:
+        parts.extend(_crop_mark_ops(trim_box, bleed_box, slug_pt))
+    if slug_pt <= 0:
+        return "".join(parts).encode("ascii")
+
+    mid_x = (trim_box.x0 + trim_box.x1) / 2.0
+    mid_y = (trim_box.y0 + trim_box.y1) / 2.0
+    half = slug_pt / 2.0
+    r = min(slug_pt * 0.25, 8.0)
+    if spec["registration"]:
+        parts.append("q /PDReg CS 1 SCN 0.3 w\n")
+        for cx, cy in ((mid_x, bleed_box.y1 + half), (mid_x, bleed_box.y0 - half),
+                       (bleed_box.x0 - half, mid_y), (bleed_box.x1 + half, mid_y)):
+            parts.append(_registration_target_ops(cx, cy, r))
+        parts.append("Q\n")
+    if spec["color_bars"]:
+        size = min(slug_pt * 0.4, 12.0)
+        # top edge, left of the centre target (or the full width without one)
+        limit = (mid_x - 2 * r) if spec["registration"] else bleed_box.x1
+        count = min(len(_COLOR_BAR), int((limit - trim_box.x0) // size))
+        y = bleed_box.y1 + half - size / 2.0
+        parts.append("q\n")
+        for i, (c, m, yy, k) in enumerate(_COLOR_BAR[:max(count, 0)]):
+            x = trim_box.x0 + i * size
+            parts.append(f"{c:g} {m:g} {yy:g} {k:g} k {_pdf_num(x)} {_pdf_num(y)} {_pdf_num(size)} {_pdf_num(size)} re f\n")
+        parts.append("Q\n")
+    if spec["slug"]:
+        # bottom edge, right of the centre target (or from the trim edge without one)
+        size = min(7.0, slug_pt * 0.25)
+        x = (mid_x + 2 * r) if spec["registration"] else trim_box.x0
+        y = bleed_box.y0 - half - size / 3.0
+        parts.append(
+            f"q /PDReg cs 1 scn BT /PDSlug {_pdf_num(size)} Tf {_pdf_num(x)} {_pdf_num(y)} Td "
+            f"({_pdf_text(spec['slug'])}) Tj ET Q\n"
+        )
+    return "".join(parts).encode("latin-1")
+
+
+def _marks_form(settings: Dict) -> StreamObject:
+    """A fresh Form XObject holding the layout's marks, to be added once per output writer."""
+    spec = settings["marks"]
+    resources = DictionaryObject()
+    if spec["registration"] or spec["slug"]:
+        all_plates = DictionaryObject({
+            NameObject("/FunctionType"): NumberObject(2),
+            NameObject("/Domain"): ArrayObject([NumberObject(0), NumberObject(1)]),
+            NameObject("/C0"): ArrayObject([NumberObject(0)] * 4),
+            NameObject("/C1"): ArrayObject([NumberObject(1)] * 4),
+            NameObject("/N"): NumberObject(1),
+        })
+        resources[NameObject("/ColorSpace")] = DictionaryObject({
+            NameObject("/PDReg"): ArrayObject([
+                NameObject("/Separation"), NameObject("/All"), NameObject("/DeviceCMYK"), all_plates,
+            ]),
+        })
+    if spec["slug"]:
+        resources[NameObject("/Font")] = DictionaryObject({
+            NameObject("/PDSlug"): DictionaryObject({
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+                NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+            }),
+        })
+    form = DecodedStreamObject()
+    form.set_data(settings["marks_ops"])
+    form = form.flate_encode()
+    form[NameObject("/Type")] = NameObject("/XObject")
+    form[NameObject("/Subtype")] = NameObject("/Form")
+    form[NameObject("/BBox")] = _rect_to_box(settings["media_box"])
+    form[NameObject("/Resources")] = resources
+    return form
+
+
+def _append_content(page: PageObject, data: bytes) -> None:
+    """Append raw content-stream bytes to an (unattached) output page."""
+    existing = page.get_contents()
+    stream = DecodedStreamObject()
+    stream.set_data((existing.get_data() + b"\n" if existing is not None else b"") + data)
+    page[NameObject("/Contents")] = stream
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@contextlib.contextmanager
+def _open_raster(img_path: str, frame: int = 0) -> Iterator[Image.Image]:
+    """Open a raster file positioned at frame (multi-page TIFF). Pixels are decoded on use only."""
+    with Image.open(img_path) as img:
+        if frame:
+            img.seek(frame)
+        yield img
+
+
+def _raster_info(img_path: str, frame: int = 0) -> Dict:
+    """Read size, DPI, format, mode and encoded size of one frame without decoding pixels."""
+    with _open_raster(img_path, frame) as img:
+        dpi = img.info.get("dpi")
+        if img.format == "TIFF":
+            # this frame's strips or tiles, not the whole file
+            encoded = sum(img.tag_v2.get(279) or img.tag_v2.get(325) or ())
+        else:
+            encoded = os.path.getsize(img_path)
+        return {
+            "width": int(img.size[0]),
+            "height": int(img.size[1]),
+            "dpi": (float(dpi[0]), float(dpi[1])) if dpi and dpi[0] and dpi[1] else None,
+            "format": img.format,
+            "mode": img.mode,
+            "bytes": int(encoded),
+        }
+
+
+def _png_flate_passthrough(data: bytes) -> Optional[StreamObject]:
+    """Image XObject carrying a PNG file's IDAT data as-is, or None if PDF can't read it.
+
+    PNG image data is a zlib stream with PNG row predictors, which is exactly
+    FlateDecode with /Predictor 15. Only non-interlaced gray/RGB at 8 or 16 bits
+    qualify; anything with alpha or a palette returns None and is decoded instead.
+    """
+    if not data.startswith(_PNG_SIGNATURE):
+        return None
+    pos = len(_PNG_SIGNATURE)
+    header = None
+    idat: List[bytes] = []
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if ctype == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif ctype == b"IDAT":
+            idat.append(body)
+        elif ctype == b"IEND":
+            break
+    if header is None or not idat:
+        return None
+    width, height, bits, color_type, _, _, interlace = header
+    if interlace != 0 or bits not in (8, 16) or color_type not in (0, 2):
+        return None
+    img_obj = _encoded_stream(b"".join(idat), "/FlateDecode")
+    img_obj[NameObject("/DecodeParms")] = DictionaryObject({
+        NameObject("/Predictor"): NumberObject(15),
+        NameObject("/Colors"): NumberObject(1 if color_type == 0 else 3),
+        NameObject("/BitsPerComponent"): NumberObject(bits),
+        NameObject("/Columns"): NumberObject(width),
+    })
+    img_obj[NameObject("/Type")] = NameObject("/XObject")
+    img_obj[NameObject("/Subtype")] = NameObject("/Image")
+    img_obj[NameObject("/Width")] = NumberObject(width)
+    img_obj[NameObject("/Height")] = NumberObject(height)
+    img_obj[NameObject("/ColorSpace")] = NameObject("/DeviceGray" if color_type == 0 else "/DeviceRGB")
+    img_obj[NameObject("/BitsPerComponent")] = NumberObject(bits)
+    return img_obj
+
+
+# TIFF Compression values whose strip data a PDF filter reads as-is
+_TIFF_CCITT_G3, _TIFF_CCITT_G4, _TIFF_LZW, _TIFF_JPEG = 3, 4, 5, 7
+_TIFF_DEFLATE = (8, 32946)
+
+
+def _tiff_passthrough(img: Image.Image) -> Optional[StreamObject]:
+    """Image XObject carrying the current TIFF frame's compressed data as-is, or None.
+
+    The frame must be a single strip (not tiled), chunky, 1- or 8-bit gray/RGB/CMYK
+    (YCbCr for JPEG) without alpha or reversed fill order. CCITT G3/G4 maps to
+    CCITTFaxDecode, LZW and Deflate (predictor 1 or 2) to LZWDecode/FlateDecode, and
+    new-style JPEG, with its shared tables spliced back in, to DCTDecode. Anything
+    else returns None and is decoded instead.
+    """
+    tags = img.tag_v2
+    offsets, counts = tags.get(273), tags.get(279)
+    if 322 in tags or not offsets or not counts or len(offsets) != 1 or len(counts) != 1:
+        return None
+    if tags.get(284, 1) != 1 or tags.get(266, 1) != 1 or 338 in tags:
+        return None
+    compression = tags.get(259, 1)
+    photometric = tags.get(262)
+    samples = tags.get(277, 1)
+    bits = set(tags.get(258) or (1,))
+    if len(bits) != 1:
+        return None
+    bits = bits.pop()
+    colorspace = {
+        (0, 1): "/DeviceGray", (1, 1): "/DeviceGray", (2, 3): "/DeviceRGB", (5, 4): "/DeviceCMYK",
+        (6, 3): "/DeviceRGB",
+    }.get((photometric, samples))
+    if colorspace is None or bits not in (1, 8) or (bits == 1 and samples != 1):
+        return None
+    if photometric == 5 and tags.get(332, 1) != 1:
+        return None  # InkSet other than CMYK
+
+    img.fp.seek(offsets[0])
+    data = img.fp.read(counts[0])
+    if len(data) != counts[0]:
+        return None
+    params: Dict = {}
+    decode_inverted = photometric == 0
+    if compression in (_TIFF_CCITT_G3, _TIFF_CCITT_G4):
+        if bits != 1:
+            return None
+        if compression == _TIFF_CCITT_G4:
+            params["/K"] = NumberObject(-1)
+        else:
+            t4 = tags.get(292, 0)
+            if t4 & 2:
+                return None  # uncompressed mode
+            params["/K"] = NumberObject(1 if t4 & 1 else 0)
+            if t4 & 4:
+                params["/EncodedByteAlign"] = BooleanObject(True)
+        params["/Columns"] = NumberObject(img.size[0])
+        params["/Rows"] = NumberObject(img.size[1])
+        # fax runs decode to 1 = black; MinIsBlack frames show those bits as white
+        if photometric == 1:
+            params["/BlackIs1"] = BooleanObject(True)
+        decode_inverted = False
+        filter_name = "/CCITTFaxDecode"
+    elif compression == _TIFF_JPEG:
+        if bits != 8 or photometric == 5:
+            return None  # (CMYK JPEG data may or may not be inverted; decode instead)
+        tables = tags.get(347)
+        if not data.startswith(b"\xff\xd8"):
+            return None
+        if tables:
+            if not (tables.startswith(b"\xff\xd8") and tables.endswith(b"\xff\xd9")):
+                return None
+            data = tables[:-2] + data[2:]
+        if photometric == 2:
+            params["/ColorTransform"] = NumberObject(0)
+        filter_name = "/DCTDecode"
+    elif compression == _TIFF_LZW or compression in _TIFF_DEFLATE:
+        if compression == _TIFF_LZW and data.startswith(b"\x00\x01"):
+            return None  # old-style (LSB-first) LZW
+        predictor = tags.get(317, 1)
+        if predictor == 2 and bits == 8:
+            params["/Predictor"] = NumberObject(2)
+            params["/Colors"] = NumberObject(samples)
+            params["/BitsPerComponent"] = NumberObject(bits)
+            params["/Columns"] = NumberObject(img.size[0])
+        elif predictor != 1:
+            return None
+        filter_name = "/LZWDecode" if compression == _TIFF_LZW else "/FlateDecode"
+    else:
+        return None
+    if photometric == 6 and filter_name != "/DCTDecode":
+        return None
+
+    img_obj = _encoded_stream(data, filter_name)
+    if params:
+        img_obj[NameObject("/DecodeParms")] = DictionaryObject({NameObject(k): v for k, v in params.items()})
+    if decode_inverted:
+        img_obj[NameObject("/Decode")] = ArrayObject([NumberObject(1), NumberObject(0)])
+    img_obj[NameObject("/Type")] = NameObject("/XObject")
+    img_obj[NameObject("/Subtype")] = NameObject("/Image")
+    img_obj[NameObject("/Width")] = NumberObject(img.size[0])
+    img_obj[NameObject("/Height")] = NumberObject(img.size[1])
+    img_obj[NameObject("/ColorSpace")] = NameObject(colorspace)
+    img_obj[NameObject("/BitsPerComponent")] = NumberObject(bits)
+    return img_obj
+
+
+def _image_xobject(
+    img_path: str, info: Dict, size: Optional[Tuple[int, int]] = None, frame: int = 0
+) -> StreamObject:
+    """Build an image XObject for a raster file without an intermediate PDF.
+
+    JPEG data is embedded untouched (DCTDecode). PNG data and single-strip TIFF frames
+    are passed through when possible (see _tiff_passthrough); other images are decoded
+    once and Flate-compressed. With size the image is resampled to it first (see
+    _resample); JPEGs are then re-encoded with their own tables.
+    """
+    if size is not None:
+        with _open_raster(img_path, frame) as img:
+            jpeg_options = _jpeg_save_options(img)
+            return _pil_image_xobject(_resample(img, size), jpeg_options)
+
+    fmt = info["format"]
+    if fmt == "JPEG" and info["mode"] in ("L", "RGB", "CMYK"):
+        with open(img_path, "rb") as f:
+            img_obj = _encoded_stream(f.read(), "/DCTDecode")
+        if info["mode"] == "CMYK":
+            # Adobe CMYK JPEGs are stored inverted (same handling as Pillow's PDF writer)
+            img_obj[NameObject("/Decode")] = ArrayObject([NumberObject(v) for v in (1, 0) * 4])
+        img_obj[NameObject("/Type")] = NameObject("/XObject")
+        img_obj[NameObject("/Subtype")] = NameObject("/Image")
+        img_obj[NameObject("/Width")] = NumberObject(info["width"])
+        img_obj[NameObject("/Height")] = NumberObject(info["height"])
+        img_obj[NameObject("/ColorSpace")] = NameObject(
+            {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}[info["mode"]]
+        )
+        img_obj[NameObject("/BitsPerComponent")] = NumberObject(8)
+        return img_obj
+
+    if fmt == "PNG":
+        with open(img_path, "rb") as f:
+            img_obj = _png_flate_passthrough(f.read())
+        if img_obj is not None:
+            return img_obj
+
+    with _open_raster(img_path, frame) as img:
+        if fmt == "TIFF":
+            img_obj = _tiff_passthrough(img)
+            if img_obj is not None:
+                return img_obj
+        if img.mode not in ("RGB", "L", "CMYK", "1"):
+            img = img.convert("RGB")
+        return _pil_image_xobject(img)
+
+
+def _jpeg_save_options(img: Image.Image) -> Optional[Dict]:
+    """Pillow save options that re-encode like the source JPEG (same tables and subsampling)."""
+    if img.format != "JPEG":
+        return None
+    from PIL import JpegImagePlugin
+
+    opts: Dict = {"quality": 95}
+    qtables = getattr(img, "quantization", None)
+    if qtables:
+        opts = {"qtables": qtables}
+        sampling = JpegImagePlugin.get_sampling(img)
+        if sampling != -1:
+            opts["subsampling"] = sampling
+    return opts
+
+
+def _pil_image_xobject(img: Image.Image, jpeg_options: Optional[Dict] = None) -> StreamObject:
+    """Encode a decoded 1/L/RGB/CMYK Pillow image as an image XObject.
+
+    With jpeg_options the pixels are JPEG-encoded with them (see _jpeg_save_options);
+    otherwise they are Flate-compressed losslessly (1-bit images stay 1-bit).
+    """
+    colorspace = {"1": "/DeviceGray", "L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}[img.mode]
+    if jpeg_options is not None:
+        bio = io.BytesIO()
+        img.save(bio, format="JPEG", **jpeg_options)
+        img_obj = _encoded_stream(bio.getvalue(), "/DCTDecode")
+        if img.mode == "CMYK":
+            img_obj[NameObject("/Decode")] = ArrayObject([NumberObject(v) for v in (1, 0) * 4])
+    else:
+        img_obj = _encoded_stream(zlib.compress(img.tobytes(), 6), "/FlateDecode")
+    img_obj[NameObject("/Type")] = NameObject("/XObject")
+    img_obj[NameObject("/Subtype")] = NameObject("/Image")
+    img_obj[NameObject("/Width")] = NumberObject(img.size[0])
+    img_obj[NameObject("/Height")] = NumberObject(img.size[1])
+    img_obj[NameObject("/ColorSpace")] = NameObject(colorspace)
+    img_obj[NameObject("/BitsPerComponent")] = NumberObject(1 if img.mode == "1" else 8)
+    return img_obj
+
+
+def _encoded_stream(data: bytes, filter_name: str) -> StreamObject:
+    """Stream object holding already-encoded data under the given filter."""
+    stream = EncodedStreamObject()
+    stream[NameObject("/Filter")] = NameObject(filter_name)
+    _PypdfPrivate.set_encoded_data(stream, data)
+    return stream
+
+
+def _image_source_page(
+    img_path: str, downsampler: Optional["_Downsampler"] = None, frame: int = 0
+) -> PageObject:
+    """A 1-page source for a raster file (or one TIFF frame): the image drawn over the whole page.
+
+    The page is one point per pixel (like the old Pillow PDF conversion), so
+    placement and bleed slices are unchanged; the real DPI is in _raster_info.
+    A downsampled image still covers the whole page, only with fewer pixels.
+    """
+    info = _raster_info(img_path, frame)
+    w, h = info["width"], info["height"]
+    size = downsampler.placed_raster_size(info) if downsampler is not None else None
+    image = _image_xobject(img_path, info, size, frame)
+    if size is not None:
+        downsampler.count((w, h), size, info["mode"], info["bytes"], len(_PypdfPrivate.encoded_data(image)))
+    page = PageObject.create_blank_page(width=w, height=h)
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): image}),
+    })
+    content = DecodedStreamObject()
+    content.set_data(f"q {w} 0 0 {h} 0 0 cm /Im0 Do Q".encode("ascii"))
+    page[NameObject("/Contents")] = content
+    return page
+
+
+# layout["downsample"] = {"ppi": target, "pdf_images": bool}: images whose effective resolution
+# at their placed size is above ppi * DOWNSAMPLE_THRESHOLD are resampled to ppi before embedding.
+# The margin keeps images that are only slightly over the target from being recompressed.
+DOWNSAMPLE_THRESHOLD = 1.5
+
+_MODE_CHANNELS = {"L": 1, "RGB": 3, "CMYK": 4}
+
+
+def _effective_ppi(width: int, height: int, placed_w_pt: float, placed_h_pt: float) -> float:
+    """Lower of the two pixels-per-inch of an image placed at placed_w_pt x placed_h_pt."""
+    return min(width * 72.0 / placed_w_pt, height * 72.0 / placed_h_pt)
+
+
+def _downsample_size(
+    width: int, height: int, placed_w_pt: float, placed_h_pt: float, ppi: float
+) -> Optional[Tuple[int, int]]:
+    """Pixel size that brings a placed image down to ppi, or None if it is not far enough above it."""
+    if placed_w_pt <= 0 or placed_h_pt <= 0 or width <= 0 or height <= 0:
+        return None
+    if _effective_ppi(width, height, placed_w_pt, placed_h_pt) <= ppi * DOWNSAMPLE_THRESHOLD:
+        return None
+    size = (max(1, int(round(placed_w_pt / 72.0 * ppi))), max(1, int(round(placed_h_pt / 72.0 * ppi))))
+    return size if size[0] < width and size[1] < height else None
+
+
+def _resample(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Reduce a freshly opened image to size.
+
+    JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale (draft); whatever is left is
+    reduced by whole factors and finished with Lanczos (reducing_gap).
+    """
+    img.draft(img.mode, size)
+    if img.mode not in _MODE_CHANNELS:
+        img = img.convert("RGB")
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def _image_draw_sizes(page: PageObject, xobjects: DictionaryObject, ctm: Tuple[float, ...]) -> Dict[str, Tuple[float, float]]:
+    """Largest size, in output points, at which the page's content draws each image XObject.
+
+    ctm maps page space to the output page. Only images drawn by the page's own content
+    stream are found (not those inside forms). Empty when the content cannot be parsed.
+    """
+    try:
+        contents = page.get_contents()
+        operations = contents.operations if contents is not None else []
+    except Exception:
+        return {}
+    sizes: Dict[str, Tuple[float, float]] = {}
+    stack: List[Tuple[float, ...]] = []
+    try:
+        for operands, op in operations:
+            if op == b"q":
+                stack.append(ctm)
+            elif op == b"Q":
+                if stack:
+                    ctm = stack.pop()
+            elif op == b"cm":
+                ctm = _mat_mul(tuple(float(v) for v in operands), ctm)
+            elif op == b"Do" and operands:
+                xobj = xobjects.get(operands[0])
+                if xobj is None or xobj.get_object().get("/Subtype") != "/Image":
+                    continue
+                w, h = math.hypot(ctm[0], ctm[1]), math.hypot(ctm[2], ctm[3])
+                old = sizes.get(operands[0], (0.0, 0.0))
+                sizes[operands[0]] = (max(old[0], w), max(old[1], h))
+    except (TypeError, ValueError):
+        return {}
+    return sizes
+
+
+def _downsampled_pdf_image(
+    image: StreamObject, size: Tuple[int, int], writer: PdfWriter
+) -> Optional[Tuple[StreamObject, str]]:
+    """A resampled copy of a PDF image XObject for writer plus its Pillow mode, or None when
+    it is not a kind we redo.
+
+    Handles 8-bit DCT (gray/RGB) and Flate (gray/RGB/CMYK, no predictor) images in device
+    or ICC color without masks or /Decode; the color space is kept as-is.
+    """
+    if any(k in image for k in ("/ImageMask", "/SMask", "/Mask", "/Decode")):
+        return None
+    if "/BitsPerComponent" not in image or image["/BitsPerComponent"] != 8:
+        return None
+    filters = image["/Filter"] if "/Filter" in image else None
+    if isinstance(filters, ArrayObject):
+        filters = filters[0] if len(filters) == 1 else None
+    colorspace = image["/ColorSpace"] if "/ColorSpace" in image else None
+    mode = None
+    if isinstance(colorspace, NameObject):
+        mode = {"/DeviceGray": "L", "/DeviceRGB": "RGB", "/DeviceCMYK": "CMYK"}.get(colorspace)
+    elif isinstance(colorspace, ArrayObject) and len(colorspace) == 2 and colorspace[0] == "/ICCBased":
+        mode = {1: "L", 3: "RGB", 4: "CMYK"}.get(colorspace[1].get_object().get("/N"))
+    if mode is None:
+        return None
+    width, height = int(image["/Width"]), int(image["/Height"])
+    try:
+        if filters == "/DCTDecode" and mode != "CMYK":
+            # (CMYK JPEGs may or may not be stored inverted; the PDF does not say which)
+            img = Image.open(io.BytesIO(_PypdfPrivate.encoded_data(image)))
+            if img.mode != mode or img.size != (width, height):
+                return None
+            jpeg_options = _jpeg_save_options(img)
+        elif filters == "/FlateDecode" and "/DecodeParms" not in image:
+            # inflate directly: pypdf's get_data refuses streams over its decompression limit
+            raw = zlib.decompressobj().decompress(_PypdfPrivate.encoded_data(image), width * height * _MODE_CHANNELS[mode])
+            img = Image.frombytes(mode, (width, height), raw)
+            jpeg_options = None
+        else:
+            return None
+        img = _resample(img, size)
+    except (OSError, ValueError, zlib.error):
+        return None
+    stream = _pil_image_xobject(img, jpeg_options)
+    for key in ("/ColorSpace", "/Intent", "/Interpolate"):
+        if key in image:
+            stream[NameObject(key)] = image.raw_get(key).clone(writer)
+    return stream, mode
+
+
+class _Downsampler:
+    """Downsample images to layout["downsample"]["ppi"] at their placed size, for one writer.
+
+    Each source image is resampled once per target size and shared by every page that
+    uses it. totals holds what was done: images, bytes_in/bytes_out (encoded image data)
+    and pixel_bytes_in/pixel_bytes_out (decoded size, i.e. the memory a RIP needs).
+    """
+
+    def __init__(self, settings: Dict, writer: PdfWriter):
+        spec = settings["downsample"]
+        self.settings = settings
+        self.ppi = spec["ppi"]
+        self.pdf_images = spec["pdf_images"]
+        self.writer = writer
+        self.totals: Dict[str, int] = {}
+        self._memo: Dict = {}
+
+    def raster_size(self, info: Dict, placed_w_pt: float, placed_h_pt: float) -> Optional[Tuple[int, int]]:
+        if info.get("mode") == "1":
+            return None  # bilevel line art needs its resolution and compresses well as is
+        return _downsample_size(info["width"], info["height"], placed_w_pt, placed_h_pt, self.ppi)
+
+    def placed_raster_size(self, info: Dict) -> Optional[Tuple[int, int]]:
+        """Target size for a raster placed by the layout as a one-point-per-pixel page."""
+        placed = self.settings["plan"].placement(Rect(0, 0, info["width"], info["height"]))
+        a, b, c, d = placed.ctm[:4]
+        return self.raster_size(info, info["width"] * math.hypot(a, b), info["height"] * math.hypot(c, d))
+
+    def count(self, size_in: Tuple[int, int], size_out: Tuple[int, int], mode: str, bytes_in: int, bytes_out: int) -> None:
+        channels = _MODE_CHANNELS.get(mode, 3)
+        for key, value in (
+            ("images", 1),
+            ("bytes_in", bytes_in),
+            ("bytes_out", bytes_out),
+            ("pixel_bytes_in", size_in[0] * size_in[1] * channels),
+            ("pixel_bytes_out", size_out[0] * size_out[1] * channels),
+        ):
+            self.totals[key] = self.totals.get(key, 0) + value
+
+    def pdf_page(self, page: PageObject, ctm: Tuple[float, ...]) -> None:
+        """Point page (placed by ctm) at downsampled copies of the images it draws too large."""
+        if not self.pdf_images:
+            return
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else None
+        xobjects = resources.get("/XObject") if isinstance(resources, DictionaryObject) else None
+        xobjects = xobjects.get_object() if xobjects is not None else None
+        if not isinstance(xobjects, DictionaryObject):
+            return
+        replaced = {}
+        for name, (w_pt, h_pt) in _image_draw_sizes(page, xobjects, ctm).items():
+            ref = xobjects.raw_get(name)
+            if not isinstance(ref, IndirectObject):
+                continue
+            image = ref.get_object()
+            size = _downsample_size(int(image.get("/Width", 0)), int(image.get("/Height", 0)), w_pt, h_pt, self.ppi)
+            if size is None:
+                continue
+            key = (id(ref.pdf), ref.idnum, size)
+            if key not in self._memo:
+                resampled = _downsampled_pdf_image(image, size, self.writer)
+                self._memo[key] = None
+                if resampled is not None:
+                    stream, mode = resampled
+                    self._memo[key] = _PypdfPrivate.add_object(self.writer, stream)
+                    self.count((int(image["/Width"]), int(image["/Height"])), size, mode,
+                               len(_PypdfPrivate.encoded_data(image)), len(_PypdfPrivate.encoded_data(stream)))
+            if self._memo[key] is not None:
+                replaced[name] = self._memo[key]
+        if replaced:
+            # a private copy, so other pages sharing these resources keep the full-size images
+            xobjects = DictionaryObject(xobjects)
+            for name, ref in replaced.items():
+                xobjects[NameObject(name)] = ref
+            resources = DictionaryObject(resources)
+            resources[NameObject("/XObject")] = xobjects
+            page[NameObject("/Resources")] = resources
+
+
+def _raster_trim_clip(info: Dict, trim_box: Rect, fit_mode: str, anchor: str) -> Optional[Rect]:
+    """Source clip (in pixels, PDF orientation) when a raster placed into trim fills it exactly.
+
+    Returns None when the placement leaves gaps inside trim (fit with a different
+    aspect), where edge extension from pixels would not line up with the trim edge.
+    """
+    src = Rect(0, 0, info["width"], info["height"])
+    mode = (fit_mode or "fit_trim_proportional").lower().strip()
+    if mode in ("stretch_trim", "stretch_bleed"):
+        return src
+    cover = crop_rect_for_cover(src, trim_box, anchor)
+    if mode in ("fill_trim_proportional", "fill_bleed_proportional"):
+        return cover
+    return src if cover == src else None
+
+
+def _extend_raster_edges(img: Image.Image, left: int, right: int, bottom: int, top: int, mode: str) -> Image.Image:
+    """Grow img by the given pixel margins, reflecting (mirror) or replicating (smear) its edges."""
+    w, h = img.size
+    out = Image.new(img.mode, (w + left + right, h + top + bottom))
+    out.paste(img, (left, top))
+
+    def strip(box: Tuple[int, int, int, int], size: Tuple[int, int], side_x: int, side_y: int) -> Image.Image:
+        # side_x/side_y: -1 for a margin before the image (left/top), 1 after it, 0 none
+        if mode == "smear":
+            # replicate the outermost row/column/pixel on that side
+            x0, y0, x1, y1 = box
+            x0, x1 = (x0, x0 + 1) if side_x < 0 else (x1 - 1, x1) if side_x > 0 else (x0, x1)
+            y0, y1 = (y0, y0 + 1) if side_y < 0 else (y1 - 1, y1) if side_y > 0 else (y0, y1)
+            return img.crop((x0, y0, x1, y1)).resize(size, Image.Resampling.NEAREST)
+        piece = img.crop(box)
+        if side_x:
+            piece = piece.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        if side_y:
+            piece = piece.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        if piece.size != size:
+            # bleed wider than the image itself: stretch the reflection
+            piece = piece.resize(size, Image.Resampling.NEAREST)
+        return piece
+
+    lw, rw, th, bh = min(left, w), min(right, w), min(top, h), min(bottom, h)
+    if left:
+        out.paste(strip((0, 0, lw, h), (left, h), -1, 0), (0, top))
+    if right:
+        out.paste(strip((w - rw, 0, w, h), (right, h), 1, 0), (left + w, top))
+    if top:
+        out.paste(strip((0, 0, w, th), (w, top), 0, -1), (left, 0))
+    if bottom:
+        out.paste(strip((0, h - bh, w, h), (w, bottom), 0, 1), (left, top + h))
+    if left and top:
+        out.paste(strip((0, 0, lw, th), (left, top), -1, -1), (0, 0))
+    if right and top:
+        out.paste(strip((w - rw, 0, w, th), (right, top), 1, -1), (left + w, 0))
+    if left and bottom:
+        out.paste(strip((0, h - bh, lw, h), (left, bottom), -1, 1), (0, top + h))
+    if right and bottom:
+        out.paste(strip((w - rw, h - bh, w, h), (right, bottom), 1, 1), (left + w, top + h))
+    return out
+
+
+def _render_raster_with_bleed(
+    img_path: str, settings: Dict, downsampler: Optional["_Downsampler"] = None, frame: int = 0
+) -> Optional[PageObject]:
+    """Build an output page for a raster input whose bleed is generated in pixels.
+
+    The placed area is cropped, its edges are reflected/replicated outward by the
+    bleed width at the image's placed resolution, and the result is embedded once
+    as a single image covering the bleed box. Returns None when the placement
+    does not fill trim (the caller then uses the Form XObject path). With a
+    downsampler the crop is first brought down to the target ppi at trim size.
+    """
+    trim_box = settings["trim_box"]
+    bleed_box = settings["bleed_box"]
+    info = _raster_info(img_path, frame)
+    clip = _raster_trim_clip(info, trim_box, settings["fit_mode_for_trim"], settings["anchor"])
+    if clip is None:
+        return None
+
+    # clip is in PDF orientation (origin bottom-left); Pillow rows start at the top
+    x0, x1 = int(round(clip.x0)), int(round(clip.x1))
+    top_row, bottom_row = int(round(info["height"] - clip.y1)), int(round(info["height"] - clip.y0))
+    if x1 - x0 < 1 or bottom_row - top_row < 1:
+        return None
+
+    crop_size = (x1 - x0, bottom_row - top_row)
+    size = None
+    if downsampler is not None:
+        crop_info = {"width": crop_size[0], "height": crop_size[1], "mode": info["mode"]}
+        size = downsampler.raster_size(crop_info, trim_box.width, trim_box.height)
+
+    with _open_raster(img_path, frame) as img:
+        jpeg_options = _jpeg_save_options(img)
+        if size is not None:
+            # decode JPEGs at a reduced scale that still leaves at least size pixels in the crop
+            img.draft(img.mode, (-(-info["width"] * size[0] // crop_size[0]), -(-info["height"] * size[1] // crop_size[1])))
+            sx, sy = img.size[0] / info["width"], img.size[1] / info["height"]
+            x0, x1 = int(round(x0 * sx)), int(round(x1 * sx))
+            top_row, bottom_row = int(round(top_row * sy)), int(round(bottom_row * sy))
+        if img.mode not in ("RGB", "L", "CMYK", "1"):
+            img = img.convert("RGB")
+        img = img.crop((x0, top_row, x1, bottom_row))
+        if size is not None:
+            img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    # pixels per point at the placed size, then bleed widths in whole pixels
+    ppp_x = img.size[0] / trim_box.width
+    ppp_y = img.size[1] / trim_box.height
+    left = int(round((trim_box.x0 - bleed_box.x0) * ppp_x))
+    right = int(round((bleed_box.x1 - trim_box.x1) * ppp_x))
+    bottom = int(round((trim_box.y0 - bleed_box.y0) * ppp_y))
+    top = int(round((bleed_box.y1 - trim_box.y1) * ppp_y))
+    extended = _extend_raster_edges(img, left, right, bottom, top, settings["bleed_generator"])
+
+    # place so the original pixels land exactly on trim; rounded margins may overhang the media box
+    out_page = _new_output_page(settings)
+    x = trim_box.x0 - left / ppp_x
+    y = trim_box.y0 - bottom / ppp_y
+    w = extended.size[0] / ppp_x
+    h = extended.size[1] / ppp_y
+    image = _pil_image_xobject(extended, jpeg_options)
+    if size is not None:
+        downsampler.count(crop_size, size, img.mode, info["bytes"], len(_PypdfPrivate.encoded_data(image)))
+    out_page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): image}),
+    })
+    cm = " ".join(_pdf_num(v) for v in (w, 0, 0, h, x, y))
+    _append_content(out_page, f"q {cm} cm /Im0 Do Q\n".encode("ascii"))
+    return out_page
+
+
+# layout["placement"]: "wrap" draws a source page as a Form XObject around its untouched
+# content stream; "merge" always has pypdf parse, transform and re-serialize the content.
+PLACEMENT_MODES = ("wrap", "merge")
+
+
+def _place_pdf_page(
+    out_page: PageObject, src_page: PageObject, placed: "PagePlacement", placement: str = "wrap"
+) -> None:
+    """Place the clip area of a PDF page onto out_page.
+
+    With placement "wrap" the page's content stream is passed through as a Form XObject
+    and only referenced (q cm clip Do Q), so its cost does not grow with the artwork.
+    Pages without a usable content stream fall back to merge_transformed_page. Both
+    paths place annotations with _carry_annotations.
+
+    Other page attributes need no fallback. /Group moves onto the form (_page_form_xobject),
+    which keeps it where merge would drop it. /Rotate and /UserUnit are ignored by both
+    paths alike: placed.ctm maps the unrotated clip in source units, and merge applies
+    the same ctm to the same content.
+    """
+    if placement == "wrap":
+        form = _page_form_xobject(src_page, placed.clip)
+        if form is not None:
+            _draw_form_ops(out_page, "/PDSrc", form, placed.wrap_ops)
+            _carry_annotations(out_page, src_page, ((placed.clip, placed.ctm),))
+            return
+    clip = placed.clip
+    transform = Transformation(placed.ctm)
+
+    # Create a shallow copy of page with adjusted boxes so pypdf turns it into a form with BBox
+    # matching our clip (acts as a clip boundary when merged).
+    # pypdf PageObject isn't guaranteed to have a .copy() across versions
+    page_copy = copy.copy(src_page)
+    page_copy.mediabox = _rect_to_box(clip)
+    page_copy.cropbox = _rect_to_box(clip)
+    # merging an unattached page copies /Annots with their source /Rect; carry them instead
+    page_copy.pop("/Annots", None)
+    out_page.merge_transformed_page(page_copy, transform)
+    _carry_annotations(out_page, src_page, ((placed.clip, placed.ctm),))
+
+
+# Resource categories whose entries are shared across pages by _ResourceRegistry.
+_SHARED_RESOURCE_CATEGORIES = ("/Font", "/XObject", "/ColorSpace", "/Pattern", "/Shading", "/ExtGState")
+_MAX_RESOURCE_DEPTH = 8
+
+
+def _object_digest(obj, memo: Dict, scope: Optional[int] = None) -> bytes:
+    """Content key of a PDF object, following indirect references.
+
+    Objects with equal keys are interchangeable. Page and page-tree objects are keyed by
+    reference instead of content (they point back up the tree), as is anything reached
+    through a reference cycle. A reference key names the document by scope, or by id(pdf)
+    when scope is None; callers that keep keys after a reader is gone (and its id() may be
+    reused) pass a scope number unique to that reader. memo maps (id(pdf), idnum) to keys
+    and must not outlive the readers it was filled from.
+    """
+    if isinstance(obj, IndirectObject):
+        key = (id(obj.pdf), obj.idnum)
+        digest = memo.get(key)
+        if digest is None:
+            ref = (id(obj.pdf) if scope is None else scope, obj.idnum)
+            digest = memo[key] = b"R" + hashlib.sha256(repr(ref).encode("ascii")).digest()
+            target = obj.get_object()
+            if not (isinstance(target, DictionaryObject) and target.get("/Type") in ("/Page", "/Pages")):
+                digest = memo[key] = _object_digest(target, memo, scope)
+        return digest
+    if isinstance(obj, DictionaryObject):
+        h = hashlib.sha256(b"S" if isinstance(obj, StreamObject) else b"D")
+        for k in sorted(obj):
+            if k == "/Length" and isinstance(obj, StreamObject):
+                continue
+            child = _object_digest(obj.raw_get(k), memo, scope)
+            h.update(f"{k} {len(child)} ".encode("utf-8", "surrogateescape"))
+            h.update(child)
+        if isinstance(obj, StreamObject):
+            h.update(_PypdfPrivate.encoded_data(obj))
+        return h.digest()
+    if isinstance(obj, ArrayObject):
+        h = hashlib.sha256(b"A")
+        for v in obj:
+            child = _object_digest(v, memo, scope)
+            h.update(f"{len(child)} ".encode("ascii"))
+            h.update(child)
+        return h.digest()
+    return f"{type(obj).__name__} {obj!r}".encode("utf-8", "surrogateescape")
+
+
+class _ResourceRegistry:
+    """Point every page of one output at a single copy of each font, image, colorspace, ...
+
+    Sources often carry a separate but identical copy of a resource per page (or, once
+    rendered in chunks, per chunk). share() rewrites a page's resource entries, and those
+    of the forms and patterns it uses, so that every copy refers to the first one seen.
+    pypdf then writes that object once, however many pages and readers refer to it.
+    """
+
+    def __init__(self):
+        self._memo: Dict = {}
+        self._seen: Dict[bytes, IndirectObject] = {}
+        self.shared = 0
+
+    def share(self, page: PageObject) -> None:
+        self._share_resources(page.get("/Resources"), 0)
+
+    def _share_resources(self, resources, depth: int) -> None:
+        if resources is None or depth > _MAX_RESOURCE_DEPTH:
+            return
+        resources = resources.get_object()
+        if not isinstance(resources, DictionaryObject):
+            return
+        for category in _SHARED_RESOURCE_CATEGORIES:
+            entries = resources.get(category)
+            entries = entries.get_object() if entries is not None else None
+            if not isinstance(entries, DictionaryObject):
+                continue
+            for name in list(entries):
+                ref = entries.raw_get(name)
+                if not isinstance(ref, IndirectObject):
+                    continue
+                first = self._seen.setdefault(_object_digest(ref, self._memo), ref)
+                if first.idnum != ref.idnum or first.pdf is not ref.pdf:
+                    entries[name] = first
+                    self.shared += 1
+                target = first.get_object()
+                if isinstance(target, DictionaryObject) and "/Resources" in target:
+                    # forms, tiling patterns and Type 3 fonts carry their own resources
+                    self._share_resources(target.raw_get("/Resources"), depth + 1)
+
+
+def _resolve_layout(job: Dict) -> Dict:
+    """Resolve the job layout into output boxes and placement settings."""
+    layout = job.get("layout", {})
+
+    trim = layout.get("trim", {})
+    unit = trim.get("unit", "in")
+    trim_w_pt = to_points(float(trim["w"]), unit)
+    trim_h_pt = to_points(float(trim["h"]), unit)
+
+    bleed = layout.get("bleed", {"top": 0, "right": 0, "bottom": 0, "left": 0, "unit": unit})
+    if "unit" not in bleed:
+        bleed["unit"] = unit
+
+    imposition = job.get("imposition")
+    if imposition and imposition.get("cell_bleed") is not None:
+        bleed = imposition["cell_bleed"]
+
+    tiling = job.get("tiling")
+    if tiling and imposition:
+        raise ValueError("Tiling and imposition cannot be combined in one job")
+
+    marks, slug_pt = _resolve_marks(job, unit)
+    sheet_crop_marks = bool(marks and marks["crop_marks"])
+    tile_marks, tile_slug_pt = marks, slug_pt
+    if imposition or tiling:
+        # marks go on the sheet once, not around every cell, or around every panel, not the piece
+        marks, slug_pt = None, 0.0
+
+    media_box, bleed_box, trim_box = compute_boxes(trim_w_pt, trim_h_pt, bleed, slug_pt)
+
+    fit_mode = layout.get("fit_mode", "fit_trim_proportional")
+    anchor = layout.get("anchor", "center")
+
+    bleed_generator = (layout.get("bleed_generator", "none") or "none").lower().strip()
+    bleed_preflight = (layout.get("bleed_preflight", "boxes") or "boxes").lower().strip()
+    if bleed_preflight not in BLEED_PREFLIGHT_MODES:
+        raise ValueError(
+            f"Unknown bleed_preflight: {bleed_preflight!r} (expected one of {', '.join(BLEED_PREFLIGHT_MODES)})"
+        )
+    placement = (layout.get("placement", "wrap") or "wrap").lower().strip()
+    if placement not in PLACEMENT_MODES:
+        raise ValueError(f"Unknown placement: {placement!r} (expected one of {', '.join(PLACEMENT_MODES)})")
+    downsample = layout.get("downsample") or None
+    if downsample is not None:
+        ppi = float(downsample.get("ppi") or 0)
+        if ppi <= 0:
+            raise ValueError(f"Downsample ppi must be greater than 0, got {downsample.get('ppi')!r}")
+        downsample = {"ppi": ppi, "pdf_images": bool(downsample.get("pdf_images", False))}
+
+    # When using edge-extend bleed, we place the main content into trim, then fill bleed margins.
+    fit_mode_for_trim = (fit_mode or "fit_trim_proportional").lower().strip()
+    if bleed_generator in ("mirror", "smear"):
+        if fit_mode_for_trim == "fit_bleed_proportional":
+            fit_mode_for_trim = "fit_trim_proportional"
+        elif fit_mode_for_trim == "fill_bleed_proportional":
+            fit_mode_for_trim = "fill_trim_proportional"
+        elif fit_mode_for_trim == "stretch_bleed":
+            fit_mode_for_trim = "stretch_trim"
+
+    m = (fit_mode or "").lower().strip()
+    dest_rect = bleed_box if (m.endswith("_bleed") or "bleed" in m) else trim_box
+
+    sheet = None
+    if imposition:
+        sheet = _resolve_imposition(imposition, trim_box, bleed_box, sheet_crop_marks)
+    panels = None
+    if tiling:
+        panels = _resolve_tiling(tiling, trim_box, bleed, unit, tile_marks, tile_slug_pt)
+
+    return {
+        "media_box": media_box,
+        "bleed_box": bleed_box,
+        "trim_box": trim_box,
+        # with a slug area the marks outside the bleed must stay visible
+        "crop_box": media_box if slug_pt > 0 else bleed_box,
+        "dest_rect": dest_rect,
+        "fit_mode": fit_mode,
+        "fit_mode_for_trim": fit_mode_for_trim,
+        "anchor": anchor,
+        "bleed_generator": bleed_generator,
+        "bleed_preflight": bleed_preflight,
+        "placement": placement,
+        "downsample": downsample,
+        "marks": marks,
+        "marks_ops": _marks_ops(marks, trim_box, bleed_box, slug_pt) if marks else None,
+        "imposition": sheet,
+        "tiling": panels,
+        # raster inputs: "pixels" builds mirror/smear bleed into the image itself,
+        # "xobject" draws edge slices of the placed image like PDF inputs
+        "raster_bleed": (layout.get("raster_bleed", "pixels") or "pixels").lower().strip(),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class PagePlacement:
+    """Where one source box lands on the output page under a compiled layout."""
+
+    clip: Rect
+    ctm: Tuple[float, ...]
+    # bleed-slice (source rect, ctm) pairs for mirror/smear, empty otherwise
+    slices: Tuple[Tuple[Rect, Tuple[float, ...]], ...]
+    # "/PDSrc" draw ops for clip + slices when the page is placed as a Form XObject
+    draw_ops: Optional[bytes]
+    # "/PDSrc" draw ops for the clip alone, for the wrap fast path of _place_pdf_page
+    wrap_ops: Optional[bytes] = None
+
+
+class LayoutPlan:
+    """A job layout resolved once, with placements memoized per distinct source box.
+
+    Every page whose picked box (pick_pdf_box) is the same shares one PagePlacement, so
+    the fit/cover/stretch maths, the eight bleed-slice transforms and the formatted draw
+    ops are computed once per geometry rather than once per page. Plans are immutable
+    apart from the memo and are shared across jobs with the same layout (compile_layout).
+    """
+
+    __slots__ = ("settings", "_placements", "_source_bleed")
+
+    MAX_PLACEMENTS = 1024
+
+    def __init__(self, settings: Dict):
+        self.settings = settings
+        self._placements: Dict[Rect, PagePlacement] = {}
+        self._source_bleed: Dict[Tuple[Rect, Rect], Optional[PagePlacement]] = {}
+        settings["plan"] = self
+
+    def placement(self, src_rect: Rect) -> PagePlacement:
+        placed = self._placements.get(src_rect)
+        if placed is None:
+            if len(self._placements) >= self.MAX_PLACEMENTS:
+                self._placements.clear()
+            placed = self._placements[src_rect] = self._compile(src_rect)
+        return placed
+
+    def _compile(self, src_rect: Rect) -> PagePlacement:
+        st = self.settings
+        mode = st["bleed_generator"]
+        if mode in ("mirror", "smear"):
+            clip, transform = _placement(src_rect, st["trim_box"], st["fit_mode_for_trim"], st["anchor"])
+            slices = tuple((r, t.ctm) for r, t in _edge_extend_slices(clip, st["trim_box"], st["bleed_box"], mode))
+            draw_ops = _form_draw_ops("/PDSrc", ((clip, transform.ctm),) + slices)
+            return PagePlacement(clip, transform.ctm, slices, draw_ops)
+        clip, transform = _placement(src_rect, st["dest_rect"], st["fit_mode"], st["anchor"])
+        return PagePlacement(clip, transform.ctm, (), None, _form_draw_ops("/PDSrc", ((clip, transform.ctm),)))
+
+    def source_bleed_placement(self, src_rect: Rect, available: Rect) -> Optional[PagePlacement]:
+        """Trim placement widened to the whole bleed box, if available (source space) covers it.
+
+        The page is drawn once with its real bleed instead of once plus eight edge slices.
+        """
+        key = (src_rect, available)
+        if key in self._source_bleed:
+            return self._source_bleed[key]
+        if len(self._source_bleed) >= self.MAX_PLACEMENTS:
+            self._source_bleed.clear()
+        placed = self.placement(src_rect)
+        a, b, c, d, e, f = placed.ctm
+        result = None
+        if b == 0 and c == 0 and a > 0 and d > 0:
+            bb = self.settings["bleed_box"]
+            need = Rect((bb.x0 - e) / a, (bb.y0 - f) / d, (bb.x1 - e) / a, (bb.y1 - f) / d)
+            if _covers(available, need):
+                result = PagePlacement(need, placed.ctm, (), _form_draw_ops("/PDSrc", ((need, placed.ctm),)))
+        self._source_bleed[key] = result
+        return result
+
+
+_PLAN_CACHE: Dict[str, LayoutPlan] = {}
+_PLAN_CACHE_SIZE = 32
+
+
+def compile_layout(job: Dict) -> LayoutPlan:
+    """Resolve job["layout"] (and imposition or tiling) into a LayoutPlan, reusing an identical earlier one.
+
+    Plans are cached per process by the layout's JSON, so a hot folder or job server
+    building thousands of files on one preset compiles it once.
+    """
+    spec = {"layout": job.get("layout", {}), "imposition": job.get("imposition"), "tiling": job.get("tiling")}
+    if (job.get("layout", {}).get("marks") or {}).get("slug"):
+        spec["slug"] = _slug_text(job, job["layout"]["marks"]["slug"])
+    key = json.dumps(spec, sort_keys=True)
+    plan = _PLAN_CACHE.get(key)
+    if plan is None:
+        _load_pdf_libs()
+        plan = LayoutPlan(_resolve_layout(job))
+        if len(_PLAN_CACHE) >= _PLAN_CACHE_SIZE:
+            _PLAN_CACHE.pop(next(iter(_PLAN_CACHE)))
+        _PLAN_CACHE[key] = plan
+    return plan
+
+
+def make_imposition(
+    *,
+    sheet_size_spec: str,
+    cols: int,
+    rows: int,
+    gutter_spec: str = "0",
+    cell_bleed_spec: Optional[str] = None,
+) -> Dict:
+    """Create a job["imposition"] section for step-and-repeat N-up sheets.
+
+    Sizes are in the sheet's unit. gutter_spec is 'g' or 'gx,gy'; cell_bleed_spec
+    uses the parse_bleed format and defaults to the job's layout bleed.
+    """
+    w, h, unit = parse_size(sheet_size_spec)
+    gutter = [float(p) for p in str(gutter_spec).split(",") if p.strip()]
+    if len(gutter) == 1:
+        gutter = gutter * 2
+    if len(gutter) != 2:
+        raise ValueError("Gutter must be 1 value or 2 values (x,y)")
+    if int(cols) < 1 or int(rows) < 1:
+        raise ValueError("Imposition grid needs at least 1 column and 1 row")
+    return {
+        "sheet": {"w": w, "h": h, "unit": unit},
+        "cols": int(cols),
+        "rows": int(rows),
+        "gutter": {"x": gutter[0], "y": gutter[1], "unit": unit},
+        "cell_bleed": parse_bleed(cell_bleed_spec, unit) if cell_bleed_spec is not None else None,
+    }
+
+
+def _resolve_imposition(imposition: Dict, trim_box: Rect, bleed_box: Rect, crop_marks: bool) -> Dict:
+    """Lay out a cols x rows grid of trim-sized cells centered on the sheet.
+
+    Each cell keeps its bleed on the sheet's outer edges; between cells the bleed
+    is limited to half the gutter so neighbours never overlap.
+    """
+    sheet = imposition["sheet"]
+    sheet_unit = sheet.get("unit", "in")
+    sheet_rect = Rect(0, 0, to_points(float(sheet["w"]), sheet_unit), to_points(float(sheet["h"]), sheet_unit))
+    cols = int(imposition.get("cols", 1))
+    rows = int(imposition.get("rows", 1))
+    gutter = imposition.get("gutter", {}) or {}
+    gutter_unit = gutter.get("unit", sheet_unit)
+    gx = to_points(float(gutter.get("x", 0)), gutter_unit)
+    gy = to_points(float(gutter.get("y", 0)), gutter_unit)
+
+    tw, th = trim_box.width, trim_box.height
+    grid_w = cols * tw + (cols - 1) * gx
+    grid_h = rows * th + (rows - 1) * gy
+    if grid_w > sheet_rect.width + 1e-6 or grid_h > sheet_rect.height + 1e-6:
+        raise ValueError(
+            f"Imposition grid {cols}x{rows} ({grid_w:.1f}x{grid_h:.1f}pt) does not fit the sheet "
+            f"({sheet_rect.width:.1f}x{sheet_rect.height:.1f}pt)"
+        )
+    gx0 = (sheet_rect.width - grid_w) / 2.0
+    gy0 = (sheet_rect.height - grid_h) / 2.0
+
+    bl = trim_box.x0 - bleed_box.x0
+    br = bleed_box.x1 - trim_box.x1
+    bb = trim_box.y0 - bleed_box.y0
+    bt = bleed_box.y1 - trim_box.y1
+
+    placements: List[Tuple[Rect, Transformation]] = []
+    for r in range(rows):
+        # row 0 is the top row of the sheet
+        y = gy0 + (rows - 1 - r) * (th + gy)
+        for c in range(cols):
+            x = gx0 + c * (tw + gx)
+            clip = Rect(
+                trim_box.x0 - (bl if c == 0 else min(bl, gx / 2.0)),
+                trim_box.y0 - (bb if r == rows - 1 else min(bb, gy / 2.0)),
+                trim_box.x1 + (br if c == cols - 1 else min(br, gx / 2.0)),
+                trim_box.y1 + (bt if r == 0 else min(bt, gy / 2.0)),
+            )
+            placements.append((clip, Transformation().translate(tx=x - trim_box.x0, ty=y - trim_box.y0)))
+
+    xs = sorted({gx0 + c * (tw + gx) for c in range(cols)} | {gx0 + c * (tw + gx) + tw for c in range(cols)})
+    ys = sorted({gy0 + r * (th + gy) for r in range(rows)} | {gy0 + r * (th + gy) + th for r in range(rows)})
+    return {
+        "sheet": sheet_rect,
+        "grid": Rect(gx0, gy0, gx0 + grid_w, gy0 + grid_h),
+        "placements": placements,
+        "draw_ops": _form_draw_ops("/Cell", [(clip, t.ctm) for clip, t in placements]),
+        "cut_xs": xs,
+        "cut_ys": ys,
+        "mark_offset": max(bl, br, bb, bt, 0.0),
+        "crop_marks": crop_marks,
+    }
+
+
+def _impose_page(cell_page: PageObject, settings: Dict) -> PageObject:
+    """Step-and-repeat one rendered cell page across a sheet.
+
+    The cell becomes a single Form XObject referenced once per grid cell, so an
+    N-up sheet is about the size of the 1-up page. Its annotations are repeated in
+    every cell. Crop marks are drawn once.
+    """
+    sheet = settings["imposition"]
+    sheet_rect = sheet["sheet"]
+    out_page = PageObject.create_blank_page(width=sheet_rect.width, height=sheet_rect.height)
+    out_page.mediabox = _rect_to_box(sheet_rect)
+    out_page.cropbox = _rect_to_box(sheet_rect)
+
+    form = _page_form_xobject(cell_page, settings["media_box"])
+    if form is not None:
+        _draw_form_ops(out_page, "/Cell", form, sheet["draw_ops"])
+        _carry_annotations(out_page, cell_page, ((clip, t.ctm) for clip, t in sheet["placements"]))
+    if sheet["crop_marks"]:
+        _draw_sheet_crop_marks(out_page, sheet)
+    return out_page
+
+
+def _draw_sheet_crop_marks(page: PageObject, sheet: Dict) -> None:
+    """Draw crop marks for every cut line of an imposed grid, outside the grid."""
+    grid = sheet["grid"]
+    offset = sheet["mark_offset"]
+    tick = 18.0
+    lw = 0.25
+
+    parts = [
+        "q\n",
+        "0 0 0 RG\n",  # stroke color
+        f"{lw} w\n",
+    ]
+    for x in sheet["cut_xs"]:
+        parts.append(f"{x:.4f} {grid.y0 - offset - tick:.4f} m {x:.4f} {grid.y0 - offset:.4f} l S\n")
+        parts.append(f"{x:.4f} {grid.y1 + offset:.4f} m {x:.4f} {grid.y1 + offset + tick:.4f} l S\n")
+    for y in sheet["cut_ys"]:
+        parts.append(f"{grid.x0 - offset - tick:.4f} {y:.4f} m {grid.x0 - offset:.4f} {y:.4f} l S\n")
+        parts.append(f"{grid.x1 + offset:.4f} {y:.4f} m {grid.x1 + offset + tick:.4f} {y:.4f} l S\n")
+    parts.append("Q\n")
+    _append_content(page, "".join(parts).encode("ascii"))
+
+
+def make_tiling(*, cols: int, rows: int, overlap_spec: str = "0", unit: Optional[str] = None) -> Dict:
+    """Create a job["tiling"] section that splits each page into a cols x rows grid of panels.
+
+    The layout trim is the finished size of the whole piece. Neighbouring panels share
+    overlap_spec ('o' or 'ox,oy', in unit, default the trim unit) of artwork; every panel
+    gets the layout bleed and marks of its own.
+    """
+    overlap = [float(p) for p in str(overlap_spec).split(",") if p.strip()]
+    if len(overlap) == 1:
+        overlap = overlap * 2
+    if len(overlap) != 2:
+        raise ValueError("Overlap must be 1 value or 2 values (x,y)")
+    if int(cols) < 1 or int(rows) < 1:
+        raise ValueError("Tiling grid needs at least 1 column and 1 row")
+    tiling = {"cols": int(cols), "rows": int(rows), "overlap": {"x": overlap[0], "y": overlap[1]}}
+    if unit:
+        tiling["overlap"]["unit"] = unit
+    return tiling
+
+
+def _resolve_tiling(
+    tiling: Dict, trim_box: Rect, bleed: Dict, unit: str, marks: Optional[Dict], slug_pt: float
+) -> Dict:
+    """Lay out the panels of a tiled piece whose (slug-less) trim box is trim_box.
+
+    Returns the panel page boxes (shared by all panels), the panel marks, and per panel
+    the "/PDTile" ops that draw its part of the piece, bleed included, onto the panel,
+    and the (piece rect, ctm) window they draw.
+    Panels are listed row by row from the top left.
+    """
+    cols = int(tiling.get("cols", 1))
+    rows = int(tiling.get("rows", 1))
+    overlap = tiling.get("overlap", {}) or {}
+    overlap_unit = overlap.get("unit", unit)
+    ox = to_points(float(overlap.get("x", 0)), overlap_unit)
+    oy = to_points(float(overlap.get("y", 0)), overlap_unit)
+    if cols < 1 or rows < 1:
+        raise ValueError("Tiling grid needs at least 1 column and 1 row")
+
+    pw = (trim_box.width + (cols - 1) * ox) / cols
+    ph = (trim_box.height + (rows - 1) * oy) / rows
+    if ox < 0 or oy < 0 or (cols > 1 and ox >= pw) or (rows > 1 and oy >= ph):
+        raise ValueError(
+            f"Tile overlap ({ox:.1f}x{oy:.1f}pt) must be at least 0 and less than the panel size ({pw:.1f}x{ph:.1f}pt)"
+        )
+    media_box, bleed_box, panel_trim = compute_boxes(pw, ph, bleed, slug_pt)
+
+    tiles = []
+    for r in range(rows):
+        for c in range(cols):
+            x0 = trim_box.x0 + c * (pw - ox)
+            y1 = trim_box.y1 - r * (ph - oy)
+            # this panel's bleed box, in the coordinates of the rendered piece
+            src = Rect(
+                x0 - (panel_trim.x0 - bleed_box.x0),
+                y1 - ph - (panel_trim.y0 - bleed_box.y0),
+                x0 + pw + (bleed_box.x1 - panel_trim.x1),
+                y1 + (bleed_box.y1 - panel_trim.y1),
+            )
+            ctm = _compute_transform_stretch(src, bleed_box).ctm
+            tiles.append({"row": r, "col": c, "window": (src, ctm), "draw_ops": _form_draw_ops("/PDTile", ((src, ctm),))})
+    return {
+        "cols": cols,
+        "rows": rows,
+        "media_box": media_box,
+        "bleed_box": bleed_box,
+        "trim_box": panel_trim,
+        "crop_box": media_box if slug_pt > 0 else bleed_box,
+        "marks": marks,
+        "marks_ops": _marks_ops(marks, panel_trim, bleed_box, slug_pt) if marks else None,
+        "tiles": tiles,
+    }
+
+
+def _add_tile_pages(writer: PdfWriter, piece_page: PageObject, settings: Dict, marks_ref=None) -> int:
+    """Add one page per panel of a rendered piece to writer. Returns the number added.
+
+    The piece becomes a single Form XObject; every panel draws its own window of it, so
+    a wall of N panels holds the source artwork once rather than N times. Annotations
+    go to every panel whose window they overlap.
+    """
+    tiling = settings["tiling"]
+    form = _page_form_xobject(piece_page, settings["media_box"])
+    form_ref = None
+    for tile in tiling["tiles"]:
+        page = _new_output_page(tiling)
+        if form is not None:
+            # the first panel carries the form itself; the rest reuse the copy pypdf wrote for it
+            _draw_form_ops(page, "/PDTile", form if form_ref is None else form_ref, tile["draw_ops"])
+            _carry_annotations(page, piece_page, (tile["window"],))
+        if marks_ref is not None:
+            _draw_form_ops(page, "/PDMarks", marks_ref, b"q /PDMarks Do Q\n")
+        added = _add_output_page(writer, page)
+        if form is not None and form_ref is None:
+            form_ref = added["/Resources"]["/XObject"].raw_get("/PDTile")
+    return len(tiling["tiles"])
+
+
+class _Span:
+    __slots__ = ("log", "stage", "page", "t0")
+
+    def __init__(self, log: "_StageLog", stage: str, page: Optional[int]):
+        self.log = log
+        self.stage = stage
+        self.page = page
+
+    def __enter__(self) -> None:
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc) -> bool:
+        self.log.add(self.stage, time.perf_counter() - self.t0, self.page)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _StageLog:
+    """Per-stage wall times for one build task (an input or a page chunk).
+
+    `with stages("place", page):` times a stage. The disabled log (_NO_STAGES) hands
+    out one shared no-op context, so uninstrumented builds pay a call per stage.
+    """
+
+    __slots__ = ("enabled", "input", "events")
+
+    def __init__(self, input_path: str = "", enabled: bool = True):
+        self.enabled = enabled
+        self.input = input_path
+        self.events: List[Dict] = []
+
+    def __call__(self, stage: str, page: Optional[int] = None):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, page)
+
+    def add(self, stage: str, seconds: float, page: Optional[int] = None, **extra) -> None:
+        if self.enabled:
+            event = {"event": "stage", "input": self.input, "stage": stage,
+                     "page": None if page is None else page + 1, "seconds": round(seconds, 6)}
+            event.update(extra)
+            self.events.append(event)
+
+
+_NO_STAGES = _StageLog(enabled=False)
+
+
+class JsonLinesSink:
+    """Metrics sink that appends each event as one JSON line.
+
+    Pass an instance as build_press_pdf(..., metrics=sink), or set
+    job["engine"]["metrics"] to a file path and build_press_pdf opens one itself.
+    """
+
+    def __init__(self, path_or_file):
+        if isinstance(path_or_file, str):
+            os.makedirs(os.path.dirname(os.path.abspath(path_or_file)), exist_ok=True)
+            self._file: TextIO = open(path_or_file, "a", encoding="utf-8")
+            self._owned = True
+        else:
+            self._file = path_or_file
+            self._owned = False
+
+    def __call__(self, event: Dict) -> None:
+        self._file.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._owned:
+            self._file.close()
+
+
+def _stage_totals(events: List[Dict]) -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for e in events:
+        totals[e["stage"]] = round(totals.get(e["stage"], 0.0) + e["seconds"], 6)
+    return totals
+
+
+def _output_path(job: Dict, index: int) -> str:
+    """Output PDF path for job["inputs"][index]."""
+    output = job.get("output", {})
+    inputs = job.get("inputs", [])
+    out_dir = output.get("dir", os.getcwd())
+    base = output.get("basename", "output")
+    in_name = os.path.splitext(os.path.basename(inputs[index]["path"]))[0]
+    # If the UI already set basename to include the input name, avoid duplicating it.
+    if len(inputs) == 1:
+        return os.path.join(out_dir, f"{base}.pdf")
+    return os.path.join(out_dir, f"{base}__{in_name}.pdf")
+
+
+def _output_profile(job: Dict) -> Dict:
+    """Resolve job["output"]["profile"] plus per-key overrides into one settings dict."""
+    output = job.get("output", {})
+    name = (output.get("profile") or "fast").lower().strip()
+    if name not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile: {name!r} (expected one of {', '.join(OUTPUT_PROFILES)})")
+    profile = dict(OUTPUT_PROFILES[name], name=name)
+    for key in OUTPUT_PROFILES[name]:
+        if key in output:
+            profile[key] = bool(output[key])
+    return profile
+
+
+def _compact_writer(writer: PdfWriter, profile: Dict) -> None:
+    """Apply the in-memory part of an output profile: Flate unfiltered streams.
+
+    This runs where the pages were rendered, so chunk workers compress in parallel.
+    """
+    if profile["compress_streams"]:
+        for num, obj in _PypdfPrivate.objects(writer):
+            if isinstance(obj, StreamObject) and "/Filter" not in obj:
+                _PypdfPrivate.replace_object(writer, num, obj.flate_encode(COMPACT_FLATE_LEVEL))
+
+
+def _write_pdf(writer: PdfWriter, f: BinaryIO, profile: Dict) -> None:
+    """Write writer to f as the output profile asks.
+
+    pypdf's output is re-emitted through _PdfStreamWriter, the same writer chunked builds
+    assemble with, so an unchunked build writes the same bytes as a chunked one.
+    """
+    _compact_writer(writer, profile)
+    bio = io.BytesIO()
+    writer.write(bio)
+    stream_writer = _PdfStreamWriter(f, object_streams=profile["object_streams"])
+    stream_writer.add_chunk(bio.getvalue())
+    stream_writer.close()
+
+
+def _new_output_page(settings: Dict) -> PageObject:
+    """Blank output page with MediaBox/BleedBox/TrimBox/CropBox set."""
+    media_box = settings["media_box"]
+    out_page = PageObject.create_blank_page(width=media_box.width, height=media_box.height)
+    out_page.mediabox = _rect_to_box(media_box)
+    out_page.bleedbox = _rect_to_box(settings["bleed_box"])
+    out_page.trimbox = _rect_to_box(settings["trim_box"])
+    out_page.cropbox = _rect_to_box(settings["crop_box"])
+    return out_page
+
+
+def _render_page(
+    src_page: PageObject,
+    settings: Dict,
+    pdf_box: str,
+    stages: "_StageLog" = None,
+    page: Optional[int] = None,
+    bleed_log: Optional[List[Dict]] = None,
+    downsampler: Optional[_Downsampler] = None,
+) -> PageObject:
+    """Build one output page (boxes, placement, bleed) from a source page. Marks are added by _render_input.
+
+    With mirror/smear, a page whose own bleed covers the output bleed box is placed with it
+    (see _preflight_bleed). The choice per page is appended to bleed_log. A downsampler
+    first swaps the page's over-resolved images for resampled copies.
+    """
+    stages = stages or _NO_STAGES
+    plan = settings.get("plan") or LayoutPlan(settings)
+
+    out_page = _new_output_page(settings)
+    src_rect = pick_pdf_box(src_page, pdf_box)
+    placed = plan.placement(src_rect)
+    if downsampler is not None and downsampler.pdf_images:
+        with stages("downsample", page):
+            downsampler.pdf_page(src_page, placed.ctm)
+
+    if placed.draw_ops is not None:
+        with stages("preflight", page):
+            source_bleed = _preflight_bleed(src_page, plan, src_rect)
+        if bleed_log is not None:
+            bleed_log.append({"page": (page or 0) + 1, "bleed": "source" if source_bleed else settings["bleed_generator"]})
+        with stages("bleed", page):
+            _place_pdf_page_with_bleed(out_page, src_page, source_bleed or placed)
+    else:
+        with stages("place", page):
+            _place_pdf_page(out_page, src_page, placed, settings["placement"])
+    return out_page
+
+
+def _render_input(
+    item: Dict,
+    settings: Dict,
+    page_indexes: Optional[List[int]] = None,
+    stages: "_StageLog" = None,
+    use_mmap: bool = False,
+    bleed_log: Optional[List[Dict]] = None,
+    downsample_totals: Optional[Dict[str, int]] = None,
+) -> PdfWriter:
+    """Render one input (or a subset of its PDF pages) into a new PdfWriter.
+
+    Per-page bleed choices (source bleed or generated) are appended to bleed_log, and
+    with layout["downsample"] the _Downsampler totals are added to downsample_totals.
+    """
+    stages = stages or _NO_STAGES
+    in_path = item["path"]
+    ext = os.path.splitext(in_path)[1].lower()
+    writer = PdfWriter()
+    marks_ref = None
+    downsampler = _Downsampler(settings, writer) if settings["downsample"] else None
+
+    def emit(out_page: PageObject, pno: int) -> None:
+        nonlocal marks_ref
+        tiling = settings["tiling"]
+        if tiling:
+            with stages("tile", pno):
+                # one shared panel marks XObject per writer, like the page marks below
+                if tiling["marks"] is not None and marks_ref is None:
+                    marks_ref = _PypdfPrivate.add_object(writer, _marks_form(tiling))
+                _add_tile_pages(writer, out_page, settings, marks_ref)
+            return
+        if settings["marks"] is not None:
+            with stages("marks", pno):
+                # one shared marks XObject per writer; each page only adds a Do
+                if marks_ref is None:
+                    marks_ref = _PypdfPrivate.add_object(writer, _marks_form(settings))
+                _draw_form_ops(out_page, "/PDMarks", marks_ref, b"q /PDMarks Do Q\n")
+        if settings["imposition"]:
+            with stages("impose", pno):
+                out_page = _impose_page(out_page, settings)
+        _add_output_page(writer, out_page)
+
+    if ext == ".pdf":
+        with contextlib.ExitStack() as exit_stack:
+            with stages("open"):
+                reader = exit_stack.enter_context(_open_pdf_reader(in_path, use_mmap))
+                if page_indexes is None:
+                    page_indexes = parse_page_range(item.get("pages", "all"), len(reader.pages))
+            pdf_box = item.get("pdf_box", "auto")
+            registry = _ResourceRegistry()
+            for pno in page_indexes:
+                with stages("read", pno):
+                    src_page = reader.pages[pno]
+                    registry.share(src_page)
+                emit(_render_page(src_page, settings, pdf_box, stages, pno, bleed_log, downsampler), pno)
+
+    elif ext in _RASTER_EXTS:
+        frames = [0]
+        if ext in _TIFF_EXTS:
+            # one frame at a time: each is decoded (if at all) and released before the next
+            frames = page_indexes
+            if frames is None:
+                frames = parse_page_range(item.get("pages", "all"), tiff_frame_count(in_path))
+        for pno in frames:
+            out_page = None
+            if settings["bleed_generator"] in ("mirror", "smear") and settings["raster_bleed"] == "pixels":
+                with stages("raster_bleed", pno):
+                    out_page = _render_raster_with_bleed(in_path, settings, downsampler, pno)
+                if out_page is not None and bleed_log is not None:
+                    bleed_log.append({"page": pno + 1, "bleed": settings["bleed_generator"]})
+            if out_page is None:
+                # wrap the raster as a 1-page source (no decode for JPEG, plain PNG, most TIFF)
+                with stages("open", pno):
+                    src_page = _image_source_page(in_path, downsampler, pno)
+                out_page = _render_page(src_page, settings, "media", stages, pno, bleed_log)
+            emit(out_page, pno)
+
+    else:
+        raise ValueError(f"Unsupported input type: {ext} (supported: pdf, png, jpg, jpeg, tif, tiff)")
+
+    if downsampler is not None and downsample_totals is not None:
+        _add_totals(downsample_totals, downsampler.totals)
+    return writer
+
+
+def _reset_peak_rss() -> bool:
+    """Restart this process's RSS high-water mark so _peak_rss_bytes covers only what runs next.
+
+    Build tasks call this first, so a warm pool worker reports the task's own peak rather than
+    that of the largest task it ever ran. Only Linux can do this; elsewhere returns False and
+    the peak stays a process-lifetime figure.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class _RssWindow:
+    """RSS high-water mark of one build task, as a context manager setting .peak and .scope on exit.
+
+    Opening the first window in a process resets its peak (_reset_peak_rss), so a warm pool
+    worker reports what this task used, not the largest task it ever ran: scope "task". Where
+    the peak cannot be reset, or another thread's task overlapped (jobserver builds in threads),
+    the peak may include other work and scope is "process". Windows nested in one thread (page
+    chunks assembled in-process) leave the outer window's measurement intact.
+    """
+
+    _lock = threading.Lock()
+    _open: List["_RssWindow"] = []
+
+    def __enter__(self) -> "_RssWindow":
+        self.thread = threading.get_ident()
+        self.peak: Optional[int] = None
+        self.scope = "process"
+        with _RssWindow._lock:
+            others = [w for w in _RssWindow._open if w.thread != self.thread]
+            for w in others:
+                w.shared = True
+            self.shared = bool(others)
+            self.reset = not _RssWindow._open and _reset_peak_rss()
+            _RssWindow._open.append(self)
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        with _RssWindow._lock:
+            _RssWindow._open.remove(self)
+        self.peak = _peak_rss_bytes()
+        self.scope = "task" if self.reset and not self.shared else "process"
+        return False
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """High-water resident set size of this process in bytes, or None if unavailable."""
+    try:
+        # VmHWM honours _reset_peak_rss; ru_maxrss keeps the lifetime peak
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KiB elsewhere
+        return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+    if os.name == "nt":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return int(counters.PeakWorkingSetSize)
+    return None
+
+
+def _max_peak(*values: Optional[int]) -> Optional[int]:
+    known = [v for v in values if v is not None]
+    return max(known) if known else None
+
+
+class _PdfStreamWriter:
+    """Write a PDF by streaming the pages of rendered chunk PDFs straight to disk.
+
+    Each chunk is parsed, its page objects are renumbered and written out, and the
+    chunk is then dropped, so memory is bounded by one chunk instead of the whole
+    document. An object whose content matches one already written (a font or image
+    every chunk carries) is not written again; later chunks refer to the first copy.
+    Objects are numbered page by page, so the same pages give the same file however
+    they were split into chunks (a whole unchunked output is just one chunk).
+
+    With object_streams, non-stream objects are packed (Flate) into /ObjStm streams of
+    up to OBJSTM_SIZE objects and the xref table becomes a compressed xref stream.
+    """
+
+    OBJSTM_SIZE = 100
+
+    def __init__(self, f: BinaryIO, object_streams: bool = False):
+        self._f = f
+        # object number -> (xref type, field 2, field 3): (1, offset, 0) or (2, objstm number, index)
+        self._xref: Dict[int, Tuple[int, int, int]] = {}
+        self._next_num = 3  # 1 = Catalog, 2 = Pages root
+        self._kids: List[int] = []
+        self._object_streams = object_streams
+        self._pending: List[Tuple[int, bytes]] = []
+        self._shared: Dict[bytes, int] = {}  # content key -> object number already written
+        self._chunks = 0  # scope of the next chunk's reader in those keys (see _object_digest)
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_chunk(self, data: bytes) -> int:
+        """Append every page of a chunk PDF. Returns the number of pages added."""
+        reader = PdfReader(io.BytesIO(data))
+        page_refs = [page.indirect_reference.idnum for page in reader.pages]
+        is_page = set(page_refs)
+        # keys of objects that point at this chunk's pages (annotations, ...) must never match
+        # another chunk's, even if that chunk's reader had the same id()
+        scope = self._chunks
+        self._chunks += 1
+
+        # page by page: number the page, then every object reachable from it that no earlier
+        # page reached (not back up the page tree, nor into other pages, which only get their
+        # number here), and write them. An object identical to one already written (e.g. by an
+        # earlier chunk) reuses it. Numbering and object stream boundaries then depend only on
+        # the page sequence, so any chunking writes the same bytes.
+        mapping: Dict[int, int] = {}
+        memo: Dict = {}
+        for page_ref in page_refs:
+            order: List[int] = []
+            pending = [page_ref]
+            while pending:
+                idnum = pending.pop()
+                if idnum in is_page:
+                    if idnum not in mapping:
+                        mapping[idnum] = self._next_num
+                        self._next_num += 1
+                    if idnum != page_ref:
+                        continue
+                elif idnum in mapping:
+                    continue
+                else:
+                    digest = _object_digest(IndirectObject(idnum, 0, reader), memo, scope)
+                    if digest in self._shared:
+                        mapping[idnum] = self._shared[digest]
+                        continue
+                    self._shared[digest] = mapping[idnum] = self._next_num
+                    self._next_num += 1
+                order.append(idnum)
+                obj = reader.get_object(idnum)
+                for child in self._refs(obj, is_page=idnum == page_ref):
+                    if child not in mapping:
+                        pending.append(child)
+
+            for idnum in order:
+                obj = reader.get_object(idnum)
+                self._remap(obj, mapping)
+                if idnum == page_ref:
+                    obj[NameObject("/Parent")] = IndirectObject(2, 0, None)
+                self._write_object(mapping[idnum], obj)
+        self._kids.extend(mapping[idnum] for idnum in page_refs)
+        return len(page_refs)
+
+    def close(self) -> None:
+        """Write the page tree, catalog, xref table (or stream) and trailer."""
+        kids = " ".join(f"{k} 0 R" for k in self._kids)
+        self._write_raw(2, f"<< /Type /Pages /Kids [ {kids} ] /Count {len(self._kids)} >>".encode("ascii"))
+        self._write_raw(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        if self._object_streams:
+            self._flush_objstm()
+            self._write_xref_stream()
+            return
+
+        xref_at = self._f.tell()
+        size = self._next_num
+        out = [f"xref\n0 {size}\n0000000000 65535 f \n"]
+        for num in range(1, size):
+            entry = self._xref.get(num)
+            out.append(f"{entry[1]:010d} 00000 n \n" if entry else "0000000000 00000 f \n")
+        out.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n")
+        self._f.write("".join(out).encode("ascii"))
+
+    def _flush_objstm(self) -> None:
+        if not self._pending:
+            return
+        num = self._next_num
+        self._next_num += 1
+        header = []
+        body = io.BytesIO()
+        for index, (obj_num, data) in enumerate(self._pending):
+            header.append(f"{obj_num} {body.tell()}")
+            body.write(data)
+            body.write(b"\n")
+            self._xref[obj_num] = (2, num, index)
+        head = (" ".join(header) + "\n").encode("ascii")
+        data = zlib.compress(head + body.getvalue(), 9)
+        self._xref[num] = (1, self._f.tell(), 0)
+        self._f.write(
+            f"{num} 0 obj\n<< /Type /ObjStm /N {len(self._pending)} /First {len(head)} "
+            f"/Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode("ascii")
+        )
+        self._f.write(data)
+        self._f.write(b"\nendstream\nendobj\n")
+        self._pending = []
+
+    def _write_xref_stream(self) -> None:
+        num = self._next_num
+        size = num + 1
+        xref_at = self._f.tell()
+        self._xref[num] = (1, xref_at, 0)
+        width = max(1, (max(max(e[1] for e in self._xref.values()), size).bit_length() + 7) // 8)
+        rows = [b"\x00" + (0).to_bytes(width, "big") + (65535).to_bytes(2, "big")]
+        for n in range(1, size):
+            kind, f2, f3 = self._xref.get(n, (0, 0, 0))
+            rows.append(bytes([kind]) + f2.to_bytes(width, "big") + f3.to_bytes(2, "big"))
+        data = zlib.compress(b"".join(rows), 9)
+        self._f.write(
+            f"{num} 0 obj\n<< /Type /XRef /Size {size} /W [ 1 {width} 2 ] /Root 1 0 R "
+            f"/Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode("ascii")
+        )
+        self._f.write(data)
+        self._f.write(f"\nendstream\nendobj\nstartxref\n{xref_at}\n%%EOF\n".encode("ascii"))
+
+    @staticmethod
+    def _refs(obj, is_page: bool) -> Iterable[int]:
+        stack = [obj]
+        while stack:
+            o = stack.pop()
+            if isinstance(o, IndirectObject):
+                yield o.idnum
+            elif isinstance(o, DictionaryObject):
+                for k, v in o.items():
+                    if not (is_page and o is obj and k == "/Parent"):
+                        stack.append(v)
+            elif isinstance(o, ArrayObject):
+                stack.extend(o)
+
+    @staticmethod
+    def _remap(obj, mapping: Dict[int, int]) -> None:
+        stack = [obj]
+        while stack:
+            o = stack.pop()
+            if isinstance(o, DictionaryObject):
+                items = list(o.items())
+                for k, v in items:
+                    if isinstance(v, IndirectObject):
+                        o[k] = IndirectObject(mapping[v.idnum], 0, None) if v.idnum in mapping else v
+                    else:
+                        stack.append(v)
+            elif isinstance(o, ArrayObject):
+                for i, v in enumerate(o):
+                    if isinstance(v, IndirectObject):
+                        o[i] = IndirectObject(mapping[v.idnum], 0, None) if v.idnum in mapping else v
+                    else:
+                        stack.append(v)
+
+    def _write_object(self, num: int, obj) -> None:
+        bio = io.BytesIO()
+        obj.write_to_stream(bio)
+        self._write_raw(num, bio.getvalue(), isinstance(obj, StreamObject))
+
+    def _write_raw(self, num: int, body: bytes, is_stream: bool = False) -> None:
+        if self._object_streams and not is_stream:
+            self._pending.append((num, body))
+            if len(self._pending) >= self.OBJSTM_SIZE:
+                self._flush_objstm()
+            return
+        self._xref[num] = (1, self._f.tell(), 0)
+        self._f.write(f"{num} 0 obj\n".encode("ascii"))
+        self._f.write(body)
+        self._f.write(b"\nendobj\n")
+
+
+def _open_output(path: str) -> BinaryIO:
+    """Open an output PDF for writing, first unlinking any existing file.
+
+    Outputs may be hard links into the result cache; writing through one would
+    corrupt the cached copy.
+    """
+    if os.path.lexists(path):
+        os.remove(path)
+    return open(path, "wb")
+
+
+class ResultCache:
+    """Content-addressed on-disk cache of built outputs with LRU eviction.
+
+    Entries are keyed by a hash of the input file bytes plus the normalized job
+    settings that affect the output, so the same artwork built with the same
+    layout is never rebuilt. Hits are hard-linked (or copied) to the output path.
+    """
+
+    def __init__(self, root: str, max_bytes: int = CACHE_MAX_BYTES, link: bool = True):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_bytes)
+        self.link = bool(link)
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+
+    @staticmethod
+    def key_for(job: Dict, index: int) -> str:
+        """Cache key for job["inputs"][index]."""
+        item = job["inputs"][index]
+        spec = {
+            "version": CACHE_VERSION,
+            "job": {k: v for k, v in job.items() if k not in ("inputs", "layout", "output", "engine")},
+            "ext": os.path.splitext(item["path"])[1].lower(),
+            "input": {k: v for k, v in item.items() if k not in ("path", "page_count")},
+            "layout": job.get("layout", {}),
+            "output": {
+                k: v for k, v in job.get("output", {}).items() if k not in ("dir", "basename", "job_json_path")
+            },
+        }
+        slug = (job.get("layout", {}).get("marks") or {}).get("slug")
+        if slug:
+            # the filled-in slug line depends on basename/date, which are not part of the spec above
+            spec["slug"] = _slug_text(job, slug)
+        h = hashlib.sha256()
+        with open(item["path"], "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        h.update(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+        return h.hexdigest()
+
+    def fetch(self, key: str, out_path: str) -> Optional[Dict]:
+        """Materialize a cached output at out_path. Returns its metadata, or None on a miss."""
+        pdf_path, meta_path = self._entry(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self._materialize(pdf_path, out_path)
+        except (OSError, ValueError):
+            self._bump("misses")
+            return None
+        # touch the entry so LRU eviction sees it as recently used (it may be evicted meanwhile)
+        for path in (pdf_path, meta_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        self._bump("hits")
+        return meta
+
+    def store(self, key: str, out_path: str, meta: Dict) -> None:
+        """Add a freshly built output to the cache, then evict down to max_bytes."""
+        pdf_path, meta_path = self._entry(key)
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        tmp_path = f"{pdf_path}.{_tmp_suffix()}"
+        self._materialize(out_path, tmp_path)
+        os.replace(tmp_path, pdf_path)
+        tmp_path = f"{meta_path}.{_tmp_suffix()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+        self._bump("stores")
+        self._evict()
+
+    def stats(self) -> Dict:
+        """Lifetime hit/miss/store/eviction counters plus current entry count and size."""
+        stats = self._load_stats()
+        entries = self._entries()
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(size for _, size, _ in entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] / lookups) if lookups else 0.0
+        return stats
+
+    def _entry(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.root, "objects", key[:2], key)
+        return base + ".pdf", base + ".json"
+
+    def _materialize(self, src: str, dst: str) -> None:
+        if os.path.lexists(dst):
+            os.remove(dst)
+        if self.link:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        out = []
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, "objects")):
+            for name in filenames:
+                if name.endswith(".pdf"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    out.append((st.st_mtime, st.st_size, path))
+        return out
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            for victim in (path, path[: -len(".pdf")] + ".json"):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            total -= size
+            evicted += 1
+        if evicted:
+            self._bump("evictions", evicted)
+
+    def _load_stats(self) -> Dict:
+        stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        try:
+            with open(os.path.join(self.root, "stats.json"), "r", encoding="utf-8") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    def _bump(self, counter: str, n: int = 1) -> None:
+        """Add n to a stats.json counter. Best effort: a busy lock or an I/O error drops the
+        update rather than failing the build it belongs to."""
+        path = os.path.join(self.root, "stats.json")
+        try:
+            with self._stats_lock():
+                stats = self._load_stats()
+                stats[counter] = stats.get(counter, 0) + n
+                tmp_path = f"{path}.{_tmp_suffix()}"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(stats, f)
+                os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    @contextlib.contextmanager
+    def _stats_lock(self) -> Iterator[None]:
+        """Hold stats.lock, created exclusively, so processes sharing the cache update stats in turn."""
+        lock_path = os.path.join(self.root, "stats.lock")
+        deadline = time.monotonic() + CACHE_STATS_LOCK_WAIT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > CACHE_STATS_LOCK_STALE:
+                        os.remove(lock_path)  # left by a killed process
+                except OSError:
+                    pass  # released meanwhile
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{lock_path} is busy")
+                time.sleep(0.005)
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+
+def _tmp_suffix() -> str:
+    """Temp file suffix unique to this process and thread, for write-then-rename."""
+    return f"{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _open_cache(job: Dict) -> Optional[ResultCache]:
+    """ResultCache configured by job["engine"]["cache"], or None when caching is off."""
+    cfg = (job.get("engine", {}) or {}).get("cache") or {}
+    if not cfg.get("dir"):
+        return None
+    return ResultCache(cfg["dir"], int(cfg.get("max_bytes", CACHE_MAX_BYTES)), bool(cfg.get("link", True)))
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class BuildJournal:
+    """Append-only JSON-lines log of finished work for one job, so a killed run can resume.
+
+    Lines, each flushed and fsynced before the next piece of work starts:
+      {"event": "start", "job", "resume"}              once per run; job is a digest of the settings
+      {"event": "chunk", "index", "pages", "path", "sha256", "bytes", "source", "bleed", "downsample"}
+          a page chunk of a chunked input, kept as a PDF under "<output>.chunks/"
+      {"event": "input", "index", "path", "sha256", "bytes", "source", "record"}
+          a finished output; its chunk files are removed afterwards
+    source is the input file's size and mtime. With resume, entries from earlier runs of the
+    same job are reused when the input is unchanged and the file still hashes to sha256;
+    everything else is rebuilt. Without resume the journal starts over.
+    """
+
+    def __init__(self, path: str, job: Dict, resume: bool = False):
+        self.path = os.path.abspath(path)
+        self.job_digest = self.digest(job)
+        self.resumed_inputs = 0
+        self.resumed_chunks = 0
+        self._inputs: Dict[int, Dict] = {}
+        self._chunks: Dict[Tuple[int, Tuple[int, ...]], Dict] = {}
+        if resume:
+            self._load()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file: TextIO = open(self.path, "a" if resume else "w", encoding="utf-8")
+        self._append({"event": "start", "job": self.job_digest, "resume": bool(resume)})
+
+    @staticmethod
+    def digest(job: Dict) -> str:
+        """Digest of what decides the job's outputs; a journal from another job is ignored."""
+        _, page_chunk, streaming = _engine_settings(job)
+        spec = {
+            "version": CACHE_VERSION,
+            "job": {k: v for k, v in job.items() if k != "engine"},
+            "engine": {"page_chunk": page_chunk, "streaming": streaming},
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def resumed_record(self, job: Dict, index: int) -> Optional[Dict]:
+        """The record of a verified finished output for job["inputs"][index], or None."""
+        entry = self._inputs.get(index)
+        if entry is None or not self._verified(entry, job, index):
+            return None
+        self.resumed_inputs += 1
+        return dict(entry["record"], resumed=True)
+
+    def missing_chunks(self, job: Dict, index: int, plan: List[List[int]]) -> List[List[int]]:
+        """The chunks of plan that have no verified chunk file yet."""
+        return [pages for pages in plan if self._chunk_entry(job, index, pages) is None]
+
+    def chunks(
+        self, job: Dict, index: int, plan: List[List[int]], built: Iterable[Tuple]
+    ) -> Iterator[Tuple[bytes, Optional[int], List[Dict], List[Dict], Dict[str, int]]]:
+        """All chunks of plan in order: saved ones read back, the rest taken from built
+        (the missing_chunks, in order), saved and journaled as they arrive."""
+        built = iter(built)
+        for pages in plan:
+            entry = self._chunk_entry(job, index, pages)
+            if entry is not None:
+                with open(entry["path"], "rb") as f:
+                    data = f.read()
+                self.resumed_chunks += 1
+                yield data, None, [], entry["bleed"], entry["downsample"]
+                continue
+            chunk = next(built)
+            path = os.path.join(self._chunk_dir(job, index), f"{pages[0] + 1}-{pages[-1] + 1}.pdf")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(chunk[0])
+            os.replace(path + ".tmp", path)
+            self._append({
+                "event": "chunk",
+                "index": index,
+                "pages": list(pages),
+                "path": path,
+                "sha256": hashlib.sha256(chunk[0]).hexdigest(),
+                "bytes": len(chunk[0]),
+                "source": _input_source(job, index),
+                "bleed": chunk[3],
+                "downsample": chunk[4],
+            })
+            yield chunk
+
+    def add_input(self, job: Dict, index: int, record: Dict) -> None:
+        """Journal a finished output, then drop its chunk files."""
+        self._append({
+            "event": "input",
+            "index": index,
+            "path": record["path"],
+            "sha256": _file_sha256(record["path"]),
+            "bytes": record["bytes"],
+            "source": _input_source(job, index),
+            "record": {k: v for k, v in record.items() if k not in ("stage_events", "cache", "resumed")},
+        })
+        shutil.rmtree(self._chunk_dir(job, index), ignore_errors=True)
+
+    def stats(self) -> Dict:
+        return {"path": self.path, "resumed_inputs": self.resumed_inputs, "resumed_chunks": self.resumed_chunks}
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        current = False
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line torn by the crash
+            event = entry.get("event")
+            if event == "start":
+                # a run of some other job (or an older version) invalidates everything before it
+                current = entry.get("job") == self.job_digest
+                if not current:
+                    self._inputs.clear()
+                    self._chunks.clear()
+            elif current and event == "input":
+                self._inputs[entry["index"]] = entry
+            elif current and event == "chunk":
+                self._chunks[(entry["index"], tuple(entry["pages"]))] = entry
+
+    def _chunk_entry(self, job: Dict, index: int, pages: List[int]) -> Optional[Dict]:
+        entry = self._chunks.get((index, tuple(pages)))
+        if entry is None or not self._verified(entry, job, index):
+            return None
+        return entry
+
+    @staticmethod
+    def _verified(entry: Dict, job: Dict, index: int) -> bool:
+        try:
+            return (
+                entry["source"] == _input_source(job, index)
+                and os.path.getsize(entry["path"]) == entry["bytes"]
+                and _file_sha256(entry["path"]) == entry["sha256"]
+            )
+        except OSError:
+            return False
+
+    @staticmethod
+    def _chunk_dir(job: Dict, index: int) -> str:
+        return _output_path(job, index) + ".chunks"
+
+    def _append(self, entry: Dict) -> None:
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+def _input_source(job: Dict, index: int) -> Dict:
+    """Size and mtime of job["inputs"][index], to notice an input replaced between runs."""
+    st = os.stat(job["inputs"][index]["path"])
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _journal_path(job: Dict) -> Optional[str]:
+    """job["engine"]["journal"]: a path, or True for "<basename>.journal.jsonl" next to the job JSON."""
+    journal = (job.get("engine", {}) or {}).get("journal")
+    if not journal:
+        return None
+    if isinstance(journal, str):
+        return journal
+    output = job.get("output", {})
+    folder = os.path.dirname(output["job_json_path"]) if output.get("job_json_path") else output.get("dir", os.getcwd())
+    return os.path.join(folder, f"{output.get('basename', 'output')}.journal.jsonl")
+
+
+def _open_journal(job: Dict) -> Optional[BuildJournal]:
+    """BuildJournal configured by job["engine"]["journal"] / ["resume"], or None when journaling is off."""
+    path = _journal_path(job)
+    if path is None:
+        return None
+    return BuildJournal(path, job, bool((job.get("engine", {}) or {}).get("resume", False)))
+
+
+def _build_input(job: Dict, index: int, record_stages: bool = False) -> Dict:
+    """Build the output PDF for job["inputs"][index]. Runs in-process or in a worker.
+
+    With record_stages the record carries its stage events under "stage_events".
+    """
+    _load_pdf_libs()
+    with _RssWindow() as rss:
+        t0 = time.perf_counter()
+        item = job["inputs"][index]
+        out_path = _output_path(job, index)
+        stages = _StageLog(item["path"]) if record_stages else _NO_STAGES
+        profile = _output_profile(job)
+        bleed_log: List[Dict] = []
+        downsample: Dict[str, int] = {}
+        writer = _render_input(item, compile_layout(job).settings, stages=stages, use_mmap=_mmap_inputs(job),
+                               bleed_log=bleed_log, downsample_totals=downsample)
+        with stages("write"):
+            with _open_output(out_path) as f:
+                _write_pdf(writer, f, profile)
+    record = {
+        "input": item["path"],
+        "path": out_path,
+        "pages": len(writer.pages),
+        "bytes": os.path.getsize(out_path),
+        "profile": profile["name"],
+        "peak_rss": rss.peak,
+        "peak_rss_scope": rss.scope,
+        "seconds": round(time.perf_counter() - t0, 6),
+    }
+    if bleed_log:
+        record["bleed"] = bleed_log
+    if downsample:
+        record["downsample"] = downsample
+    if record_stages:
+        record["stage_events"] = stages.events
+    return record
+
+
+def _build_chunk(
+    job: Dict, index: int, page_indexes: List[int], record_stages: bool = False
+) -> Tuple[bytes, Optional[int], List[Dict], List[Dict], Dict[str, int]]:
+    """Render a page chunk of job["inputs"][index] to PDF bytes. Runs in-process or in a worker.
+
+    Returns (pdf bytes, peak RSS, stage events, per-page bleed choices, downsample totals).
+    """
+    _load_pdf_libs()
+    with _RssWindow() as rss:
+        item = job["inputs"][index]
+        stages = _StageLog(item["path"]) if record_stages else _NO_STAGES
+        bleed_log: List[Dict] = []
+        downsample: Dict[str, int] = {}
+        writer = _render_input(item, compile_layout(job).settings, page_indexes, stages, _mmap_inputs(job), bleed_log,
+                               downsample)
+        bio = io.BytesIO()
+        with stages("write_chunk"):
+            _compact_writer(writer, _output_profile(job))
+            writer.write(bio)
+        data = bio.getvalue()
+    if record_stages:
+        stages.events[-1]["bytes"] = len(data)
+    return data, rss.peak, stages.events, bleed_log, downsample
+
+
+def _assemble_chunks(
+    job: Dict,
+    index: int,
+    chunks: Iterable[Tuple[bytes, Optional[int], List[Dict], List[Dict], Dict[str, int]]],
+    record_stages: bool = False,
+) -> Dict:
+    """Concatenate rendered page chunks, in order, into one output PDF.
+
+    Chunks are written out as they arrive, so memory is bounded by one chunk.
+    """
+    with _RssWindow() as rss:
+        t0 = time.perf_counter()
+        out_path = _output_path(job, index)
+        stages = _StageLog(job["inputs"][index]["path"]) if record_stages else _NO_STAGES
+        profile = _output_profile(job)
+        pages = 0
+        peak = None
+        events: List[Dict] = []
+        bleed_log: List[Dict] = []
+        downsample: Dict[str, int] = {}
+        with _open_output(out_path) as f:
+            # chunks are compacted one by one; the stream writer drops repeats across chunks
+            stream_writer = _PdfStreamWriter(f, object_streams=profile["object_streams"])
+            for data, chunk_peak, chunk_events, chunk_bleed, chunk_downsample in chunks:
+                events.extend(chunk_events)
+                bleed_log.extend(chunk_bleed)
+                _add_totals(downsample, chunk_downsample)
+                with stages("assemble"):
+                    pages += stream_writer.add_chunk(data)
+                peak = _max_peak(peak, chunk_peak)
+            with stages("write"):
+                stream_writer.close()
+    record = {
+        "input": job["inputs"][index]["path"],
+        "path": out_path,
+        "pages": pages,
+        "bytes": os.path.getsize(out_path),
+        "profile": profile["name"],
+        "peak_rss": _max_peak(peak, rss.peak),
+        "peak_rss_scope": rss.scope,
+        "seconds": round(time.perf_counter() - t0, 6),
+    }
+    if bleed_log:
+        record["bleed"] = bleed_log
+    if downsample:
+        record["downsample"] = downsample
+    if record_stages:
+        record["stage_events"] = events + stages.events
+    return record
+
+
+def _drain(futures: List) -> Iterable:
+    """Yield future results in order, releasing each one as soon as it is consumed."""
+    while futures:
+        yield futures.pop(0).result()
+
+
+def _chunk_plan(item: Dict, page_chunk: int) -> Optional[List[List[int]]]:
+    """Split a PDF (or multi-page TIFF) input's selected pages into chunks, or None to build it whole."""
+    ext = os.path.splitext(item["path"])[1].lower()
+    if page_chunk <= 0 or ext not in (".pdf",) + _TIFF_EXTS:
+        return None
+    if ext == ".pdf":
+        count = pdf_page_count(item["path"])
+    else:
+        count = tiff_frame_count(item["path"])
+    pages = parse_page_range(item.get("pages", "all"), count)
+    if len(pages) <= page_chunk:
+        return None
+    return [pages[i:i + page_chunk] for i in range(0, len(pages), page_chunk)]
+
+
+def _engine_settings(job: Dict) -> Tuple[int, int, bool]:
+    """Return (workers, page_chunk, streaming) from job["engine"]. workers <= 0 means one per CPU."""
+    engine = job.get("engine", {}) or {}
+    workers = int(engine.get("workers", 1) or 0)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    page_chunk = int(engine.get("page_chunk", 0) or 0)
+    streaming = bool(engine.get("streaming", False))
+    if streaming and page_chunk <= 0:
+        page_chunk = STREAM_CHUNK_PAGES
+    return workers, page_chunk, streaming
+
+
+def _mmap_inputs(job: Dict) -> bool:
+    """job["engine"]["mmap"]: read PDF inputs through a memory map (see _open_pdf_reader)."""
+    return bool((job.get("engine", {}) or {}).get("mmap", False))
+
+
+def build_press_pdf(
+    job: Dict,
+    report: Optional[Dict] = None,
+    metrics: Optional[Callable[[Dict], None]] = None,
+) -> List[str]:
+    """Build press PDFs from the job spec. Returns created PDF paths.
+
+    job["engine"] controls execution:
+      workers     processes to spread inputs/chunks across (1 = serial, 0 = one per CPU)
+      page_chunk  split PDF/TIFF inputs with more selected pages than this into chunks (0 = off);
+                  chunks are written straight to disk as they finish, so memory stays
+                  bounded by one chunk
+      streaming   chunk by default: page_chunk defaults to STREAM_CHUNK_PAGES
+      cache       {"dir", "max_bytes", "link"}: reuse outputs of identical input bytes +
+                  settings from a ResultCache instead of rebuilding (off when unset)
+      metrics     path of a JSON-lines file to append stage events to (see metrics below)
+      mmap        read PDF inputs through a read-only memory map, so workers building
+                  chunks of the same large source share its pages in the OS page cache
+      journal     path of an append-only BuildJournal, or True for "<basename>.journal.jsonl"
+                  next to the job JSON; finished outputs and page chunks are logged with hashes
+      resume      with journal: reuse verified outputs and chunks logged by an earlier,
+                  interrupted run and rebuild only the rest (report["journal"] counts them)
+
+    Output bytes depend only on the job spec, never on the worker count, page_chunk or
+    streaming: page order is preserved and objects are numbered page by page as they are
+    written (see _PdfStreamWriter), so a chunked parallel run is identical to a serial one.
+    Callers that run with workers > 1 from a frozen exe must call
+    multiprocessing.freeze_support() in their entry point.
+
+    job["output"]["profile"] picks the size/time trade-off of the written file (see
+    OUTPUT_PROFILES): "fast" (default) or "compact", which is smaller but slower to write.
+
+    If report is given it is filled with one record per input under "inputs"
+    (input, path, pages, bytes, profile, peak_rss, peak_rss_scope, and cache hit/miss when
+    caching) and the job-wide "peak_rss", "peak_rss_scope" and "cache" stats. peak_rss is the
+    high-water RSS in bytes while the input was built (None for cache hits). peak_rss_scope is
+    "task" when that peak covers this build alone, or "process" when it is the lifetime peak of
+    the process(es) that did the work, which may include earlier or concurrent jobs (platforms
+    that cannot reset the peak, or builds overlapping in threads; see _RssWindow). With a mirror/smear
+    bleed_generator each record also has "bleed": [{"page", "bleed"}, ...], where bleed
+    is "source" when the page's own bleed was used (layout["bleed_preflight"], see
+    BLEED_PREFLIGHT_MODES) or the generator's name, and report["bleed"] counts them.
+    With layout["downsample"] records that resampled images have "downsample" totals
+    (images, bytes_in, bytes_out, pixel_bytes_in, pixel_bytes_out; see _Downsampler),
+    summed job-wide in report["downsample"].
+
+    metrics is a callable (e.g. JsonLinesSink) that receives plain dict events:
+      {"event": "stage", "input", "stage", "page", "seconds"[, "bytes"]} per stage, where
+          stage is open, read, downsample, place, preflight, bleed, raster_bleed, marks, impose, tile,
+          write_chunk, assemble or write (page is 1-based, None for per-input stages)
+      {"event": "input", "input", "path", "pages", "bytes", "seconds", "profile", "bleed",
+       "downsample", "stages", "cache", "resumed"}
+          once per input, with per-stage totals
+      {"event": "job", "inputs", "pages", "bytes", "seconds"} once at the end
+    Events from worker processes are delivered in the calling process, per input in
+    input order. With no sink (and no job["engine"]["metrics"]) nothing is recorded.
+    """
+    _load_pdf_libs()
+    sink = metrics
+    sink_path = (job.get("engine", {}) or {}).get("metrics")
+    if sink is None and sink_path:
+        sink = JsonLinesSink(sink_path)
+    try:
+        return _build_press_pdf(job, report, sink)
+    finally:
+        if sink is not None and sink is not metrics:
+            sink.close()
+
+
+def _build_press_pdf(job: Dict, report: Optional[Dict], sink: Optional[Callable[[Dict], None]]) -> List[str]:
+    t0 = time.perf_counter()
+    output = job.get("output", {})
+    inputs = job.get("inputs", [])
+
+    if not inputs:
+        raise ValueError("No inputs provided")
+
+    # Validate (and compile) the layout up front so a bad spec fails before any work is scheduled.
+    compile_layout(job)
+    _output_profile(job)
+
+    out_dir = output.get("dir", os.getcwd())
+    os.makedirs(out_dir, exist_ok=True)
+
+    journal = _open_journal(job)
+    try:
+        return _build_inputs(job, report, sink, journal, t0)
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+def _build_inputs(
+    job: Dict,
+    report: Optional[Dict],
+    sink: Optional[Callable[[Dict], None]],
+    journal: Optional[BuildJournal],
+    t0: float,
+) -> List[str]:
+    """Resume, fetch from the cache or build every input of an already validated job."""
+    inputs = job["inputs"]
+    workers, page_chunk, streaming = _engine_settings(job)
+    records: List[Optional[Dict]] = [None] * len(inputs)
+
+    if journal is not None:
+        for index in range(len(inputs)):
+            records[index] = journal.resumed_record(job, index)
+            if records[index] is not None:
+                _emit_record(sink, records[index])
+
+    cache = _open_cache(job)
+    cache_keys: Dict[int, str] = {}
+    if cache is not None:
+        for index in range(len(inputs)):
+            if records[index] is not None:
+                continue
+            key = cache.key_for(job, index)
+            meta = cache.fetch(key, _output_path(job, index))
+            if meta is None:
+                cache_keys[index] = key
+            else:
+                records[index] = dict(meta, input=inputs[index]["path"], path=_output_path(job, index),
+                                      peak_rss=None, cache="hit")
+                _emit_record(sink, records[index])
+                if journal is not None:
+                    journal.add_input(job, index, records[index])
+
+    todo = [index for index in range(len(inputs)) if records[index] is None]
+    plans = {index: _chunk_plan(inputs[index], page_chunk) for index in todo}
+    # chunks saved by an earlier run are read back instead of rebuilt
+    to_build = {
+        index: journal.missing_chunks(job, index, plan) if journal is not None else plan
+        for index, plan in plans.items() if plan is not None
+    }
+    n_tasks = sum(len(to_build[index]) if plans[index] else 1 for index in todo)
+
+    record_stages = sink is not None
+
+    def assemble(index: int, built: Iterable[Tuple]) -> Dict:
+        if journal is not None:
+            built = journal.chunks(job, index, plans[index], built)
+        return _assemble_chunks(job, index, built, record_stages)
+
+    def finish(index: int) -> None:
+        _emit_record(sink, records[index], index in cache_keys)
+        if journal is not None:
+            journal.add_input(job, index, records[index])
+
+    # Build one output PDF per input file (simple + matches v0.1 behavior)
+    if workers <= 1 or n_tasks <= 1:
+        for index in todo:
+            if plans[index] is None:
+                records[index] = _build_input(job, index, record_stages)
+            else:
+                records[index] = assemble(index, (_build_chunk(job, index, pages, record_stages)
+                                                  for pages in to_build[index]))
+            finish(index)
+        return _finish_report(job, records, report, cache, cache_keys, sink, t0, journal)
+
+    # Inputs that map to the same output name overwrite each other serially; in parallel only
+    # the last one is built so two workers never write the same file.
+    last_for_path = {_output_path(job, index): index for index in todo}
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(workers, n_tasks)) as pool:
+        futures = {}
+        for index in todo:
+            if last_for_path[_output_path(job, index)] != index:
+                continue
+            elif plans[index] is None:
+                futures[index] = pool.submit(_build_input, job, index, record_stages)
+            else:
+                futures[index] = [pool.submit(_build_chunk, job, index, pages, record_stages)
+                                  for pages in to_build[index]]
+        for index, fut in futures.items():
+            if isinstance(fut, list):
+                records[index] = assemble(index, _drain(fut))
+            else:
+                records[index] = fut.result()
+            finish(index)
+        futures.clear()
+
+    return _finish_report(job, records, report, cache, cache_keys, sink, t0, journal)
+
+
+def _emit_record(sink: Optional[Callable[[Dict], None]], record: Dict, cache_miss: bool = False) -> None:
+    """Send an input's stage events and its summary event to the metrics sink."""
+    events = record.pop("stage_events", None) or []
+    if sink is None:
+        return
+    for event in events:
+        sink(event)
+    sink({
+        "event": "input",
+        "input": record["input"],
+        "path": record["path"],
+        "pages": record["pages"],
+        "bytes": record["bytes"],
+        "seconds": record.get("seconds"),
+        "profile": record.get("profile"),
+        "bleed": _bleed_counts(record.get("bleed", ())) or None,
+        "downsample": record.get("downsample"),
+        "stages": _stage_totals(events),
+        "cache": record.get("cache") or ("miss" if cache_miss else None),
+        "resumed": bool(record.get("resumed")),
+    })
+
+
+def _bleed_counts(entries: Iterable[Dict]) -> Dict[str, int]:
+    """Pages per bleed choice ("source", "mirror", "smear") in bleed_log entries."""
+    counts: Dict[str, int] = {}
+    for entry in entries:
+        counts[entry["bleed"]] = counts.get(entry["bleed"], 0) + 1
+    return counts
+
+
+def _add_totals(totals: Dict[str, int], more: Dict[str, int]) -> None:
+    """Add the counters in more to totals, in place."""
+    for key, value in more.items():
+        totals[key] = totals.get(key, 0) + value
+
+
+def _finish_report(
+    job: Dict,
+    records: List[Optional[Dict]],
+    report: Optional[Dict],
+    cache: Optional[ResultCache] = None,
+    cache_keys: Optional[Dict[int, str]] = None,
+    sink: Optional[Callable[[Dict], None]] = None,
+    t0: Optional[float] = None,
+    journal: Optional[BuildJournal] = None,
+) -> List[str]:
+    """Store new results in the cache, fill the optional caller report and return the
+    created paths in input order."""
+    if cache is not None:
+        for index, key in (cache_keys or {}).items():
+            record = records[index]
+            if record is not None:
+                meta = {"pages": record["pages"], "bytes": record["bytes"]}
+                if record.get("bleed"):
+                    meta["bleed"] = record["bleed"]
+                if record.get("downsample"):
+                    meta["downsample"] = record["downsample"]
+                cache.store(key, record["path"], meta)
+                record["cache"] = "miss"
+
+    if report is not None:
+        done = [r for r in records if r is not None]
+        report["inputs"] = done
+        report["peak_rss"] = _max_peak(*(r["peak_rss"] for r in done))
+        scopes = {r.get("peak_rss_scope", "process") for r in done if r["peak_rss"] is not None}
+        report["peak_rss_scope"] = "process" if "process" in scopes else "task" if scopes else None
+        bleed = _bleed_counts(entry for r in done for entry in r.get("bleed", ()))
+        if bleed:
+            report["bleed"] = bleed
+        downsample: Dict[str, int] = {}
+        for r in done:
+            _add_totals(downsample, r.get("downsample") or {})
+        if downsample:
+            report["downsample"] = downsample
+        if journal is not None:
+            report["journal"] = journal.stats()
+        if cache is not None:
+            report["cache"] = {
+                "hits": sum(1 for r in done if r.get("cache") == "hit"),
+                "misses": sum(1 for r in done if r.get("cache") == "miss"),
+                "lifetime": cache.stats(),
+            }
+    if sink is not None:
+        done = [r for r in records if r is not None]
+        sink({
+            "event": "job",
+            "inputs": len(done),
+            "pages": sum(r["pages"] for r in done),
+            "bytes": sum(r["bytes"] for r in done),
+            "seconds": round(time.perf_counter() - t0, 6) if t0 is not None else None,
+        })
+    return [_output_path(job, index) for index in range(len(records))]
+
+
+def _input_item(entry) -> Dict:
+    """An input dict from a lazy-input entry: a path, or a dict like job["inputs"][i]."""
+    if isinstance(entry, (str, os.PathLike)):
+        return {"path": os.path.abspath(os.fspath(entry)), "pages": "all", "pdf_box": "auto"}
+    item = dict(entry)
+    item["path"] = os.path.abspath(item["path"])
+    return item
+
+
+def _single_input_job(job: Dict, item: Dict, named_by_input: bool, in_pool: bool) -> Dict:
+    """job narrowed to one input, writing to the path build_press_pdf would give that input.
+
+    An input dict may set its own "basename". Engine workers are left to the caller when
+    the input itself runs in a pool worker.
+    """
+    output = dict(job.get("output", {}))
+    output.pop("job_json_path", None)
+    base = output.get("basename", "output")
+    if item.get("basename"):
+        output["basename"] = item["basename"]
+    elif named_by_input:
+        output["basename"] = f"{base}__{os.path.splitext(os.path.basename(item['path']))[0]}"
+    engine = dict(job.get("engine", {}) or {})
+    engine.pop("metrics", None)
+    engine.pop("journal", None)
+    engine.pop("resume", None)
+    if in_pool:
+        engine["workers"] = 1
+    return dict(job, inputs=[item], output=output, engine=engine)
+
+
+def _build_one(job: Dict, index: int) -> Dict:
+    """Build the single input of job (cache, chunks and all) in this process.
+
+    Never raises for a bad input: the error is returned in the record instead, so one
+    file cannot abort a batch. Metrics events ride along under "_events".
+    """
+    t0 = time.perf_counter()
+    events: List[Dict] = []
+    try:
+        report: Dict = {}
+        _build_press_pdf(job, report, events.append)
+        record = report["inputs"][0]
+        record["error"] = None
+    except Exception as e:
+        record = {
+            "input": job["inputs"][0]["path"],
+            "path": None,
+            "pages": 0,
+            "bytes": 0,
+            "peak_rss": _peak_rss_bytes(),
+            "peak_rss_scope": "process",
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc(),
+        }
+        events = [e for e in events if e.get("event") == "stage"]
+    record["index"] = index
+    record["seconds"] = round(time.perf_counter() - t0, 6)
+    record["stages"] = _stage_totals([e for e in events if e.get("event") == "stage"])
+    record["_events"] = [e for e in events if e.get("event") != "job"]
+    return record
+
+
+def iter_press_pdf(
+    job: Dict,
+    inputs: Optional[Iterable] = None,
+    progress: Optional[Callable[[Dict], None]] = None,
+    cancel: Optional[Callable[[], bool]] = None,
+    metrics: Optional[Callable[[Dict], None]] = None,
+) -> Iterator[Dict]:
+    """Build inputs one by one and yield a result record as each finishes.
+
+    inputs is any iterable of paths or input dicts (see job["inputs"]), consumed lazily
+    so a folder walk or queue can feed it; by default job["inputs"] is used. With lazy
+    inputs every output is named "<basename>__<input name>.pdf" unless the input dict
+    sets "basename"; with job["inputs"] names match build_press_pdf.
+
+    Each record has index, input, path, pages, bytes, seconds, stages (per-stage totals),
+    peak_rss, peak_rss_scope (see build_press_pdf) and error. A failing input yields a record
+    with path None, its error and a traceback, and the batch goes on. Layout errors still
+    raise, before any input starts.
+
+    With job["engine"]["workers"] > 1 inputs run in a process pool (chunks of one input
+    run serially in its worker) and records come in completion order; use "index" to
+    restore input order. At most 2 x workers inputs are pulled ahead of the results.
+
+    progress(event) is called in the consuming thread with
+      {"event": "queued", "index", "input"} when an input is handed to a worker,
+      {"event": "finished", "index", "input", "path", "error", "done", "failed"} per result.
+    cancel() is polled before each input is queued (e.g. threading.Event().is_set); once
+    it returns True nothing new starts, queued inputs are dropped, running ones finish
+    and are yielded. Closing the generator early does the same without yielding.
+    metrics receives the same events as with build_press_pdf.
+    """
+    _load_pdf_libs()
+    compile_layout(job)
+    _output_profile(job)
+    os.makedirs(job.get("output", {}).get("dir", os.getcwd()), exist_ok=True)
+
+    sink = metrics
+    sink_path = (job.get("engine", {}) or {}).get("metrics")
+    if sink is None and sink_path:
+        sink = JsonLinesSink(sink_path)
+    named_by_input = inputs is not None or len(job.get("inputs", [])) != 1
+    entries = iter(inputs if inputs is not None else job.get("inputs", []))
+    workers, _, _ = _engine_settings(job)
+    t0 = time.perf_counter()
+    totals = {"queued": 0, "done": 0, "failed": 0, "pages": 0, "bytes": 0}
+    cancelled = cancel or (lambda: False)
+
+    def notify(event: Dict) -> None:
+        if progress is not None:
+            progress(event)
+
+    def finished(record: Dict) -> Dict:
+        for event in record.pop("_events", ()):
+            if sink is not None:
+                sink(event)
+        totals["failed" if record["error"] else "done"] += 1
+        totals["pages"] += record["pages"]
+        totals["bytes"] += record["bytes"]
+        notify({
+            "event": "finished",
+            "index": record["index"],
+            "input": record["input"],
+            "path": record["path"],
+            "error": record["error"],
+            "done": totals["done"],
+            "failed": totals["failed"],
+        })
+        return record
+
+    def next_job() -> Optional[Tuple[int, Dict]]:
+        if cancelled():
+            return None
+        try:
+            entry = next(entries)
+        except StopIteration:
+            return None
+        index = totals["queued"]
+        totals["queued"] += 1
+        sub = _single_input_job(job, _input_item(entry), named_by_input, workers > 1)
+        notify({"event": "queued", "index": index, "input": sub["inputs"][0]["path"]})
+        return index, sub
+
+    try:
+        if workers <= 1:
+            while True:
+                queued = next_job()
+                if queued is None:
+                    break
+                yield finished(_build_one(queued[1], queued[0]))
+        else:
+            yield from _iter_pool(workers, next_job, finished, cancelled)
+    finally:
+        if sink is not None:
+            sink({
+                "event": "job",
+                "inputs": totals["done"] + totals["failed"],
+                "pages": totals["pages"],
+                "bytes": totals["bytes"],
+                "seconds": round(time.perf_counter() - t0, 6),
+            })
+            if sink is not metrics:
+                sink.close()
+
+
+def _iter_pool(
+    workers: int,
+    next_job: Callable[[], Optional[Tuple[int, Dict]]],
+    finished: Callable[[Dict], Dict],
+    cancelled: Callable[[], bool],
+) -> Iterator[Dict]:
+    """iter_press_pdf's pool loop: keep up to 2 x workers inputs in flight, yield as they finish."""
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    running: Dict = {}  # future -> (index, sub job, pool it was submitted to)
+    exhausted = False
+
+    def collect(done) -> Iterator[Dict]:
+        nonlocal pool
+        for fut in done:
+            index, sub, owner = running.pop(fut)
+            try:
+                record = fut.result()
+            except BrokenProcessPool as e:
+                # a worker died (crash, OOM kill): fail this input and carry on with a new pool
+                record = {"input": sub["inputs"][0]["path"], "path": None, "pages": 0, "bytes": 0,
+                          "peak_rss": None, "peak_rss_scope": None, "index": index, "seconds": None,
+                          "stages": {}, "error": f"{type(e).__name__}: {e}"}
+                if owner is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+            yield finished(record)
+
+    try:
+        while running or not exhausted:
+            while not exhausted and len(running) < 2 * workers:
+                queued = next_job()
+                if queued is None:
+                    exhausted = True
+                    if cancelled():
+                        # drop what has not started yet; running inputs finish and are yielded
+                        for fut in [f for f in running if f.cancel()]:
+                            del running[fut]
+                    break
+                index, sub = queued
+                out_path = _output_path(sub, 0)
+                # two inputs with the same output name must not be written at the same time
+                while any(_output_path(other, 0) == out_path for _, other, _ in running.values()):
+                    done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                    yield from collect(done)
+                try:
+                    fut = pool.submit(_build_one, sub, index)
+                except BrokenProcessPool:
+                    # a worker died and its futures are not collected yet; they still fail above
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                    fut = pool.submit(_build_one, sub, index)
+                running[fut] = (index, sub, pool)
+            if running:
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                yield from collect(done)
+    finally:
+        for fut in running:
+            fut.cancel()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def write_job_json(job: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(job, f, indent=2)
+
+
+def load_presets(preset_path: str) -> Dict[str, Dict]:
+    """Load presets.json from the presets folder."""
+    with open(preset_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Presets file must be a JSON object")
+    return data
+
+
+def make_job(
+    *,
+    input_path: str,
+    pages_spec: str,
+    pdf_box: str,
+    trim_size_spec: str,
+    bleed_spec: str,
+    fit_mode: str,
+    anchor: str,
+    bleed_generator: str = "none",
+    bleed_preflight: str = "boxes",
+    placement: str = "wrap",
+    crop_marks: bool,
+    out_dir: str,
+    basename: Optional[str] = None,
+    emit_job: bool = False,
+    workers: int = 1,
+    page_chunk: int = 0,
+    streaming: bool = False,
+    cache_dir: Optional[str] = None,
+    imposition: Optional[Dict] = None,
+    tiling: Optional[Dict] = None,
+    metrics_path: Optional[str] = None,
+    mmap_inputs: bool = False,
+    marks: Optional[Dict] = None,
+    info: Optional[Dict] = None,
+    output_profile: Optional[str] = None,
+    max_ppi: Optional[float] = None,
+    downsample_pdf_images: bool = False,
+    journal: bool = False,
+    resume: bool = False,
+) -> Dict:
+    """Create a job dict compatible with both Python output and InDesign JSX.
+
+    max_ppi turns on downsampling (layout["downsample"]) of raster inputs, and with
+    downsample_pdf_images of images drawn by PDF pages too. journal keeps a BuildJournal
+    next to the job JSON (or the outputs); resume picks up an interrupted run from it.
+    """
+    w, h, unit = parse_size(trim_size_spec)
+    bleed_vals = parse_bleed(bleed_spec, unit)
+
+    if basename is None or basename.strip() == "":
+        basename = os.path.splitext(os.path.basename(input_path))[0]
+
+    # If input is a PDF or TIFF, compute page_count so the InDesign JSX can safely handle pages='all'
+    input_abs = os.path.abspath(input_path)
+    ext = os.path.splitext(input_abs)[1].lower()
+    page_count = None
+    if ext == ".pdf" or ext in _TIFF_EXTS:
+        try:
+            if ext == ".pdf":
+                page_count = pdf_page_count(input_abs)
+            else:
+                page_count = tiff_frame_count(input_abs)
+        except Exception:
+            page_count = None
+        if page_count and (pages_spec or "").strip().lower() == "all":
+            pages_spec = f"1-{page_count}"
+
+    job: Dict = {
+        "inputs": [
+            {
+                "path": input_abs,
+                "pages": pages_spec,
+                "pdf_box": pdf_box,
+                "page_count": page_count,
+            }
+        ],
+        "layout": {
+            "trim": {"w": w, "h": h, "unit": unit},
+            "bleed": {
+                "top": bleed_vals["top"],
+                "right": bleed_vals["right"],
+                "bottom": bleed_vals["bottom"],
+                "left": bleed_vals["left"],
+                "unit": unit,
+            },
+            "fit_mode": fit_mode,
+            "anchor": anchor,
+            "bleed_generator": (bleed_generator or "none").lower().strip(),
+            "bleed_preflight": (bleed_preflight or "boxes").lower().strip(),
+            "placement": (placement or "wrap").lower().strip(),
+            "auto_rotate": False,
+            "marks": dict({"crop_marks": bool(crop_marks)}, **(marks or {})),
+        },
         "output": {
             "dir": os.path.abspath(out_dir),
             "basename": basename,
         },
+        "engine": {
+            "workers": int(workers),
+            "page_chunk": int(page_chunk),
+            "streaming": bool(streaming),
+        },
     }
+    if imposition:
+        job["imposition"] = imposition
+    if tiling:
+        job["tiling"] = tiling
+    if max_ppi:
+        job["layout"]["downsample"] = {"ppi": float(max_ppi), "pdf_images": bool(downsample_pdf_images)}
+    if output_profile:
+        job["output"]["profile"] = output_profile
+    if info:
+        # free-form job/ticket fields, available to the slug line as {key}
+        job["info"] = dict(info)
+    if cache_dir:
+        job["engine"]["cache"] = {"dir": os.path.abspath(cache_dir), "max_bytes": CACHE_MAX_BYTES}
+    if metrics_path:
+        job["engine"]["metrics"] = os.path.abspath(metrics_path)
+    if mmap_inputs:
+        job["engine"]["mmap"] = True
+    if journal or resume:
+        job["engine"]["journal"] = True
+        job["engine"]["resume"] = bool(resume)
 
     if emit_job:
         job_json_path = os.path.join(os.path.abspath(out_dir), f"{basename}.job.json")
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+"""Hot-folder service: watch preset subfolders and build press PDFs on a warm worker pool.
+
+Folder layout under --root:
+  <root>/<preset name>/       drop files here (one subfolder per presets.json entry)
+  <root>/_work/               files claimed for processing (moved back to their preset
+                              folder on startup if a crash or restart left them there)
+  <root>/_done/<preset>/      press PDFs plus the original input
+  <root>/_error/<preset>/     failed inputs plus <name>.error.txt
+  <root>/_metrics.json        queue depth, latency and throughput, rewritten every scan
+
+Example:
+  python hotfolder.py --root D:/hot --presets ../presets/presets.json --workers 4 --queue 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    from .core import _warm_worker, build_press_pdf, load_presets, make_job
+except ImportError:  # run as a script, or core bundled as a top-level module
+    from core import _warm_worker, build_press_pdf, load_presets, make_job
+
+SUPPORTED_EXTS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
+WORK_DIR = "_work"
+DONE_DIR = "_done"
+ERROR_DIR = "_error"
+METRICS_FILE = "_metrics.json"
+
+
+def job_for_preset(preset: Dict, input_path: str, out_dir: str, basename: Optional[str] = None) -> Dict:
+    """Build a job from a presets.json entry (trim, bleed, fit, crop_marks, profile, max_ppi, ...)."""
+    return make_job(
+        input_path=input_path,
+        pages_spec=preset.get("pages", "all"),
+        pdf_box=preset.get("pdf_box", "auto"),
+        trim_size_spec=preset["trim"],
+        bleed_spec=str(preset.get("bleed", "0")),
+        fit_mode=preset.get("fit", "fill_bleed_proportional"),
+        anchor=preset.get("anchor", "center"),
+        bleed_generator=preset.get("bleed_generator", "none"),
+        bleed_preflight=preset.get("bleed_preflight", "boxes"),
+        placement=preset.get("placement", "wrap"),
+        crop_marks=bool(preset.get("crop_marks", False)),
+        out_dir=out_dir,
+        basename=basename,
+        output_profile=preset.get("profile"),
+        mmap_inputs=bool(preset.get("mmap", False)),
+        max_ppi=preset.get("max_ppi"),
+        downsample_pdf_images=bool(preset.get("downsample_pdf_images", False)),
+    )
+
+
+def _run_job(job: Dict) -> Dict:
+    """Worker entry point: build one job and return its report."""
+    report: Dict = {}
+    build_press_pdf(job, report=report)
+    return report
+
+
+class WarmPool:
+    """Spawn-context process pool of warm workers that outlives a killed worker.
+
+    A worker that dies (crash, OOM kill) breaks a ProcessPoolExecutor for good; the pool then
+    swaps in a fresh executor. A call that was running on it fails with BrokenProcessPool,
+    or with retry is run once more first. Calls submitted after the break never fail for it.
+    Safe to share between dispatcher threads.
+    """
+
+    def __init__(self, workers: int, retry: bool = False):
+        self.workers = workers
+        self.retry = retry
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        ctx = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_warm_worker)
+
+    def run(self, fn: Callable, *args):
+        tries = 2 if self.retry else 1
+        while True:
+            executor, future = self._submit(fn, args)
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                self._replace(executor)
+                tries -= 1
+                if not tries:
+                    raise
+
+    def _submit(self, fn: Callable, args: Tuple):
+        executor = self._executor
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:  # broken by an earlier call; this one has not run
+            self._replace(executor)
+            executor = self._executor
+            return executor, executor.submit(fn, *args)
+
+    def _replace(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:  # other threads may have replaced it already
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class HotFolderMetrics:
+    """Thread-safe counters for queue depth, per-job latency and throughput."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._finished: Deque[float] = deque(maxlen=window)
+        self.started_at = time.time()
+        self.queued = 0
+        self.in_flight = 0
+        self.done = 0
+        self.failed = 0
+
+    def on_queued(self) -> None:
+        with self._lock:
+            self.queued += 1
+
+    def on_start(self) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+    def on_finish(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+            self._latencies.append(latency)
+            self._finished.append(time.time())
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            now = time.time()
+            recent = [t for t in self._finished if now - t <= 60.0]
+            return {
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "done": self.done,
+                "failed": self.failed,
+                "latency_s": {
+                    "last": self._latencies[-1] if self._latencies else None,
+                    "p50": lat[len(lat) // 2] if lat else None,
+                    "p95": lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else None,
+                    "max": lat[-1] if lat else None,
+                },
+                "throughput_per_min": len(recent),
+                "uptime_s": round(now - self.started_at, 1),
+            }
+
+
+class HotFolder:
+    """Scan preset subfolders, queue stable files with backpressure, run them on a warm pool."""
+
+    def __init__(
+        self,
+        root: str,
+        presets: Dict[str, Dict],
+        workers: int = 2,
+        queue_size: int = 16,
+        interval: float = 2.0,
+    ):
+        self.root = os.path.abspath(root)
+        self.presets = presets
+        self.workers = max(1, int(workers))
+        self.interval = float(interval)
+        self.metrics = HotFolderMetrics()
+        self._queue: "queue.Queue[Tuple[str, str]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._seen: Dict[str, Tuple[int, float]] = {}
+        self._stop = threading.Event()
+        self._pool: Optional[WarmPool] = None
+        for name in list(presets) + [WORK_DIR, DONE_DIR, ERROR_DIR]:
+            os.makedirs(os.path.join(self.root, name), exist_ok=True)
+
+    def run(self) -> None:
+        """Run until stop() is called (or Ctrl+C)."""
+        self.recover_work()
+        self._pool = WarmPool(self.workers, retry=True)
+        try:
+            threads = [
+                threading.Thread(target=self._dispatch, name=f"hotfolder-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for t in threads:
+                t.start()
+            try:
+                while not self._stop.is_set():
+                    self.scan_once()
+                    self.write_metrics()
+                    self._stop.wait(self.interval)
+            except KeyboardInterrupt:
+                self._stop.set()
+            for _ in threads:
+                self._queue.put(("", ""))  # wake dispatchers so they can exit
+            for t in threads:
+                t.join()
+        finally:
+            self._pool.shutdown()
+        self.write_metrics()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def scan_once(self) -> int:
+        """Claim stable files into _work and queue them. Returns how many were queued.
+
+        A file is stable once its size and mtime are unchanged between two scans.
+        When the queue is full the rest stay in place until the next scan.
+        """
+        queued = 0
+        for preset_name in self.presets:
+            folder = os.path.join(self.root, preset_name)
+            try:
+                names = sorted(os.listdir(folder))
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(folder, name)
+                if not name.lower().endswith(SUPPORTED_EXTS) or not os.path.isfile(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                sig = (st.st_size, st.st_mtime)
+                if self._seen.get(path) != sig:
+                    self._seen[path] = sig
+                    continue
+                if self._queue.full():
+                    return queued
+                claimed = self._claim(path, preset_name)
+                self._seen.pop(path, None)
+                if claimed is None:
+                    continue
+                self._queue.put((preset_name, claimed))
+                self.metrics.on_queued()
+                queued += 1
+        return queued
+
+    def recover_work(self) -> int:
+        """Move files left in _work by a crash or restart back to their preset folders.
+
+        They are then picked up by the next scans like new drops. Returns how many moved;
+        files of presets that no longer exist stay in _work.
+        """
+        moved = 0
+        for preset_name in self.presets:
+            work = os.path.join(self.root, WORK_DIR, preset_name)
+            try:
+                names = sorted(os.listdir(work))
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(work, name)
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    os.replace(path, _unique_path(os.path.join(self.root, preset_name, name)))
+                except OSError:
+                    continue
+                moved += 1
+        return moved
+
+    def write_metrics(self) -> None:
+        path = os.path.join(self.root, METRICS_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.metrics.snapshot(), f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _claim(self, path: str, preset_name: str) -> Optional[str]:
+        work = os.path.join(self.root, WORK_DIR, preset_name)
+        os.makedirs(work, exist_ok=True)
+        target = _unique_path(os.path.join(work, os.path.basename(path)))
+        try:
+            os.replace(path, target)
+        except OSError:
+            return None  # still locked by the writer; retry on a later scan
+        return target
+
+    def _dispatch(self) -> None:
+        while True:
+            preset_name, path = self._queue.get()
+            if not path:
+                return
+            self.metrics.on_start()
+            t0 = time.perf_counter()
+            ok = self._process(preset_name, path)
+            self.metrics.on_finish(time.perf_counter() - t0, ok)
+
+    def _process(self, preset_name: str, path: str) -> bool:
+        done_dir = os.path.join(self.root, DONE_DIR, preset_name)
+        error_dir = os.path.join(self.root, ERROR_DIR, preset_name)
+        try:
+            # never overwrite an earlier result with the same name (e.g. art.pdf and art.jpg)
+            stem = os.path.splitext(os.path.basename(path))[0]
+            out_pdf = _unique_path(os.path.join(done_dir, stem + ".pdf"))
+            basename = os.path.splitext(os.path.basename(out_pdf))[0]
+            job = job_for_preset(self.presets[preset_name], path, done_dir, basename)
+            self._pool.run(_run_job, job)
+        except Exception:
+            os.makedirs(error_dir, exist_ok=True)
+            failed = _unique_path(os.path.join(error_dir, os.path.basename(path)))
+            shutil.move(path, failed)
+            with open(failed + ".error.txt", "w", encoding="utf-8") as f:
+                f.write(traceback.format_exc())
+            return False
+        shutil.move(path, _unique_path(os.path.join(done_dir, "source", os.path.basename(path))))
+        return True
+
+
+def _unique_path(path: str) -> str:
+    """path, or path with a numeric suffix if it already exists."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(path)
+    n = 1
+    while os.path.exists(f"{stem}_{n}{ext}"):
+        n += 1
+    return f"{stem}_{n}{ext}"
+
+
+def main():
+    p = argparse.ArgumentParser(description="PressDrop Bleed Fixer hot folder")
+    p.add_argument("--root", required=True, help="Hot folder root (one subfolder per preset is created)")
+    p.add_argument("--presets", required=True, help="Path to presets.json")
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Worker processes")
+    p.add_argument("--queue", type=int, default=16, help="Max queued files before scanning pauses")
+    p.add_argument("--interval", type=float, default=2.0, help="Seconds between folder scans")
+    args = p.parse_args()
+
+    folder = HotFolder(
+        args.root,
+        load_presets(args.presets),
+        workers=args.workers,
+        queue_size=args.queue,
+        interval=args.interval,
+    )
+    print(f"Watching {folder.root} ({len(folder.presets)} presets, {folder.workers} workers). Ctrl+C to stop.")
+    folder.run()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
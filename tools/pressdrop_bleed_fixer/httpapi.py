@@ -0,0 +1,571 @@
+#!/usr/bin/env python
+"""Local HTTP job API around make_job/build_press_pdf.
+
+Jobs are queued and built on a warm process pool, at most --concurrency at a time, so
+the WordPress side (or curl) can hand over artwork and fetch the press PDF back
+without anyone running the desktop tool.
+
+  python httpapi.py --port 8766 --work D:/pressdrop_api [--concurrency 2] [--token s3cret]
+                    [--allow-path D:/artwork] [--cache D:/pressdrop_cache]
+
+Endpoints (JSON unless noted; send the token as X-PressDrop-Token when --token is set):
+  POST /jobs              multipart/form-data with "file" (the artwork) and "job" or
+                          "options" (JSON), or a JSON body with "job"/"options" naming an
+                          input path under an --allow-path root. "options" takes make_job
+                          keyword arguments (trim_size_spec, bleed_spec, fit_mode, ...);
+                          "job" is a full job dict. Returns 202 {"id", "status_url",
+                          "pdf_url"}. Add ?wait=1 to block and get the PDF back instead.
+  GET  /jobs/<id>         state (queued, running, done, failed), timings, report, error
+  GET  /jobs/<id>/pdf     the finished PDF, streamed (?n=<k> for the k-th output)
+  DELETE /jobs/<id>       forget a finished job and delete its files
+  GET  /status            queue depth, running jobs, concurrency, uptime
+  GET  /metrics           latency percentiles and throughput (same fields as the hot folder)
+
+Example:
+  curl -F file=@art.pdf -F 'options={"trim_size_spec":"4x6in","bleed_spec":"0.125"}' \\
+       "http://127.0.0.1:8766/jobs?wait=1" -o art_press.pdf
+
+The server binds to 127.0.0.1 only and needs no outside services. Output folders,
+workers, caches, journals and metrics files are chosen by the server, never by the
+request, and a request's output basenames must be plain file names.
+"""
+
+from __future__ import annotations
+
+import argparse
+import email.parser
+import email.policy
+import json
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+import traceback
+import uuid
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from . import core
+    from .hotfolder import SUPPORTED_EXTS, HotFolderMetrics, WarmPool
+except ImportError:  # run as a script, or bundled as top-level modules
+    import core
+    from hotfolder import SUPPORTED_EXTS, HotFolderMetrics, WarmPool
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+TOKEN_HEADER = "X-PressDrop-Token"
+
+MAX_UPLOAD_BYTES = 2 * 1024 ** 3
+# JSON bodies and the "job"/"options" form fields are read into memory; uploads never are.
+MAX_FIELD_BYTES = 1024 ** 2
+COPY_CHUNK = 1024 ** 2
+# A multipart part whose headers do not end within this many bytes is rejected.
+MAX_PART_HEADER_BYTES = 16 * 1024
+# Finished jobs (and their files) kept before the oldest are deleted.
+KEEP_FINISHED = 200
+
+_OPTION_DEFAULTS = {
+    "pages_spec": "all",
+    "pdf_box": "auto",
+    "bleed_spec": "0.125",
+    "fit_mode": "fill_bleed_proportional",
+    "anchor": "center",
+    "crop_marks": False,
+}
+# make_job arguments a request may not set: the server owns paths, workers and side files.
+_SERVER_OPTIONS = ("input_path", "out_dir", "emit_job", "workers", "cache_dir", "metrics_path", "journal", "resume")
+# job["engine"] keys a request may set; everything else there (cache, metrics, journal, ...)
+# names server-side files or resources and is dropped.
+_CLIENT_ENGINE_KEYS = ("page_chunk", "streaming", "mmap")
+
+
+def _build(job: Dict) -> Tuple[List[str], Dict]:
+    """Worker entry point: build one job, return (paths, report)."""
+    report: Dict = {}
+    paths = core.build_press_pdf(job, report=report)
+    return paths, report
+
+
+class JobQueue:
+    """FIFO of submitted jobs, drained by `concurrency` dispatcher threads into a warm pool."""
+
+    def __init__(self, work_dir: str, concurrency: int = 2, cache_dir: Optional[str] = None):
+        self.work_dir = os.path.abspath(work_dir)
+        self.concurrency = max(1, int(concurrency))
+        self.cache_dir = cache_dir
+        self.metrics = HotFolderMetrics()
+        self.started_at = time.time()
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._pool: Optional[WarmPool] = None
+        self._threads: List[threading.Thread] = []
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def start(self) -> None:
+        # a job whose worker dies fails; the pool is replaced and later jobs are unaffected
+        self._pool = WarmPool(self.concurrency)
+        self._threads = [
+            threading.Thread(target=self._dispatch, name=f"httpapi-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put("")  # wake dispatchers so they can exit
+        for t in self._threads:
+            t.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def new_job_dir(self) -> Tuple[str, str]:
+        job_id = uuid.uuid4().hex[:16]
+        job_dir = os.path.join(self.work_dir, job_id)
+        os.makedirs(os.path.join(job_dir, "out"), exist_ok=True)
+        return job_id, job_dir
+
+    def submit(self, job_id: str, job_dir: str, job: Dict) -> Dict:
+        job["output"] = dict(job.get("output", {}), dir=os.path.join(job_dir, "out"))
+        job["output"].pop("job_json_path", None)
+        engine = {k: v for k, v in (job.get("engine", {}) or {}).items() if k in _CLIENT_ENGINE_KEYS}
+        engine["workers"] = 1  # concurrency is the queue's job, not each build's
+        if self.cache_dir:
+            engine["cache"] = {"dir": os.path.abspath(self.cache_dir)}
+        else:
+            engine.pop("cache", None)
+        job["engine"] = engine
+        entry = {
+            "id": job_id,
+            "dir": job_dir,
+            "job": job,
+            "state": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "paths": [],
+            "report": None,
+            "error": None,
+            "done": threading.Event(),
+        }
+        with self._lock:
+            self._jobs[job_id] = entry
+        self.metrics.on_queued()
+        self._queue.put(job_id)
+        return entry
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id: str) -> bool:
+        """Drop a finished job and its files. Queued or running jobs are kept."""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or not entry["done"].is_set():
+                return False
+            del self._jobs[job_id]
+        shutil.rmtree(entry["dir"], ignore_errors=True)
+        return True
+
+    def status(self) -> Dict:
+        with self._lock:
+            states = [e["state"] for e in self._jobs.values()]
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "concurrency": self.concurrency,
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+            "done": states.count("done"),
+            "failed": states.count("failed"),
+        }
+
+    @staticmethod
+    def describe(entry: Dict) -> Dict:
+        def seconds(a: Optional[float], b: Optional[float]) -> Optional[float]:
+            return round(b - a, 3) if a is not None and b is not None else None
+
+        return {
+            "id": entry["id"],
+            "state": entry["state"],
+            "queued_s": seconds(entry["created"], entry["started"] or time.time()),
+            "run_s": seconds(entry["started"], entry["finished"] or (time.time() if entry["started"] else None)),
+            "outputs": len(entry["paths"]),
+            "report": entry["report"],
+            "error": entry["error"],
+        }
+
+    def _dispatch(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if not job_id:
+                return
+            entry = self.get(job_id)
+            if entry is None:
+                continue
+            entry["state"] = "running"
+            entry["started"] = time.time()
+            self.metrics.on_start()
+            ok = False
+            try:
+                entry["paths"], entry["report"] = self._pool.run(_build, entry["job"])
+                ok = True
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+                with open(os.path.join(entry["dir"], "error.txt"), "w", encoding="utf-8") as f:
+                    f.write(traceback.format_exc())
+            entry["finished"] = time.time()
+            entry["state"] = "done" if ok else "failed"
+            self.metrics.on_finish(entry["finished"] - entry["started"], ok)
+            entry["done"].set()
+            self._trim()
+
+    def _trim(self) -> None:
+        with self._lock:
+            finished = sorted(
+                (e for e in self._jobs.values() if e["done"].is_set()), key=lambda e: e["finished"]
+            )
+            stale = finished[: max(0, len(finished) - KEEP_FINISHED)]
+            for e in stale:
+                del self._jobs[e["id"]]
+        for e in stale:
+            shutil.rmtree(e["dir"], ignore_errors=True)
+
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _under(path: str, roots: List[str]) -> bool:
+    path = os.path.realpath(path)
+    for root in roots:
+        root = os.path.realpath(root)
+        if os.path.commonpath([path, root]) == root:
+            return True
+    return False
+
+
+def _safe_filename(name: str) -> str:
+    name = os.path.basename((name or "").replace("\\", "/"))
+    name = re.sub(r"[^A-Za-z0-9._ -]+", "_", name).strip(" .")
+    return name or "upload"
+
+
+def _bare_filename(name) -> bool:
+    """True if name is a single path component (no directories, not "." or "..")."""
+    return isinstance(name, str) and os.path.basename(name) == name and name not in ("", ".", "..")
+
+
+def _spool(src: BinaryIO, length: int, path: str) -> None:
+    """Copy length bytes of a request body from src to path, COPY_CHUNK at a time."""
+    with open(path, "wb") as f:
+        while length > 0:
+            block = src.read(min(COPY_CHUNK, length))
+            if not block:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Request body ended early")
+            f.write(block)
+            length -= len(block)
+
+
+def _find(f: BinaryIO, needle: bytes, start: int) -> int:
+    """Offset of the first needle at or after start in file f, or -1; reads COPY_CHUNK at a time."""
+    f.seek(start)
+    tail = b""
+    while True:
+        block = f.read(COPY_CHUNK)
+        if not block:
+            return -1
+        window = tail + block
+        hit = window.find(needle)
+        if hit >= 0:
+            return f.tell() - len(window) + hit
+        tail = window[-(len(needle) - 1):] if len(needle) > 1 else b""
+
+
+def _parse_multipart(content_type: str, path: str) -> Dict[str, Tuple[Optional[str], int, int]]:
+    """{field name: (filename or None, start, end)} byte ranges of the parts of a spooled
+    multipart/form-data body, found by scanning it in COPY_CHUNK reads."""
+    head = f"Content-Type: {content_type}\r\n\r\n".encode("latin-1")
+    boundary = email.parser.BytesHeaderParser(policy=email.policy.HTTP).parsebytes(head).get_boundary()
+    if not boundary:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed multipart body")
+    delimiter = b"--" + boundary.encode("latin-1")
+    fields = {}
+    with open(path, "rb") as f:
+        pos = _find(f, delimiter, 0)
+        while pos >= 0:
+            pos += len(delimiter)
+            f.seek(pos)
+            head = f.read(MAX_PART_HEADER_BYTES)
+            if head.startswith(b"--"):
+                return fields  # closing delimiter
+            line_end = head.find(b"\r\n")
+            head_end = head.find(b"\r\n\r\n", line_end)
+            if line_end < 0 or head_end < 0:
+                break
+            headers = email.parser.BytesHeaderParser(policy=email.policy.HTTP).parsebytes(head[line_end + 2:head_end + 4])
+            start = pos + head_end + 4
+            end = _find(f, b"\r\n" + delimiter, start)
+            if end < 0:
+                break
+            name = headers.get_param("name", header="content-disposition")
+            if name:
+                fields[name] = (headers.get_filename(), start, end)
+            pos = end + 2
+    raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed multipart body")
+
+
+def _read_range(path: str, start: int, end: int) -> bytes:
+    """Bytes [start, end) of path, for a form field small enough to hold in memory."""
+    if end - start > MAX_FIELD_BYTES:
+        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Form field larger than {MAX_FIELD_BYTES} bytes")
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _copy_range(path: str, start: int, end: int, dest: str) -> None:
+    """Copy bytes [start, end) of path to a new file dest, COPY_CHUNK at a time."""
+    with open(path, "rb") as src, open(dest, "wb") as f:
+        src.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = src.read(min(COPY_CHUNK, remaining))
+            f.write(block)
+            remaining -= len(block)
+
+
+class ApiServer(ThreadingHTTPServer):
+    """Localhost HTTP front end for a JobQueue."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        jobs: JobQueue,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        token: Optional[str] = None,
+        allow_paths: Optional[List[str]] = None,
+        max_upload: int = MAX_UPLOAD_BYTES,
+    ):
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            raise ValueError("The HTTP job API only listens on localhost")
+        self.jobs = jobs
+        self.token = token or None
+        self.allow_paths = [os.path.abspath(p) for p in (allow_paths or [])]
+        self.max_upload = int(max_upload)
+        super().__init__((host, port), _ApiHandler)
+
+    def create_job(self, content_type: str, body: BinaryIO, length: int) -> Dict:
+        """Turn a POST /jobs body (length bytes from body) into a queued job.
+
+        A multipart upload is spooled to the job folder in COPY_CHUNK reads and split
+        there, so neither the request nor the artwork has to fit in memory.
+        """
+        job_id, job_dir = self.jobs.new_job_dir()
+        try:
+            if content_type.startswith("multipart/form-data"):
+                # a dot name: _safe_filename never produces one, so it cannot be the upload's
+                spool = os.path.join(job_dir, ".request")
+                try:
+                    _spool(body, length, spool)
+                    fields = _parse_multipart(content_type, spool)
+                    if "file" not in fields:
+                        raise ApiError(HTTPStatus.BAD_REQUEST, "multipart upload needs a 'file' field")
+                    filename, start, end = fields["file"]
+                    filename = _safe_filename(filename or "upload.pdf")
+                    if not filename.lower().endswith(SUPPORTED_EXTS):
+                        raise ApiError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, f"Unsupported file type: {filename}")
+                    input_path = os.path.join(job_dir, filename)
+                    _copy_range(spool, start, end, input_path)
+                    spec = {
+                        k: json.loads(_read_range(spool, *fields[k][1:]) or b"{}")
+                        for k in ("job", "options") if k in fields
+                    }
+                finally:
+                    if os.path.exists(spool):
+                        os.remove(spool)
+            else:
+                if length > MAX_FIELD_BYTES:
+                    raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"JSON body larger than {MAX_FIELD_BYTES} bytes")
+                spec = json.loads(body.read(length) or b"{}")
+                input_path = None
+            job = self._job_from_spec(spec, input_path)
+        except ApiError:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        except (ValueError, TypeError, KeyError) as e:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+        except OSError:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return self.jobs.submit(job_id, job_dir, job)
+
+    def _job_from_spec(self, spec: Dict, upload: Optional[str]) -> Dict:
+        if not isinstance(spec, dict) or not ("job" in spec or "options" in spec):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Send 'job' (a job dict) or 'options' (make_job arguments)")
+        if "job" in spec:
+            job = dict(spec["job"])
+            inputs = [dict(i) for i in job.get("inputs", [])]
+            if upload is not None:
+                inputs = [dict(inputs[0] if inputs else {}, path=upload)]
+        else:
+            options = dict(_OPTION_DEFAULTS, **spec["options"])
+            path = upload or options.get("input_path")
+            for key in _SERVER_OPTIONS:
+                options.pop(key, None)
+            if not path:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "No input: upload a 'file' or set options.input_path")
+            job = core.make_job(input_path=path, out_dir=self.jobs.work_dir, **options)
+            inputs = job["inputs"]
+        if not inputs:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Job has no inputs")
+        # output names are joined onto the job's out dir, so they must not climb out of it
+        for name in [(job.get("output", {}) or {}).get("basename")] + [item.get("basename") for item in inputs]:
+            if name is not None and not _bare_filename(name):
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"basename must be a plain file name: {name!r}")
+        for item in inputs:
+            if item["path"] == upload:
+                continue
+            if not self.allow_paths or not _under(item["path"], self.allow_paths):
+                raise ApiError(HTTPStatus.FORBIDDEN, f"Input path is outside the allowed roots: {item['path']}")
+            if not os.path.isfile(item["path"]):
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Input not found: {item['path']}")
+        job["inputs"] = inputs
+        return job
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    server: ApiServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt: str, *args) -> None:
+        sys.stderr.write(f"{self.address_string()} {fmt % args}\n")
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+    def _handle(self, method: str) -> None:
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if self.server.token and self.headers.get(TOKEN_HEADER) != self.server.token:
+                raise ApiError(HTTPStatus.UNAUTHORIZED, f"Missing or wrong {TOKEN_HEADER}")
+            if method == "GET" and parts == ["status"]:
+                return self._send_json(self.server.jobs.status())
+            if method == "GET" and parts == ["metrics"]:
+                return self._send_json(self.server.jobs.metrics.snapshot())
+            if method == "POST" and parts == ["jobs"]:
+                return self._post_job(query)
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                entry = self.server.jobs.get(parts[1])
+                if entry is None:
+                    raise ApiError(HTTPStatus.NOT_FOUND, f"No job {parts[1]}")
+                if method == "GET" and len(parts) == 2:
+                    return self._send_json(JobQueue.describe(entry))
+                if method == "GET" and parts[2:] == ["pdf"]:
+                    return self._send_pdf(entry, int(query.get("n", ["0"])[0]))
+                if method == "DELETE" and len(parts) == 2:
+                    if not self.server.jobs.forget(entry["id"]):
+                        raise ApiError(HTTPStatus.CONFLICT, "Job is still queued or running")
+                    return self._send_json({"ok": True})
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No route for {method} {url.path}")
+        except ApiError as e:
+            self._send_json({"ok": False, "error": str(e)}, e.status)
+        except Exception as e:
+            self._send_json({"ok": False, "error": f"{type(e).__name__}: {e}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def _post_job(self, query: Dict[str, List[str]]) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.server.max_upload:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request larger than {self.server.max_upload} bytes")
+        entry = self.server.create_job(self.headers.get("Content-Type", ""), self.rfile, length)
+        if query.get("wait", ["0"])[0] in ("1", "true", "yes"):
+            entry["done"].wait()
+            return self._send_pdf(entry, 0)
+        self._send_json(
+            {"ok": True, "id": entry["id"], "status_url": f"/jobs/{entry['id']}", "pdf_url": f"/jobs/{entry['id']}/pdf"},
+            HTTPStatus.ACCEPTED,
+        )
+
+    def _send_pdf(self, entry: Dict, n: int) -> None:
+        if entry["state"] == "failed":
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, entry["error"] or "Job failed")
+        if entry["state"] != "done":
+            raise ApiError(HTTPStatus.CONFLICT, f"Job is {entry['state']}")
+        if not 0 <= n < len(entry["paths"]):
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Job has {len(entry['paths'])} output(s)")
+        path = entry["paths"][n]
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(size))
+            self.send_header("Content-Disposition", f'attachment; filename="{_safe_filename(os.path.basename(path))}"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+    def _send_json(self, payload: Dict, status: HTTPStatus = HTTPStatus.OK) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="PressDrop Bleed Fixer local HTTP job API")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--work", required=True, help="Folder for uploads and outputs (one subfolder per job)")
+    p.add_argument("--concurrency", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                   help="Jobs built at the same time")
+    p.add_argument("--token", default=os.environ.get("PRESSDROP_API_TOKEN"),
+                   help=f"Shared secret expected in {TOKEN_HEADER} (default: $PRESSDROP_API_TOKEN)")
+    p.add_argument("--allow-path", action="append", default=[],
+                   help="Folder whose files may be named as input paths (repeatable); uploads always work")
+    p.add_argument("--cache", help="ResultCache folder shared by all jobs")
+    p.add_argument("--max-upload-mb", type=int, default=MAX_UPLOAD_BYTES // 1024 ** 2)
+    args = p.parse_args()
+
+    jobs = JobQueue(args.work, concurrency=args.concurrency, cache_dir=args.cache)
+    jobs.start()
+    try:
+        with ApiServer(jobs, DEFAULT_HOST, args.port, token=args.token, allow_paths=args.allow_path,
+                       max_upload=args.max_upload_mb * 1024 ** 2) as server:
+            print(f"HTTP job API on http://{DEFAULT_HOST}:{args.port} ({jobs.concurrency} concurrent jobs, "
+                  f"work {jobs.work_dir}). Ctrl+C to stop.")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+    finally:
+        jobs.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+"""Warm job server and thin client.
+
+The server imports core, pypdf and Pillow once and then builds jobs sent to it over a
+localhost socket, so repeated runs skip interpreter start-up and the heavy imports. The
+client side uses only the standard library and never imports core.
+
+  python jobserver.py serve [--port 8765]
+  python jobserver.py run --input in.pdf --size 4x6in --bleed 0.125 --out out [--local]
+  python jobserver.py submit job.json
+  python jobserver.py status | stop
+  python jobserver.py startup-bench --input in.pdf --size 4x6in --out out [--runs 5]
+
+"run" takes the same layout options as the CLI. With --local it builds in-process (the
+cold path); otherwise it asks the server. "startup-bench" times both paths end to end,
+interpreter start included, and prints the medians.
+
+The server binds to 127.0.0.1 only. Any local process can submit jobs, and jobs read
+and write files as the user running the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def _import_core():
+    """core, imported on first use so the client side stays standard library only."""
+    try:
+        from . import core
+    except ImportError:  # run as a script, or bundled as top-level modules
+        import core
+    return core
+
+
+# ---------------------------------------------------------------------------
+# server
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out."""
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            response = self.server.dispatch(json.loads(line))
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class JobServer(socketserver.ThreadingTCPServer):
+    """Localhost job server with core already imported and warmed up."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            raise ValueError("The job server only listens on localhost")
+        t0 = time.perf_counter()
+        core = _import_core()
+        core.warm_up()
+        self.core = core
+        self.warm_seconds = time.perf_counter() - t0
+        self.started_at = time.time()
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self._lock = threading.Lock()
+        super().__init__((host, port), _JobHandler)
+
+    def dispatch(self, request: Dict) -> Dict:
+        op = request.get("op")
+        if op == "status":
+            with self._lock:
+                return {
+                    "ok": True,
+                    "pid": os.getpid(),
+                    "uptime_s": round(time.time() - self.started_at, 1),
+                    "warm_up_s": round(self.warm_seconds, 3),
+                    "jobs_done": self.jobs_done,
+                    "jobs_failed": self.jobs_failed,
+                }
+        if op == "stop":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        if op in ("make_job", "build"):
+            return self._build(request)
+        raise ValueError(f"Unknown op: {op!r}")
+
+    def _build(self, request: Dict) -> Dict:
+        t0 = time.perf_counter()
+        try:
+            job = self.core.make_job(**request["kwargs"]) if request["op"] == "make_job" else request["job"]
+            report: Dict = {}
+            paths = self.core.build_press_pdf(job, report=report)
+        except Exception:
+            with self._lock:
+                self.jobs_failed += 1
+            raise
+        with self._lock:
+            self.jobs_done += 1
+        return {
+            "ok": True,
+            "paths": paths,
+            "job_json_path": job.get("output", {}).get("job_json_path"),
+            "report": report,
+            "server_seconds": round(time.perf_counter() - t0, 4),
+        }
+
+
+def serve(host: str, port: int) -> None:
+    with JobServer(host, port) as server:
+        print(f"Job server on {host}:{port} (pid {os.getpid()}, warm-up {server.warm_seconds:.2f}s). Ctrl+C to stop.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# client (standard library only)
+
+
+def request(payload: Dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: Optional[float] = None) -> Dict:
+    """Send one request to a running server and return its response."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("Job server closed the connection without a response")
+    return json.loads(line)
+
+
+def _make_job_kwargs(args: argparse.Namespace) -> Dict:
+    return {
+        "input_path": os.path.abspath(args.input),
+        "pages_spec": args.pages,
+        "pdf_box": args.pdf_box,
+        "trim_size_spec": args.size,
+        "bleed_spec": args.bleed,
+        "fit_mode": args.fit,
+        "anchor": args.anchor,
+        "bleed_generator": args.bleed_generator,
+        "bleed_preflight": args.bleed_preflight,
+        "placement": args.placement,
+        "crop_marks": args.crop_marks,
+        "out_dir": os.path.abspath(args.out),
+        "basename": args.basename,
+        "emit_job": args.emit_job,
+        "output_profile": args.profile,
+        "mmap_inputs": args.mmap,
+        "max_ppi": args.max_ppi,
+        "downsample_pdf_images": args.downsample_pdf_images,
+        "journal": args.journal,
+        "resume": args.resume,
+    }
+
+
+def _run_local(kwargs: Dict) -> Dict:
+    core = _import_core()
+    job = core.make_job(**kwargs)
+    return {"ok": True, "paths": core.build_press_pdf(job), "job_json_path": job["output"].get("job_json_path")}
+
+
+def _print_result(response: Dict) -> int:
+    if not response.get("ok"):
+        print(f"Error: {response.get('error')}", file=sys.stderr)
+        return 1
+    for path in response.get("paths", []):
+        print(f"Wrote: {path}")
+    if response.get("job_json_path"):
+        print(f"Wrote job: {response['job_json_path']}")
+    return 0
+
+
+def _startup_bench(args: argparse.Namespace, passthrough: List[str]) -> int:
+    """Time `run --local` (cold) and `run` via the server (warm) as fresh client processes."""
+    here = os.path.abspath(__file__)
+    base = [sys.executable, here, "--port", str(args.port), "run"] + passthrough
+
+    def timed(cmd: List[str]) -> List[float]:
+        times = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - t0)
+        return times
+
+    started_server = None
+    try:
+        request({"op": "status"}, port=args.port, timeout=2)
+    except OSError:
+        started_server = subprocess.Popen([sys.executable, here, "--port", str(args.port), "serve"],
+                                          stdout=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                request({"op": "status"}, port=args.port, timeout=2)
+                break
+            except OSError:
+                time.sleep(0.1)
+    try:
+        cold = timed(base + ["--local"])
+        warm = timed(base)
+    finally:
+        if started_server is not None:
+            request({"op": "stop"}, port=args.port)
+            started_server.wait(timeout=30)
+
+    result = {
+        "runs": args.runs,
+        "cold_s": {"median": round(statistics.median(cold), 3), "min": round(min(cold), 3)},
+        "warm_s": {"median": round(statistics.median(warm), 3), "min": round(min(warm), 3)},
+    }
+    result["speedup"] = round(result["cold_s"]["median"] / max(result["warm_s"]["median"], 1e-9), 2)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def _add_layout_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--input", required=True, help="Input file: pdf/png/jpg/jpeg/tif/tiff")
+    p.add_argument("--pages", default="1", help="PDF pages or TIFF frames, 1-based. Examples: 1, 1-4, 1,3,5-7")
+    p.add_argument("--pdf_box", default="auto", choices=["auto", "trim", "crop", "media"])
+    p.add_argument("--size", required=True, help="Trim size, e.g. 4x6in, 101.6x152.4mm")
+    p.add_argument("--bleed", default="0.125", help="Bleed in the size unit: one value or 't,r,b,l'")
+    p.add_argument("--bleed_generator", default="none", choices=["none", "mirror", "smear"])
+    p.add_argument("--bleed_preflight", default="boxes", choices=["boxes", "content", "off"],
+                   help="Use a source page's own bleed when it covers the output bleed")
+    p.add_argument("--placement", default="wrap", choices=["wrap", "merge"],
+                   help="wrap passes page content through untouched; merge re-parses it with pypdf")
+    p.add_argument("--fit", default="fill_bleed_proportional")
+    p.add_argument("--anchor", default="center")
+    p.add_argument("--crop_marks", action="store_true")
+    p.add_argument("--out", required=True, help="Output folder")
+    p.add_argument("--basename", default=None)
+    p.add_argument("--emit_job", action="store_true")
+    p.add_argument("--profile", default=None, choices=["fast", "compact"], help="Output size profile")
+    p.add_argument("--mmap", action="store_true", help="Read PDF inputs through a memory map")
+    p.add_argument("--max_ppi", type=float, default=None,
+                   help="Downsample images above this effective resolution at their placed size")
+    p.add_argument("--downsample_pdf_images", action="store_true",
+                   help="With --max_ppi, also downsample images inside PDF pages")
+    p.add_argument("--journal", action="store_true",
+                   help="Log finished outputs and page chunks to <basename>.journal.jsonl")
+    p.add_argument("--resume", action="store_true", help="Resume an interrupted run from its journal")
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="PressDrop Bleed Fixer job server")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help="Run the warm server in the foreground")
+    run = sub.add_parser("run", help="Build one input (via the server unless --local)")
+    _add_layout_args(run)
+    run.add_argument("--local", action="store_true", help="Build in this process instead of the server")
+    submit = sub.add_parser("submit", help="Send a job.json to the server")
+    submit.add_argument("job_json")
+    sub.add_parser("status", help="Show server status")
+    sub.add_parser("stop", help="Stop the server")
+    bench = sub.add_parser("startup-bench", help="Compare cold (--local) and warm (server) run times")
+    bench.add_argument("--runs", type=int, default=5)
+
+    args, extra = p.parse_known_args()
+    if args.command == "startup-bench":
+        return _startup_bench(args, extra)
+    if extra:
+        p.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if args.command == "serve":
+        serve(DEFAULT_HOST, args.port)
+        return 0
+    try:
+        return _client(args)
+    except ConnectionRefusedError:
+        print(f"No job server on port {args.port}. Start one with 'jobserver.py serve' or use 'run --local'.",
+              file=sys.stderr)
+        return 2
+
+
+def _client(args: argparse.Namespace) -> int:
+    if args.command == "run":
+        kwargs = _make_job_kwargs(args)
+        os.makedirs(kwargs["out_dir"], exist_ok=True)
+        if args.local:
+            return _print_result(_run_local(kwargs))
+        return _print_result(request({"op": "make_job", "kwargs": kwargs}, port=args.port))
+    if args.command == "submit":
+        with open(args.job_json, "r", encoding="utf-8") as f:
+            job = json.load(f)
+        return _print_result(request({"op": "build", "job": job}, port=args.port))
+    print(json.dumps(request({"op": args.command}, port=args.port), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
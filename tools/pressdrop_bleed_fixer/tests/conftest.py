@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core  # noqa: E402
+
+
+def write_sample_pdf(path, pages=6, size=(288, 432)):
+    """A small PDF whose pages differ (a numbered box each)."""
+    core._load_pdf_libs()
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for n in range(pages):
+        page = writer.add_blank_page(*size)
+        stream = DecodedStreamObject()
+        stream.set_data(
+            f"0.2 0.4 0.8 rg 0 0 {size[0]} {size[1]} re f "
+            f"1 g {20 + n * 10} 40 100 100 re f BT /F1 24 Tf 30 200 Td (Page {n + 1}) Tj ET".encode("ascii")
+        )
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        page.replace_contents(stream)
+    writer.write(path)  # a file name or a binary stream
+    return path
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    return write_sample_pdf(str(tmp_path / "art.pdf"))
+
+
+def job_for(input_path, out_dir, **kwargs):
+    options = dict(
+        pages_spec="all",
+        pdf_box="auto",
+        trim_size_spec="4x6in",
+        bleed_spec="0.125",
+        fit_mode="fill_bleed_proportional",
+        anchor="center",
+        crop_marks=False,
+        basename="out",
+    )
+    options.update(kwargs)
+    return core.make_job(input_path=input_path, out_dir=out_dir, **options)
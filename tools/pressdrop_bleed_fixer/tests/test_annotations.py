@@ -0,0 +1,85 @@
+import pytest
+
+import core
+from conftest import job_for, write_sample_pdf
+
+
+def _annotated_pdf(path, pages=2):
+    """Sample pages that each carry a Line annotation (a dimension marker) at (20,40)-(120,140)."""
+    from pypdf import PdfWriter
+    from pypdf.generic import ArrayObject, DictionaryObject, FloatObject, NameObject, TextStringObject
+
+    write_sample_pdf(path, pages=pages)
+    writer = PdfWriter(clone_from=path)
+    for page in writer.pages:
+        annot = DictionaryObject({
+            NameObject("/Type"): NameObject("/Annot"),
+            NameObject("/Subtype"): NameObject("/Line"),
+            NameObject("/Rect"): ArrayObject(FloatObject(v) for v in (20, 40, 120, 140)),
+            NameObject("/L"): ArrayObject(FloatObject(v) for v in (25, 45, 115, 135)),
+            NameObject("/Contents"): TextStringObject("12 mm"),
+        })
+        page[NameObject("/Annots")] = ArrayObject([core._PypdfPrivate.add_object(writer, annot)])
+    writer.write(path)
+    return path
+
+
+def _annotations(path):
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        found = []
+        for ref in page.get("/Annots", []):
+            annot = ref.get_object()
+            assert annot.raw_get("/P").idnum == page.indirect_reference.idnum
+            found.append(([float(v) for v in annot["/Rect"]], [float(v) for v in annot["/L"]]))
+        pages.append(found)
+    return pages
+
+
+@pytest.mark.parametrize("generator", ["mirror", "smear"])
+def test_edge_bleed_keeps_annotations(tmp_path, generator):
+    art = _annotated_pdf(str(tmp_path / "art.pdf"))
+    job = job_for(art, str(tmp_path / "out"), bleed_generator=generator, bleed_preflight="off")
+    (path,) = core.build_press_pdf(job)
+    # 4x6in art into a 4x6in trim: placed 1:1, shifted by the 0.125in (9pt) bleed
+    assert _annotations(path) == [[([29, 49, 129, 149], [34, 54, 124, 144])]] * 2
+
+
+@pytest.mark.parametrize("placement", ["wrap", "merge"])
+def test_placed_page_maps_annotations(tmp_path, placement):
+    art = _annotated_pdf(str(tmp_path / "art.pdf"))
+    job = job_for(art, str(tmp_path / "out"), placement=placement, fit_mode="fit_trim")
+    (path,) = core.build_press_pdf(job)
+    # fit_trim places the 4x6in art 1:1 in the trim, 9pt in from the media box
+    assert _annotations(path) == [[([29, 49, 129, 149], [34, 54, 124, 144])]] * 2
+
+
+def test_imposed_sheet_repeats_annotations_per_cell(tmp_path):
+    art = _annotated_pdf(str(tmp_path / "art.pdf"), pages=1)
+    imposition = core.make_imposition(sheet_size_spec="12x18in", cols=2, rows=2, gutter_spec="0.25")
+    job = job_for(art, str(tmp_path / "out"), fit_mode="fit_trim", imposition=imposition)
+    (path,) = core.build_press_pdf(job)
+    # the cell's annotation at (29,49), moved by each cell's offset: columns 306pt apart
+    # (4in trim + 0.25in gutter), rows 450pt apart, the grid centred on the sheet
+    assert _annotations(path) == [[
+        ([155 + dx, 247 + dy, 255 + dx, 347 + dy], [160 + dx, 252 + dy, 250 + dx, 342 + dy])
+        for dy in (450, 0) for dx in (0, 306)
+    ]]
+
+
+def test_tiles_carry_annotations_they_overlap(tmp_path):
+    art = _annotated_pdf(str(tmp_path / "art.pdf"), pages=1)
+    tiling = core.make_tiling(cols=2, rows=2, overlap_spec="1")
+    job = job_for(art, str(tmp_path / "out"), fit_mode="fit_trim", tiling=tiling)
+    (path,) = core.build_press_pdf(job)
+    # 180pt wide panels 108pt apart; the annotation at x 29..129 of the piece reaches into
+    # the bottom right panel too. Top panels (listed first) miss it.
+    assert _annotations(path) == [
+        [],
+        [],
+        [([29, 49, 129, 149], [34, 54, 124, 144])],
+        [([-79, 49, 21, 149], [-74, 54, 16, 144])],
+    ]
@@ -0,0 +1,34 @@
+import multiprocessing
+import os
+
+import core
+from conftest import job_for
+
+
+def _bump_many(root, n):
+    cache = core.ResultCache(root)
+    for _ in range(n):
+        cache._bump("hits")
+
+
+def test_stats_from_concurrent_processes_add_up(tmp_path):
+    root = str(tmp_path / "cache")
+    core.ResultCache(root)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_bump_many, args=(root, 50)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert core.ResultCache(root).stats()["hits"] == 200
+    assert sorted(os.listdir(root)) == ["objects", "stats.json"]
+
+
+def test_stats_errors_do_not_fail_builds(sample_pdf, tmp_path):
+    root = tmp_path / "cache"
+    (root / "stats.json").mkdir(parents=True)  # unwritable stats
+    for n in range(2):
+        report = {}
+        (path,) = core.build_press_pdf(job_for(sample_pdf, str(tmp_path / str(n)), cache_dir=str(root)), report=report)
+        assert os.path.getsize(path) > 0
+    assert report["inputs"][0]["cache"] == "hit"
@@ -0,0 +1,71 @@
+import pytest
+from PIL import Image
+
+import core
+from conftest import job_for
+
+
+@pytest.mark.parametrize("width,height,expected", [
+    # 4x6in placements (288x432pt) against a 100ppi target: resampled above 150ppi only
+    (600, 900, None),
+    (604, 906, (400, 600)),
+    (1200, 1800, (400, 600)),
+    # the lower of the two resolutions decides (stretched placement)
+    (1200, 900, None),
+    (0, 900, None),
+])
+def test_downsample_size_threshold(width, height, expected):
+    assert core._downsample_size(width, height, 288, 432, 100) == expected
+
+
+def test_downsample_threshold_is_relative_to_the_target(monkeypatch):
+    monkeypatch.setattr(core, "DOWNSAMPLE_THRESHOLD", 1.0)
+    assert core._downsample_size(404, 606, 288, 432, 100) == (400, 600)
+    assert core._downsample_size(400, 600, 288, 432, 100) is None
+
+
+def _built_image(tmp_path, size, mode="RGB", max_ppi=100):
+    from pypdf import PdfReader
+
+    art = str(tmp_path / "art.png")
+    Image.new(mode, size, 1 if mode == "1" else "white").save(art)
+    report = {}
+    job = job_for(art, str(tmp_path / "out"), fit_mode="fit_trim_proportional", max_ppi=max_ppi)
+    (path,) = core.build_press_pdf(job, report=report)
+    (image,) = PdfReader(path).pages[0].images
+    return image.image.size, report
+
+
+@pytest.mark.parametrize("size,placed,resampled", [
+    ((600, 900), (600, 900), False),  # 150ppi, at the threshold: left alone
+    ((640, 960), (400, 600), True),   # 160ppi: brought down to 100ppi
+])
+def test_raster_input_is_downsampled_above_the_threshold(tmp_path, size, placed, resampled):
+    embedded, report = _built_image(tmp_path, size)
+    assert embedded == placed
+    if resampled:
+        assert report["downsample"]["images"] == 1
+        assert report["downsample"]["pixel_bytes_in"] == 640 * 960 * 3
+        assert report["downsample"]["pixel_bytes_out"] == 400 * 600 * 3
+    else:
+        assert "downsample" not in report
+
+
+def test_bilevel_raster_keeps_its_resolution(tmp_path):
+    embedded, report = _built_image(tmp_path, (2400, 3600), mode="1")
+    assert embedded == (2400, 3600)
+    assert "downsample" not in report
+
+
+@pytest.mark.parametrize("pdf_images,embedded", [(True, (400, 600)), (False, (1000, 1500))])
+def test_pdf_page_images_only_with_pdf_images(tmp_path, pdf_images, embedded):
+    from pypdf import PdfReader
+
+    art = str(tmp_path / "art.pdf")
+    # a 4x6in page showing a 250ppi image
+    Image.new("RGB", (1000, 1500), "white").save(art, resolution=250)
+    job = job_for(art, str(tmp_path / "out"), fit_mode="fit_trim_proportional", max_ppi=100,
+                  downsample_pdf_images=pdf_images)
+    (path,) = core.build_press_pdf(job)
+    (image,) = PdfReader(path).pages[0].images
+    assert image.image.size == embedded
@@ -0,0 +1,80 @@
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import hotfolder
+
+PRESETS = {"Postcard": {"trim": "4x6in", "bleed": "0.125"}}
+
+
+class _Executor:
+    """Stands in for a ProcessPoolExecutor: working, broken while running a call ("running"),
+    or already broken before the call was submitted ("before")."""
+
+    def __init__(self, broken=None):
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, job):
+        if self.broken == "before":
+            raise BrokenProcessPool("A child process terminated abruptly")
+        future = Future()
+        if self.broken == "running":
+            future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        else:
+            future.set_result({"job": job})
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_work_left_by_a_crash_is_moved_back(tmp_path):
+    folder = hotfolder.HotFolder(str(tmp_path), PRESETS)
+    work = tmp_path / hotfolder.WORK_DIR / "Postcard"
+    work.mkdir(parents=True)
+    (work / "art.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / "Postcard" / "art.pdf").write_bytes(b"%PDF-1.4 newer drop")
+
+    assert folder.recover_work() == 1
+    assert os.listdir(work) == []
+    assert sorted(os.listdir(tmp_path / "Postcard")) == ["art.pdf", "art_1.pdf"]
+
+
+def _pool(monkeypatch, *executors, retry=False):
+    """A WarmPool that starts with executors[0] and gets the next one each time it is replaced."""
+    queue = list(executors)
+    monkeypatch.setattr(hotfolder.WarmPool, "_new_executor", lambda self: queue.pop(0))
+    return hotfolder.WarmPool(1, retry=retry)
+
+
+def test_running_call_is_retried_once_on_a_fresh_pool(monkeypatch):
+    broken, fresh = _Executor("running"), _Executor()
+    pool = _pool(monkeypatch, broken, fresh, retry=True)
+
+    assert pool.run(str, "job") == {"job": "job"}
+    assert broken.shut_down and pool._executor is fresh
+
+
+def test_call_that_breaks_the_pool_twice_fails(monkeypatch):
+    pool = _pool(monkeypatch, _Executor("running"), _Executor("running"), _Executor(), retry=True)
+
+    with pytest.raises(BrokenProcessPool):
+        pool.run(str, "job")
+    assert pool.run(str, "next") == {"job": "next"}  # later calls get a working pool
+
+
+def test_without_retry_only_the_running_call_fails(monkeypatch):
+    pool = _pool(monkeypatch, _Executor("running"), _Executor())
+
+    with pytest.raises(BrokenProcessPool):
+        pool.run(str, "job")
+    assert pool.run(str, "next") == {"job": "next"}
+
+
+def test_call_submitted_after_the_break_goes_to_a_fresh_pool(monkeypatch):
+    pool = _pool(monkeypatch, _Executor("before"), _Executor())
+
+    assert pool.run(str, "job") == {"job": "job"}
@@ -0,0 +1,106 @@
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+import core
+from conftest import job_for
+
+# Adam7 passes: (x start, y start, x step, y step)
+_ADAM7 = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+
+
+def _chunk(ctype, body):
+    return struct.pack(">I", len(body)) + ctype + body + struct.pack(">I", zlib.crc32(ctype + body))
+
+
+def _interlaced_png(path, img):
+    """An Adam7 interlaced RGB PNG of img (Pillow only writes non-interlaced ones)."""
+    width, height = img.size
+    raw = bytearray()
+    for x0, y0, dx, dy in _ADAM7:
+        for y in range(y0, height, dy):
+            row = [img.getpixel((x, y)) for x in range(x0, width, dx)]
+            if row:
+                raw += b"\x00" + bytes(v for px in row for v in px)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 1)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", header) + _chunk(b"IDAT", zlib.compress(bytes(raw)))
+                + _chunk(b"IEND", b""))
+    return path
+
+
+def _xobject(path):
+    core._load_pdf_libs()
+    return core._image_xobject(path, core._raster_info(path))
+
+
+def _gradient(mode="RGB", size=(24, 16)):
+    img = Image.new(mode, size)
+    img.putdata([(x * 10, y * 15, (x + y) * 5) for y in range(size[1]) for x in range(size[0])])
+    return img
+
+
+def test_jpeg_is_embedded_byte_for_byte(tmp_path):
+    path = str(tmp_path / "art.jpg")
+    _gradient().save(path, quality=90)
+    img_obj = _xobject(path)
+    with open(path, "rb") as f:
+        assert core._PypdfPrivate.encoded_data(img_obj) == f.read()
+    assert (img_obj["/Filter"], img_obj["/ColorSpace"]) == ("/DCTDecode", "/DeviceRGB")
+    assert "/Decode" not in img_obj
+
+
+def test_adobe_cmyk_jpeg_is_inverted_back(tmp_path):
+    from pypdf import PdfReader
+
+    path = str(tmp_path / "art.jpg")
+    Image.new("CMYK", (40, 60), (200, 30, 0, 10)).save(path, quality=95)
+    assert Image.open(path).info.get("adobe")  # stored inverted
+    img_obj = _xobject(path)
+    assert img_obj["/Filter"] == "/DCTDecode"
+    assert list(img_obj["/Decode"]) == [1, 0] * 4
+    (out,) = core.build_press_pdf(job_for(path, str(tmp_path / "out")))
+    (image,) = PdfReader(out).pages[0].images
+    assert image.image.getpixel((5, 5)) == (200, 30, 0, 10)
+
+
+@pytest.mark.parametrize("mode,colors,bits", [("L", 1, 8), ("RGB", 3, 8), ("I;16", 1, 16)])
+def test_png_idat_passes_through(tmp_path, mode, colors, bits):
+    path = str(tmp_path / "art.png")
+    img = _gradient().convert("L") if mode == "L" else _gradient()
+    if mode == "I;16":
+        img = Image.frombytes("I;16", img.size, bytes(v for y in range(16) for x in range(24) for v in (x, y)))
+    img.save(path)
+    img_obj = _xobject(path)
+    assert img_obj["/Filter"] == "/FlateDecode"
+    assert img_obj["/BitsPerComponent"] == bits
+    assert dict(img_obj["/DecodeParms"]) == {"/Predictor": 15, "/Colors": colors, "/BitsPerComponent": bits,
+                                             "/Columns": 24}
+    # the IDAT payload, untouched
+    with open(path, "rb") as f:
+        assert core._PypdfPrivate.encoded_data(img_obj) in f.read()
+    # and it decodes to the pixels (PDF 16-bit samples are big-endian, I;16 is little-endian)
+    expected = img.tobytes("raw", "I;16B") if mode == "I;16" else img.tobytes()
+    assert img_obj.get_data() == expected
+
+
+def test_interlaced_png_is_decoded(tmp_path):
+    img = _gradient(size=(11, 9))
+    path = _interlaced_png(str(tmp_path / "art.png"), img)
+    with open(path, "rb") as f:
+        assert core._png_flate_passthrough(f.read()) is None
+    img_obj = _xobject(path)
+    assert "/DecodeParms" not in img_obj
+    assert zlib.decompress(core._PypdfPrivate.encoded_data(img_obj)) == img.tobytes()
+
+
+def test_palette_png_is_decoded_to_rgb(tmp_path):
+    path = str(tmp_path / "art.png")
+    img = _gradient().convert("P", palette=Image.Palette.ADAPTIVE, colors=16)
+    img.save(path)
+    img_obj = _xobject(path)
+    assert (img_obj["/ColorSpace"], img_obj["/BitsPerComponent"]) == ("/DeviceRGB", 8)
+    assert "/DecodeParms" not in img_obj
+    assert zlib.decompress(core._PypdfPrivate.encoded_data(img_obj)) == img.convert("RGB").tobytes()
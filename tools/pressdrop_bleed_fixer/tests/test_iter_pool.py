@@ -0,0 +1,82 @@
+import concurrent.futures
+import multiprocessing
+import os
+import shutil
+import signal
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import core
+from conftest import job_for
+
+_build_one = core._build_one
+
+
+def _killed_on_crash_inputs(job, index):
+    if "crash" in os.path.basename(job["inputs"][0]["path"]):
+        os.kill(os.getpid(), signal.SIGKILL)
+    return _build_one(job, index)
+
+
+def _inputs(tmp_path, sample_pdf, names):
+    paths = []
+    for name in names:
+        path = str(tmp_path / f"{name}.pdf")
+        shutil.copy(sample_pdf, path)
+        paths.append(path)
+    return paths
+
+
+# workers must inherit the patched _build_one
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="needs fork workers")
+def test_batch_goes_on_after_a_worker_is_killed(tmp_path, sample_pdf, monkeypatch):
+    monkeypatch.setattr(core, "_build_one", _killed_on_crash_inputs)
+    names = ["crash0"] + [f"art{i}" for i in range(1, 6)] + ["crash6"] + [f"art{i}" for i in range(7, 12)]
+    paths = _inputs(tmp_path, sample_pdf, names)
+    job = job_for(paths[0], str(tmp_path / "out"), workers=2)
+    events = []
+    records = sorted(core.iter_press_pdf(job, inputs=paths, progress=events.append), key=lambda r: r["index"])
+
+    assert [r["index"] for r in records] == list(range(len(names)))
+    for name, record in zip(names, records):
+        if name.startswith("crash"):
+            assert record["path"] is None and record["error"].startswith("BrokenProcessPool")
+        elif record["error"] is None:
+            assert os.path.getsize(record["path"]) == record["bytes"] > 0
+        else:
+            # running alongside a killed worker: the pool broke under it
+            assert record["error"].startswith("BrokenProcessPool")
+    # inputs after each break run on a fresh pool
+    assert records[-1]["error"] is None
+    assert events[-1]["done"] + events[-1]["failed"] == len(names)
+
+
+class _Executor:
+    """In-process stand-in for a ProcessPoolExecutor, optionally already broken by a dead worker."""
+
+    def __init__(self, broken):
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool("A child process terminated abruptly")
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_submit_to_a_pool_broken_before_collection_moves_to_a_fresh_one(tmp_path, sample_pdf, monkeypatch):
+    executors = [_Executor(broken=True), _Executor(broken=False)]
+    made = list(executors)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", lambda max_workers: made.pop(0))
+    paths = _inputs(tmp_path, sample_pdf, ["art1", "art2", "art3"])
+    records = list(core.iter_press_pdf(job_for(paths[0], str(tmp_path / "out"), workers=2), inputs=paths))
+
+    assert [r["error"] for r in records] == [None] * 3
+    assert executors[0].shut_down and made == []
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+import core
+from conftest import job_for
+
+
+def _build(job):
+    report = {}
+    paths = core.build_press_pdf(job, report=report)
+    return paths, report
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_resume_reuses_finished_output(sample_pdf, tmp_path):
+    out = str(tmp_path / "out")
+    _build(job_for(sample_pdf, out, journal=True))
+    paths, report = _build(job_for(sample_pdf, out, journal=True, resume=True))
+    assert report["journal"]["resumed_inputs"] == 1
+    assert report["inputs"][0]["resumed"] is True
+    assert os.path.isfile(paths[0])
+
+
+def test_torn_last_line_is_skipped(sample_pdf, tmp_path):
+    out = str(tmp_path / "out")
+    _build(job_for(sample_pdf, out, journal=True))
+    journal = os.path.join(out, "out.journal.jsonl")
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write('{"event":"input","index":0,"pa')  # killed mid-write
+    _, report = _build(job_for(sample_pdf, out, journal=True, resume=True))
+    assert report["journal"]["resumed_inputs"] == 1
+
+
+def test_journal_of_other_settings_is_ignored(sample_pdf, tmp_path):
+    out = str(tmp_path / "out")
+    _build(job_for(sample_pdf, out, journal=True))
+    first = _read(os.path.join(out, "out.pdf"))
+    _, report = _build(job_for(sample_pdf, out, journal=True, resume=True, bleed_spec="0.25"))
+    assert report["journal"]["resumed_inputs"] == 0
+    assert _read(os.path.join(out, "out.pdf")) != first
+
+
+def test_changed_input_is_rebuilt(sample_pdf, tmp_path):
+    out = str(tmp_path / "out")
+    _build(job_for(sample_pdf, out, journal=True))
+    st = os.stat(sample_pdf)
+    os.utime(sample_pdf, ns=(st.st_atime_ns, st.st_mtime_ns + 5 * 10 ** 9))
+    _, report = _build(job_for(sample_pdf, out, journal=True, resume=True))
+    assert report["journal"]["resumed_inputs"] == 0
+
+    with open(sample_pdf, "ab") as f:
+        f.write(b"\n% appended\n")
+    _, report = _build(job_for(sample_pdf, out, journal=True, resume=True))
+    assert report["journal"]["resumed_inputs"] == 0
+
+
+def test_chunk_with_bad_hash_is_rebuilt(sample_pdf, tmp_path, monkeypatch):
+    clean_dir = str(tmp_path / "clean")
+    (clean,), _ = _build(job_for(sample_pdf, clean_dir, page_chunk=2))
+
+    out = str(tmp_path / "out")
+
+    def crash(self, job, index, record):
+        raise RuntimeError("killed before the output was journaled")
+
+    with monkeypatch.context() as m:
+        m.setattr(core.BuildJournal, "add_input", crash)
+        with pytest.raises(RuntimeError):
+            _build(job_for(sample_pdf, out, page_chunk=2, journal=True))
+
+    with open(os.path.join(out, "out.journal.jsonl"), encoding="utf-8") as f:
+        chunks = [e for e in map(json.loads, f) if e["event"] == "chunk"]
+    assert [c["pages"] for c in chunks] == [[0, 1], [2, 3], [4, 5]]
+    # same size, different bytes: only the hash can tell
+    with open(chunks[1]["path"], "r+b") as f:
+        data = f.read()
+        f.seek(0)
+        f.write(data.replace(b"endobj", b"ENDOBJ", 1))
+
+    (path,), report = _build(job_for(sample_pdf, out, page_chunk=2, journal=True, resume=True))
+    assert report["journal"]["resumed_chunks"] == 2
+    assert _read(path) == _read(clean)
+    assert not os.path.exists(path + ".chunks")
@@ -0,0 +1,59 @@
+import copy
+
+import pytest
+
+import core
+from conftest import job_for
+
+
+@pytest.fixture
+def plans(monkeypatch):
+    cache = {}
+    monkeypatch.setattr(core, "_PLAN_CACHE", cache)
+    return cache
+
+
+def test_same_layout_shares_one_plan(plans, tmp_path):
+    first = core.compile_layout(job_for("a.pdf", str(tmp_path)))
+    # a different input and output on the same preset reuse the compiled plan
+    second = core.compile_layout(job_for("b.pdf", str(tmp_path / "other"), basename="other"))
+    assert second is first
+    assert first.settings["plan"] is first
+    assert len(plans) == 1
+
+
+@pytest.mark.parametrize("change", [
+    lambda job: job["layout"]["bleed"].update(top=0.25),
+    lambda job: job["layout"].update(anchor="top"),
+    lambda job: job.update(tiling=core.make_tiling(cols=2, rows=1)),
+    lambda job: job.update(imposition=core.make_imposition(sheet_size_spec="12x18in", cols=2, rows=2)),
+])
+def test_layout_change_compiles_a_new_plan(plans, tmp_path, change):
+    job = job_for("a.pdf", str(tmp_path))
+    first = core.compile_layout(job)
+    changed = copy.deepcopy(job)
+    change(changed)
+    plan = core.compile_layout(changed)
+    assert plan is not first
+    # the original layout is still a hit
+    assert core.compile_layout(job) is first
+    assert len(plans) == 2
+
+
+def test_edits_in_place_are_not_served_stale(plans, tmp_path):
+    job = job_for("a.pdf", str(tmp_path))
+    first = core.compile_layout(job)
+    job["layout"]["bleed"]["left"] = 0.5
+    plan = core.compile_layout(job)
+    assert plan is not first
+    assert plan.settings["bleed_box"] != first.settings["bleed_box"]
+
+
+def test_cache_is_bounded_oldest_first(plans, monkeypatch, tmp_path):
+    monkeypatch.setattr(core, "_PLAN_CACHE_SIZE", 2)
+    jobs = [job_for("a.pdf", str(tmp_path), bleed_spec=bleed) for bleed in ("0", "0.125", "0.25")]
+    first, second, third = (core.compile_layout(job) for job in jobs)
+    assert len(plans) == 2
+    assert core.compile_layout(jobs[1]) is second
+    assert core.compile_layout(jobs[2]) is third
+    assert core.compile_layout(jobs[0]) is not first
@@ -0,0 +1,48 @@
+import pytest
+
+import core
+from conftest import job_for, write_sample_pdf
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("profile", ["fast", "compact"])
+def test_chunked_parallel_output_matches_serial(tmp_path, profile):
+    art = write_sample_pdf(str(tmp_path / "art.pdf"), pages=60)
+    outputs = []
+    for n, engine in enumerate([
+        {"workers": 1},
+        {"workers": 1, "page_chunk": 2},
+        {"workers": 2, "page_chunk": 7},
+        {"workers": 2, "streaming": True},
+    ]):
+        job = job_for(art, str(tmp_path / str(n)), crop_marks=True, output_profile=profile)
+        job["engine"] = engine
+        (path,) = core.build_press_pdf(job)
+        outputs.append(_read(path))
+    assert outputs[1:] == [outputs[0]] * 3
+
+
+def test_wrapped_page_keeps_group_and_compresses_plain_content(tmp_path):
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import DictionaryObject, NameObject, NumberObject
+
+    art = write_sample_pdf(str(tmp_path / "art.pdf"), pages=2)
+    writer = PdfWriter(clone_from=art)
+    for page in writer.pages:
+        page[NameObject("/Rotate")] = NumberObject(90)
+        page[NameObject("/Group")] = DictionaryObject({
+            NameObject("/S"): NameObject("/Transparency"),
+            NameObject("/CS"): NameObject("/DeviceCMYK"),
+        })
+    writer.write(art)
+
+    (path,) = core.build_press_pdf(job_for(art, str(tmp_path / "out"), placement="wrap"))
+    for page in PdfReader(path).pages:
+        form = page["/Resources"]["/XObject"]["/PDSrc"]
+        assert form["/Group"]["/CS"] == "/DeviceCMYK"
+        assert form["/Filter"] == "/FlateDecode"
+        assert b"(Page " in form.get_data()
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import core
+from conftest import job_for
+
+pytestmark = pytest.mark.skipif(not core._reset_peak_rss(), reason="peak RSS cannot be reset here")
+
+BIG = 256 * 1024 * 1024
+
+
+def _touch(size):
+    block = bytearray(size)
+    block[::4096] = b"\x01" * len(block[::4096])
+    return block
+
+
+def test_window_excludes_earlier_peak():
+    block = _touch(BIG)
+    del block
+    lifetime = core._peak_rss_bytes()
+    with core._RssWindow() as rss:
+        pass
+    assert rss.scope == "task"
+    assert rss.peak < lifetime - BIG // 2
+
+
+def test_window_overlapping_another_thread_is_process_scope():
+    started, release = threading.Event(), threading.Event()
+    result = {}
+
+    def other():
+        with core._RssWindow() as rss:
+            started.set()
+            release.wait(10)
+        result["scope"] = rss.scope
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    started.wait(10)
+    with core._RssWindow() as rss:
+        with core._RssWindow() as inner:
+            pass
+    release.set()
+    thread.join()
+    assert (rss.scope, inner.scope, result["scope"]) == ("process", "process", "process")
+
+
+def test_report_peak_is_per_build(tmp_path, sample_pdf):
+    block = _touch(BIG)
+    del block
+    report = {}
+    core.build_press_pdf(job_for(sample_pdf, str(tmp_path / "out")), report=report)
+    assert report["peak_rss_scope"] == report["inputs"][0]["peak_rss_scope"] == "task"
+    assert report["peak_rss"] < BIG
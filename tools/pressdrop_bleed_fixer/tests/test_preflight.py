@@ -0,0 +1,106 @@
+import pytest
+
+import core
+from conftest import job_for
+
+# a 4x6in trim with 9pt (0.125in) of bleed all round on a 306x450 media box
+TRIM = core.Rect(9, 9, 297, 441)
+MEDIA = core.Rect(0, 0, 306, 450)
+
+
+def _page(writer, content):
+    from pypdf.generic import ArrayObject, DecodedStreamObject, FloatObject, NameObject
+
+    page = writer.add_blank_page(MEDIA.width, MEDIA.height)
+    stream = DecodedStreamObject()
+    stream.set_data(content)
+    page.replace_contents(stream)
+    for key, box in (("/TrimBox", TRIM), ("/BleedBox", MEDIA)):
+        page[NameObject(key)] = ArrayObject(FloatObject(v) for v in (box.x0, box.y0, box.x1, box.y1))
+    return page
+
+
+def _bbox(content):
+    core._load_pdf_libs()
+    from pypdf import PdfWriter
+
+    return core._content_bbox(_page(PdfWriter(), content))
+
+
+@pytest.mark.parametrize("content,expected", [
+    # full-bleed fill reaching past the trim on every side
+    (b"0 0 1 rg 0 0 306 450 re f", MEDIA),
+    # fill stopping at the trim
+    (b"0 0 1 rg 9 9 288 432 re f", TRIM),
+    # past the trim on the left only, drawn through a scaling cm
+    (b"q 2 0 0 2 0 0 cm 0 4.5 148.5 216 re f Q", core.Rect(0, 9, 297, 441)),
+    # an oversized fill clipped back to the trim
+    (b"q 9 9 288 432 re W n -50 -50 400 600 re f Q", TRIM),
+    # a stroke-only path past the trim, then an unpainted (n) one further out
+    (b"-5 -5 m 311 455 l S -100 -100 500 700 re n", core.Rect(-5, -5, 311, 455)),
+    # text alone paints nothing the preflight trusts
+    (b"BT /F1 24 Tf 0 0 Td (edge) Tj ET", None),
+])
+def test_content_bbox(content, expected):
+    assert _bbox(content) == expected
+
+
+def test_content_bbox_counts_images_and_forms():
+    core._load_pdf_libs()
+    from pypdf import PdfWriter
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject, NumberObject
+
+    writer = PdfWriter()
+    form = DecodedStreamObject()
+    form.set_data(b"0 0 10 10 re f")
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): ArrayObject(FloatObject(v) for v in (0, 0, 10, 10)),
+        NameObject("/Matrix"): ArrayObject(FloatObject(v) for v in (2, 0, 0, 2, 300, 0)),
+    })
+    image = DecodedStreamObject()
+    image.set_data(b"\x00")
+    image.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(1),
+        NameObject("/Height"): NumberObject(1),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    page = _page(writer, b"q 100 0 0 100 -3 340 cm /Im0 Do Q /Fm0 Do")
+    page[NameObject("/Resources")] = DictionaryObject({NameObject("/XObject"): DictionaryObject({
+        NameObject("/Fm0"): core._PypdfPrivate.add_object(writer, form),
+        NameObject("/Im0"): core._PypdfPrivate.add_object(writer, image),
+    })})
+    assert core._content_bbox(page) == core.Rect(-3, 0, 320, 440)
+
+
+def _art(path, content):
+    from pypdf import PdfWriter
+
+    core._load_pdf_libs()
+    writer = PdfWriter()
+    _page(writer, content)
+    writer.write(path)
+    return path
+
+
+@pytest.mark.parametrize("content,mode,used", [
+    # artwork reaching past the trim: its own bleed is used in either mode
+    (b"0 0 1 rg 0 0 306 450 re f", "boxes", "source"),
+    (b"0 0 1 rg 0 0 306 450 re f", "content", "source"),
+    # the boxes promise bleed but the artwork stops at the trim: only "content" notices
+    (b"0 0 1 rg 9 9 288 432 re f", "boxes", "source"),
+    (b"0 0 1 rg 9 9 288 432 re f", "content", "mirror"),
+    # artwork past the trim on three sides only is not enough
+    (b"0 0 1 rg 0 0 306 441 re f", "content", "mirror"),
+    (b"0 0 1 rg 0 0 306 450 re f", "off", "mirror"),
+])
+def test_preflight_uses_source_bleed_only_when_it_is_there(tmp_path, content, mode, used):
+    art = _art(str(tmp_path / "art.pdf"), content)
+    report = {}
+    core.build_press_pdf(job_for(art, str(tmp_path / "out"), bleed_generator="mirror", bleed_preflight=mode),
+                         report=report)
+    assert report["inputs"][0]["bleed"] == [{"page": 1, "bleed": used}]
@@ -0,0 +1,83 @@
+import core
+
+
+def _objects_pdf(objects, header=b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n"):
+    """A PDF of numbered objects (1..n, object 2 the catalog) with a classic xref."""
+    out = bytearray(header)
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 2 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return out, offsets, xref
+
+
+def _linearized_pdf(path, pages):
+    """A file that opens with a linearization dictionary whose /L and /N match it.
+
+    Only the parameter dictionary matters to the page count; the hint tables are omitted.
+    """
+    kids = b" ".join(b"%d 0 R" % (4 + i) for i in range(pages))
+    objects = [
+        b"<< /Linearized 1 /L 0000000000 /N %d /O 4 /E 0 /T 0 /H [0 0] >>" % pages,
+        b"<< /Type /Catalog /Pages 3 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages),
+    ] + [b"<< /Type /Page /Parent 3 0 R /MediaBox [0 0 288 432] >>"] * pages
+    data, offsets, xref = _objects_pdf(objects)
+    data = data.replace(b"/L 0000000000", b"/L %010d" % len(data))
+    with open(path, "wb") as f:
+        f.write(data)
+    return xref, len(objects)
+
+
+def _append_page(path, xref, size, pages):
+    """Incremental update adding one page, as an editor saving in place would."""
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    new_page, new_tree = size + 1, 3
+    kids = b" ".join(b"%d 0 R" % (4 + i) for i in range(pages)) + b" %d 0 R" % new_page
+    page_at = len(data)
+    data += b"%d 0 obj\n<< /Type /Page /Parent 3 0 R /MediaBox [0 0 288 432] >>\nendobj\n" % new_page
+    tree_at = len(data)
+    data += b"%d 0 obj\n<< /Type /Pages /Kids [%s] /Count %d >>\nendobj\n" % (new_tree, kids, pages + 1)
+    update = len(data)
+    data += b"xref\n3 1\n%010d 00000 n \n%d 1\n%010d 00000 n \n" % (tree_at, new_page, page_at)
+    data += b"trailer\n<< /Size %d /Root 2 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n" % (new_page + 1, xref, update)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_linearization_hint_is_used_when_length_matches(tmp_path):
+    path = str(tmp_path / "lin.pdf")
+    _linearized_pdf(path, 3)
+    assert core._linearized_page_count(path) == 3
+    assert core.pdf_page_count(path, use_index=False) == 3
+
+
+def test_linearization_hint_is_ignored_after_an_appended_update(tmp_path):
+    path = str(tmp_path / "lin.pdf")
+    xref, size = _linearized_pdf(path, 3)
+    assert core.probe_pdf(path)["page_count"] == 3  # fills the sidecar index
+    _append_page(path, xref, size, 3)
+    assert core._linearized_page_count(path) is None
+    assert core.pdf_page_count(path, use_index=False) == 4
+    assert core.pdf_page_count(path) == 4
+    assert core.probe_pdf(path)["page_count"] == 4
+
+
+def test_linearization_dict_must_be_the_first_object(tmp_path):
+    path = str(tmp_path / "late.pdf")
+    data, _, _ = _objects_pdf([
+        b"<< /Producer (x) >>",
+        b"<< /Type /Catalog /Pages 3 0 R >>",
+        b"<< /Type /Pages /Kids [4 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 3 0 R /MediaBox [0 0 288 432] >>",
+        b"<< /Linearized 1 /L 0000000000 /N 9 >>",
+    ])
+    with open(path, "wb") as f:
+        f.write(data.replace(b"/L 0000000000", b"/L %010d" % len(data)))
+    assert core._linearized_page_count(path) is None
+    assert core.pdf_page_count(path, use_index=False) == 1
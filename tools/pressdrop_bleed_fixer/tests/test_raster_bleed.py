@@ -0,0 +1,58 @@
+import pytest
+
+import core
+
+
+@pytest.fixture
+def img():
+    """4x4 grayscale image whose pixel (x, y) is 10 * (y + 1) + x."""
+    core._load_pdf_libs()
+    from PIL import Image
+
+    im = Image.new("L", (4, 4))
+    for y in range(4):
+        for x in range(4):
+            im.putpixel((x, y), 10 * (y + 1) + x)
+    return im
+
+
+def _rows(im):
+    return [[im.getpixel((x, y)) for x in range(im.size[0])] for y in range(im.size[1])]
+
+
+def test_smear_replicates_the_edge_on_its_own_side(img):
+    out = core._extend_raster_edges(img, left=1, right=2, bottom=1, top=1, mode="smear")
+    assert _rows(out) == [
+        [10, 10, 11, 12, 13, 13, 13],
+        [10, 10, 11, 12, 13, 13, 13],
+        [20, 20, 21, 22, 23, 23, 23],
+        [30, 30, 31, 32, 33, 33, 33],
+        [40, 40, 41, 42, 43, 43, 43],
+        [40, 40, 41, 42, 43, 43, 43],
+    ]
+
+
+def test_smear_wider_than_the_image_uses_the_far_edge(img):
+    out = core._extend_raster_edges(img, left=0, right=5, bottom=4, top=0, mode="smear")
+    rows = _rows(out)
+    assert rows[4:] == [[40, 41, 42, 43, 43, 43, 43, 43, 43]] * 4
+    assert [row[4:] for row in rows[:4]] == [[v] * 5 for v in (13, 23, 33, 43)]
+
+
+def test_mirror_reflects_at_each_edge(img):
+    out = core._extend_raster_edges(img, left=2, right=1, bottom=0, top=1, mode="mirror")
+    assert _rows(out) == [
+        [11, 10, 10, 11, 12, 13, 13],
+        [11, 10, 10, 11, 12, 13, 13],
+        [21, 20, 20, 21, 22, 23, 23],
+        [31, 30, 30, 31, 32, 33, 33],
+        [41, 40, 40, 41, 42, 43, 43],
+    ]
+
+
+def test_mirror_as_wide_as_the_image_reflects_all_of_it(img):
+    out = core._extend_raster_edges(img, left=0, right=4, bottom=4, top=0, mode="mirror")
+    rows = _rows(out)
+    assert [row[4:] for row in rows[:4]] == [[13, 12, 11, 10], [23, 22, 21, 20], [33, 32, 31, 30], [43, 42, 41, 40]]
+    # bottom right corner: the image turned 180 degrees
+    assert [row[4:] for row in rows[4:]] == [[43, 42, 41, 40], [33, 32, 31, 30], [23, 22, 21, 20], [13, 12, 11, 10]]
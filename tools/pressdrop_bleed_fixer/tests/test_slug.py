@@ -0,0 +1,55 @@
+import pytest
+
+import core
+from conftest import job_for
+
+
+def _form_data(path):
+    """Decoded content of every form XObject drawn on the first page."""
+    from pypdf import PdfReader
+
+    data = []
+
+    def walk(resources):
+        for ref in (resources.get("/XObject") or {}).values():
+            xobj = ref.get_object()
+            if xobj["/Subtype"] == "/Form":
+                data.append(xobj.get_data())
+                walk(xobj.get("/Resources") or {})
+
+    walk(PdfReader(path).pages[0]["/Resources"])
+    return b"\n".join(data)
+
+
+def _slug_job(sample_pdf, out_dir, slug, info=None):
+    return job_for(sample_pdf, out_dir, pages_spec="1", marks={"slug": slug}, info=info)
+
+
+def test_slug_line_is_filled_in(tmp_path, sample_pdf):
+    job = _slug_job(sample_pdf, str(tmp_path / "out"), "{basename} {trim} ticket {ticket} {unknown} {{x}}",
+                    info={"ticket": "T-7 (rush)"})
+    assert core._slug_text(job, job["layout"]["marks"]["slug"]) == "out 4x6in ticket T-7 (rush) {unknown} {x}"
+    (path,) = core.build_press_pdf(job)
+    assert rb"(out 4x6in ticket T-7 \(rush\) {unknown} {x}) Tj" in _form_data(path)
+
+
+def test_slug_info_is_part_of_the_plan(tmp_path, sample_pdf):
+    first = core.compile_layout(_slug_job(sample_pdf, str(tmp_path), "{ticket}", info={"ticket": "A"}))
+    second = core.compile_layout(_slug_job(sample_pdf, str(tmp_path), "{ticket}", info={"ticket": "B"}))
+    assert first is not second
+    assert b"(A) Tj" in first.settings["marks_ops"] and b"(B) Tj" in second.settings["marks_ops"]
+
+
+@pytest.mark.parametrize("field", [
+    "{ticket.__class__}",
+    "{ticket.__class__.__init__.__globals__}",
+    "{ticket[0]}",
+    "{ticket!r}",
+    "{ticket:>200}",
+    "{0}",
+    "{}",
+])
+def test_slug_rejects_fields_other_than_plain_names(tmp_path, sample_pdf, field):
+    job = _slug_job(sample_pdf, str(tmp_path / "out"), f"job {field}", info={"ticket": "T-7"})
+    with pytest.raises(ValueError, match="plain names"):
+        core.build_press_pdf(job)
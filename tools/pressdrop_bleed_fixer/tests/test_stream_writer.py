@@ -0,0 +1,48 @@
+import io
+
+import core
+from conftest import write_sample_pdf
+
+
+def _annotated_chunk(pages):
+    """Chunk PDF bytes: identical pages, each with a text annotation pointing back at it."""
+    core._load_pdf_libs()
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import ArrayObject, DictionaryObject, FloatObject, NameObject
+
+    bio = io.BytesIO()
+    write_sample_pdf(bio, pages=1)
+    writer = PdfWriter()
+    for _ in range(pages):
+        page = writer.add_page(PdfReader(io.BytesIO(bio.getvalue())).pages[0])
+        annot = core._PypdfPrivate.add_object(writer, DictionaryObject({
+            NameObject("/Type"): NameObject("/Annot"),
+            NameObject("/Subtype"): NameObject("/Text"),
+            NameObject("/Rect"): ArrayObject([FloatObject(v) for v in (10, 10, 30, 30)]),
+            NameObject("/P"): page.indirect_reference,
+        }))
+        page[NameObject("/Annots")] = ArrayObject([annot])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def test_page_references_are_not_shared_across_chunks():
+    from pypdf import PdfReader
+
+    out = io.BytesIO()
+    stream_writer = core._PdfStreamWriter(out)
+    for _ in range(3):
+        stream_writer.add_chunk(_annotated_chunk(2))
+    stream_writer.close()
+
+    reader = PdfReader(io.BytesIO(out.getvalue()))
+    assert len(reader.pages) == 6
+    annots = set()
+    for page in reader.pages:
+        (annot,) = page["/Annots"]
+        assert annot.get_object().raw_get("/P").idnum == page.indirect_reference.idnum
+        annots.add(annot.idnum)
+    assert len(annots) == 6
+    # the content the pages share is still written once
+    assert len({page.raw_get("/Contents").idnum for page in reader.pages}) == 1
@@ -0,0 +1,97 @@
+import pytest
+from PIL import Image, ImageChops
+
+import core
+from conftest import job_for
+
+
+def _frames(mode, count=3):
+    """Frames that differ from each other: a tinted background with striped columns."""
+    frames = []
+    for i in range(count):
+        img = Image.new("RGB", (60, 40), (40 * i, 200 - 50 * i, 90))
+        for x in range(i, 60, 7):
+            for y in range(40):
+                img.putpixel((x, y), (255, 255 - 60 * i, 0))
+        frames.append(img.convert(mode))
+    return frames
+
+
+def _tiff(path, mode, compression, count=3):
+    frames = _frames(mode, count)
+    frames[0].save(path, save_all=True, append_images=frames[1:], compression=compression)
+    return path
+
+
+def _page_image(page):
+    def find(resources):
+        for ref in resources["/XObject"].values():
+            xobj = ref.get_object()
+            if xobj["/Subtype"] == "/Image":
+                return xobj
+            found = find(xobj["/Resources"])
+            if found is not None:
+                return found
+
+    return find(page["/Resources"])
+
+
+def _strip(path, frame):
+    with Image.open(path) as img:
+        img.seek(frame)
+        with open(path, "rb") as f:
+            f.seek(img.tag_v2[273][0])
+            return f.read(img.tag_v2[279][0])
+
+
+@pytest.mark.parametrize("mode,compression,filter_name", [
+    ("RGB", "tiff_lzw", "/LZWDecode"),
+    ("L", "tiff_adobe_deflate", "/FlateDecode"),
+    ("1", "group4", "/CCITTFaxDecode"),
+    ("RGB", "jpeg", "/DCTDecode"),
+])
+def test_every_frame_passes_through_its_own_data(tmp_path, mode, compression, filter_name):
+    from pypdf import PdfReader
+
+    art = _tiff(str(tmp_path / "art.tif"), mode, compression)
+    assert core.tiff_frame_count(art) == 3
+    (path,) = core.build_press_pdf(job_for(art, str(tmp_path / "out"), pages_spec="all"))
+    pages = PdfReader(path).pages
+    assert len(pages) == 3
+    for frame, page in enumerate(pages):
+        img_obj = _page_image(page)
+        assert img_obj["/Filter"] == filter_name
+        data = core._PypdfPrivate.encoded_data(img_obj)
+        if compression == "jpeg":
+            assert data.endswith(_strip(art, frame)[2:])  # shared tables spliced in front
+        else:
+            assert data == _strip(art, frame)
+        (image,) = page.images
+        with Image.open(art) as expected:
+            expected.seek(frame)
+            diff = ImageChops.difference(image.image.convert("RGB"), expected.convert("RGB"))
+            assert max(high for _, high in diff.getextrema()) <= (16 if compression == "jpeg" else 0)
+
+
+@pytest.mark.parametrize("mode,compression", [("CMYK", "raw"), ("RGB", "packbits")])
+def test_frames_without_a_pdf_filter_are_decoded(tmp_path, mode, compression):
+    from pypdf import PdfReader
+
+    art = _tiff(str(tmp_path / "art.tif"), mode, compression)
+    (path,) = core.build_press_pdf(job_for(art, str(tmp_path / "out"), pages_spec="all"))
+    for frame, page in enumerate(PdfReader(path).pages):
+        assert _page_image(page)["/Filter"] == "/FlateDecode"
+        (image,) = page.images
+        assert image.image.mode == mode
+        assert image.image.tobytes() == _frames(mode)[frame].tobytes()
+
+
+def test_frame_selection_and_sizes(tmp_path):
+    from pypdf import PdfReader
+
+    art = _tiff(str(tmp_path / "art.tif"), "RGB", "tiff_lzw", count=5)
+    info = [core._raster_info(art, frame) for frame in range(5)]
+    assert [i["bytes"] for i in info] == [len(_strip(art, frame)) for frame in range(5)]
+    (path,) = core.build_press_pdf(job_for(art, str(tmp_path / "out"), pages_spec="2,4-5"))
+    pages = PdfReader(path).pages
+    assert [core._PypdfPrivate.encoded_data(_page_image(p)) for p in pages] == [_strip(art, f) for f in (1, 3, 4)]
@@ -0,0 +1,74 @@
+import pytest
+
+import core
+from conftest import job_for
+
+
+def _tiling(tmp_path, sample_pdf, cols, rows, overlap, **kwargs):
+    job = job_for(sample_pdf, str(tmp_path / "out"), tiling=core.make_tiling(cols=cols, rows=rows, overlap_spec=overlap),
+                  **kwargs)
+    return job, core.compile_layout(job).settings["tiling"]
+
+
+def _panel_trims(tiling):
+    """Each panel's trim box in the coordinates of the piece (media box at 0,0, 9pt bleed)."""
+    trim = tiling["trim_box"]
+    out = []
+    for tile in tiling["tiles"]:
+        src, (a, _, _, d, e, f) = tile["window"]
+        assert (a, d) == (1.0, 1.0)  # panels are 1:1 windows of the piece
+        out.append((tile["row"], tile["col"], core.Rect(trim.x0 - e, trim.y0 - f, trim.x1 - e, trim.y1 - f)))
+    return out
+
+
+def test_panels_split_the_trim_with_the_overlap(tmp_path, sample_pdf):
+    # 4x6in piece (288x432pt), 2x3 panels sharing 0.5in (36pt): 162x168pt panels
+    _, tiling = _tiling(tmp_path, sample_pdf, 2, 3, "0.5")
+    assert (tiling["trim_box"].width, tiling["trim_box"].height) == (162, 168)
+    assert (tiling["media_box"].width, tiling["media_box"].height) == (180, 186)
+    assert _panel_trims(tiling) == [
+        (0, 0, core.Rect(9, 273, 171, 441)), (0, 1, core.Rect(135, 273, 297, 441)),
+        (1, 0, core.Rect(9, 141, 171, 309)), (1, 1, core.Rect(135, 141, 297, 309)),
+        (2, 0, core.Rect(9, 9, 171, 177)), (2, 1, core.Rect(135, 9, 297, 177)),
+    ]
+    # every panel's bleed is the artwork next to it; the outer ones reach the piece's bleed
+    windows = [tile["window"][0] for tile in tiling["tiles"]]
+    assert min(w.x0 for w in windows) == min(w.y0 for w in windows) == 0
+    assert (max(w.x1 for w in windows), max(w.y1 for w in windows)) == (306, 450)
+
+
+def test_overlap_in_its_own_unit_per_axis(tmp_path, sample_pdf):
+    job = job_for(sample_pdf, str(tmp_path / "out"),
+                  tiling=core.make_tiling(cols=3, rows=2, overlap_spec="9,0", unit="mm"))
+    tiling = core.compile_layout(job).settings["tiling"]
+    ox = core.to_points(9, "mm")
+    assert tiling["trim_box"].width == pytest.approx((288 + 2 * ox) / 3)
+    assert tiling["trim_box"].height == pytest.approx(216)
+    trims = [r for _, _, r in _panel_trims(tiling)]
+    assert trims[0].x1 - trims[1].x0 == pytest.approx(ox)
+    assert trims[0].y0 == trims[3].y1 == pytest.approx(225)
+
+
+def test_output_has_one_page_per_panel_sharing_one_form(tmp_path, sample_pdf):
+    from pypdf import PdfReader
+
+    job, _ = _tiling(tmp_path, sample_pdf, 2, 3, "0.5", pages_spec="1-2")
+    (path,) = core.build_press_pdf(job)
+    pages = PdfReader(path).pages
+    assert len(pages) == 2 * 6
+    assert {(float(p.trimbox.width), float(p.trimbox.height)) for p in pages} == {(162, 168)}
+    forms = [p["/Resources"]["/XObject"].raw_get("/PDTile").idnum for p in pages]
+    assert forms[:6] == [forms[0]] * 6 and forms[6:] == [forms[6]] * 6 and forms[0] != forms[6]
+
+
+@pytest.mark.parametrize("cols,rows,overlap", [(2, 1, "4"), (1, 2, "0,6"), (2, 2, "-0.1")])
+def test_overlap_must_fit_in_a_panel(tmp_path, sample_pdf, cols, rows, overlap):
+    with pytest.raises(ValueError, match="overlap"):
+        _tiling(tmp_path, sample_pdf, cols, rows, overlap)
+
+
+def test_make_tiling_validates_the_grid():
+    with pytest.raises(ValueError):
+        core.make_tiling(cols=0, rows=2)
+    with pytest.raises(ValueError):
+        core.make_tiling(cols=2, rows=2, overlap_spec="1,2,3")